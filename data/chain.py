@@ -1,41 +1,303 @@
 import os
 import sys
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 
-import yaml
+from brownie import network, web3
 from brownie._config import CONFIG
+from eth_utils import to_checksum_address
 
+from data.yaml_snapshot import load_yaml
 
-def get_chain_data():
-    with open(os.path.join("data", "chains.yaml"), "r") as file:
-        return yaml.safe_load(file)
+CHAIN_DATA_DIR = os.path.join("data", "chains")
+CHAIN_INDEX_PATH = os.path.join(CHAIN_DATA_DIR, "index.yaml")
 
 
-def get_all_chain_names():
-    data = get_chain_data()
-    return list(data.keys())
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
 
 
-def get_chain_from_network_name(network_name):
-    """Returns 'chain' object from network name
-    network_name specifically refers to the network name according to brownie
+def _addresses(address: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    if not address:
+        return (None, None)
+    return (sys.intern(address.lower()), sys.intern(to_checksum_address(address)))
+
+
+class _DictAccess:
+    """Keeps `model["field"]` and `model.get("field")` working for code written against the
+    plain dicts that the chain data used to be passed around as
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def keys(self):
+        return [f.name for f in fields(self)]
+
+
+@dataclass(frozen=True)
+class Asset(_DictAccess):
+    __slots__ = (
+        "name",
+        "symbol",
+        "decimals",
+        "address",
+        "checksum_address",
+        "benefactor",
+        "wrapped_native",
+        "interfaces",
+    )
+
+    name: str
+    symbol: str
+    decimals: int
+    address: Optional[str]  # lowercased, None for the native asset
+    checksum_address: Optional[str]
+    benefactor: Optional[str]
+    wrapped_native: bool
+    interfaces: Tuple[str, ...]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Asset":
+        address, checksum_address = _addresses(data.get("address"))
+        return cls(
+            name=_intern(data["name"]),
+            symbol=_intern(data["symbol"]),
+            decimals=data["decimals"],
+            address=address,
+            checksum_address=checksum_address,
+            benefactor=_intern(data.get("benefactor")),
+            wrapped_native=bool(data.get("wrapped_native")),
+            interfaces=tuple(sys.intern(i) for i in data.get("interfaces", [])),
+        )
+
+
+@dataclass(frozen=True)
+class VenueContract(_DictAccess):
+    __slots__ = ("venue", "interfaces", "address", "checksum_address")
+
+    venue: str
+    interfaces: Tuple[str, ...]
+    address: str  # lowercased
+    checksum_address: str
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "VenueContract":
+        address, checksum_address = _addresses(data["address"])
+        return cls(
+            venue=sys.intern(data["venue"]),
+            interfaces=tuple(sys.intern(i) for i in data["interfaces"]),
+            address=address,
+            checksum_address=checksum_address,
+        )
+
+
+@dataclass(frozen=True)
+class Chain(_DictAccess):
+    __slots__ = ("id", "name", "chain_id", "eip1559", "network", "assets", "contracts")
+
+    id: str
+    name: str
+    chain_id: int
+    eip1559: bool
+    network: Dict[str, str]  # mode ("prod" / "fork") -> brownie network name
+    assets: Tuple[Asset, ...]
+    contracts: Tuple[VenueContract, ...]
+
+    @property
+    def tokens(self) -> Tuple[Asset, ...]:
+        """Assets that are ERC20 tokens, i.e. everything but the native asset"""
+        return tuple(asset for asset in self.assets if asset.address)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Chain":
+        return cls(
+            id=sys.intern(data["id"]),
+            name=sys.intern(data["name"]),
+            chain_id=data["chain_id"],
+            eip1559=bool(data.get("eip1559")),
+            network={sys.intern(k): sys.intern(v) for k, v in data["network"].items()},
+            assets=tuple(Asset.from_dict(asset) for asset in data.get("assets", [])),
+            contracts=tuple(VenueContract.from_dict(c) for c in data.get("contracts", [])),
+        )
+
+
+class ChainRegistry:
+    """In-memory view of the chain data, one shard per chain
+
+    data/chains/index.yaml maps every brownie network name and chain id to the shard holding
+    that chain. Only the index is read up front; a shard is parsed, and its indexes built, the
+    first time its chain is looked up. In a normal session that is only the connected chain.
+
+    Every lookup helper in this module is a dictionary lookup on the indexes built here.
+    Chain ids are keyed as strings, token addresses are keyed lowercased.
+    """
+
+    def __init__(self, index, shard_dir=CHAIN_DATA_DIR):
+        self.index = index
+        self.shard_dir = shard_dir
+        self.chain_keys = {}
+        self.networks = {}
+        for key, entry in index.items():
+            self.chain_keys[str(entry["chain_id"])] = key
+            for mode, network_name in entry["network"].items():
+                self.networks.setdefault(network_name, (key, mode))
+
+        self.chains = {}
+        self.tokens_by_symbol = {}
+        self.tokens_by_address = {}
+        self.wrapped_natives = {}
+        self.contracts_by_venue = {}
+        self.contracts_by_interface = {}
+
+    @classmethod
+    def from_file(cls, path=CHAIN_INDEX_PATH):
+        return cls(load_yaml(path), os.path.dirname(path))
+
+    @property
+    def data(self):
+        """Merged view of every shard, keyed like the index. Loads all shards"""
+        return {key: load_chain_shard(key, self.shard_dir) for key in self.index}
+
+    def _load(self, chain_id) -> str:
+        chain_id = str(chain_id)
+        if chain_id in self.chains:
+            return chain_id
+
+        key = self.chain_keys[chain_id]
+        chain = Chain.from_dict(load_chain_shard(key, self.shard_dir))
+        if str(chain.chain_id) != chain_id:
+            raise ValueError(
+                f"Shard '{key}' has chain_id {chain.chain_id}, index says {chain_id}. "
+                "Rebuild the index with `brownie run chain_shards`"
+            )
+        self.chains[chain_id] = chain
+
+        symbols = self.tokens_by_symbol[chain_id] = {}
+        addresses = self.tokens_by_address[chain_id] = {}
+        for token in chain.assets:
+            symbols.setdefault(token.symbol, token)
+            if token.address:
+                addresses.setdefault(token.address, token)
+            if token.wrapped_native:
+                self.wrapped_natives.setdefault(chain_id, token)
+
+        venues = self.contracts_by_venue[chain_id] = {}
+        interfaces = self.contracts_by_interface[chain_id] = {}
+        for contract in chain.contracts:
+            venues.setdefault(contract.venue, contract)
+            for _interface in contract.interfaces:
+                interfaces.setdefault(_interface, []).append(contract)
+        return chain_id
+
+    def chain(self, chain_id):
+        return self.chains[self._load(chain_id)]
+
+    def chain_from_network_name(self, network_name):
+        (key, mode) = self.networks[network_name]
+        return (self.chain(self.index[key]["chain_id"]), mode)
+
+    def token(self, chain_id, symbol):
+        return self.tokens_by_symbol[self._load(chain_id)][symbol]
+
+    def token_by_address(self, chain_id, address):
+        return self.tokens_by_address[self._load(chain_id)][address.lower()]
+
+    def wrapped_native(self, chain_id):
+        return self.wrapped_natives[self._load(chain_id)]
+
+    def contract(self, chain_id, venue):
+        return self.contracts_by_venue[self._load(chain_id)].get(venue)
+
+    def contracts_with_interface(self, chain_id, _interface):
+        return self.contracts_by_interface[self._load(chain_id)].get(_interface, [])
+
+
+def shard_path(key, shard_dir=CHAIN_DATA_DIR):
+    return os.path.join(shard_dir, f"{key}.yaml")
+
+
+def load_chain_shard(key, shard_dir=CHAIN_DATA_DIR):
+    return load_yaml(shard_path(key, shard_dir))
+
+
+def get_shard_keys(shard_dir=CHAIN_DATA_DIR):
+    return sorted(
+        os.path.splitext(name)[0]
+        for name in os.listdir(shard_dir)
+        if name.endswith(".yaml") and name != os.path.basename(CHAIN_INDEX_PATH)
+    )
+
+
+def build_chain_index(shard_dir=CHAIN_DATA_DIR, order=()):
+    """Build the network/chain id index from the shards themselves
+    Chains listed in `order` keep their position, new shards are appended alphabetically
     """
-    data = get_chain_data()
+    keys = get_shard_keys(shard_dir)
+    keys = [k for k in order if k in keys] + [k for k in keys if k not in order]
+    index = {}
+    for key in keys:
+        shard = load_chain_shard(key, shard_dir)
+        index[key] = {"chain_id": shard["chain_id"], "network": dict(shard["network"])}
+    return index
+
+
+def validate_chain_shards(shard_dir=CHAIN_DATA_DIR):
+    """Returns a list of problems with the shards / index. Empty when consistent"""
+    errors = []
+    index = load_yaml(os.path.join(shard_dir, os.path.basename(CHAIN_INDEX_PATH)))
+    expected = build_chain_index(shard_dir, order=list(index))
+    if index != expected:
+        errors.append("index.yaml is out of date with the shards")
+
+    chain_ids, networks = {}, {}
+    for key in expected:
+        shard = load_chain_shard(key, shard_dir)
+        chain_id = str(shard["chain_id"])
+        if chain_id in chain_ids:
+            errors.append(f"{key}.yaml: chain_id {chain_id} already used by {chain_ids[chain_id]}")
+        chain_ids.setdefault(chain_id, key)
+        for network_name in shard["network"].values():
+            if network_name in networks:
+                errors.append(
+                    f"{key}.yaml: network {network_name} already used by {networks[network_name]}"
+                )
+            networks.setdefault(network_name, key)
+        try:
+            Chain.from_dict(shard)
+        except (KeyError, TypeError, ValueError) as e:
+            errors.append(f"{key}.yaml: invalid chain entry ({e!r})")
+    return errors
+
 
-    def generator(data):
-        for chain in data:
-            if network_name in data[chain]["network"].values():
-                yield data[chain]
+@lru_cache(maxsize=None)
+def get_registry():
+    return ChainRegistry.from_file()
 
-    chain = next(generator(data))
 
-    def mode_generator(chain):
-        for key in chain["network"]:
-            if chain["network"][key] == network_name:
-                yield key
+def get_chain_data():
+    return get_registry().data
 
-    mode = next(mode_generator(chain))
 
-    return (chain, mode)
+def get_all_chain_names():
+    return list(get_registry().index.keys())
+
+
+def get_chain_from_network_name(network_name):
+    """Returns 'chain' object from network name
+    network_name specifically refers to the network name according to brownie
+    """
+    return get_registry().chain_from_network_name(network_name)
 
 
 def get_wnative_address(chain):
@@ -43,14 +305,7 @@ def get_wnative_address(chain):
     Does this by checking for wrapped_native
     If multiple assets exists, it returns the first
     """
-
-    def generator(chain):
-        tokens = chain["assets"]
-        for token in tokens:
-            if token.get("wrapped_native"):
-                yield token
-
-    return next(generator(chain))["address"].lower()
+    return get_registry().wrapped_native(chain["chain_id"]).address
 
 
 def get_uni_router_address(chain):
@@ -58,14 +313,8 @@ def get_uni_router_address(chain):
     Does this by checking interfaces
     If multiple routers exist, it returns the first
     """
-
-    def generator(chain):
-        contracts = chain["contracts"]
-        for contract in contracts:
-            if "uniswap_router_v2_02" in contract["interfaces"]:
-                yield contract
-
-    return next(generator(chain))["address"].lower()
+    routers = get_registry().contracts_with_interface(chain["chain_id"], "uniswap_router_v2_02")
+    return routers[0].address
 
 
 CHAINS = {
@@ -108,22 +357,87 @@ def get_network():
     return network
 
 
+class ChainContext:
+    """Everything derived from the active network, resolved once per connection
+
+    Before brownie connects, the network is taken from the CLI / config (see `get_network`) and
+    the context is provisional: it is resolved again on the first lookup after connecting.
+    `invalidate_chain_context` must be called whenever the connection changes
+    (`helpers.network_switcher.NetworkSwitcher` does this).
+    """
+
+    def __init__(self, network_name: str, provisional: bool = False) -> None:
+        registry = get_registry()
+        self.network = network_name
+        self.provisional = provisional
+        (self.chain, self.mode) = registry.chain_from_network_name(network_name)
+        self.chain_id = self.chain.chain_id
+        self.wnative = registry.wrapped_natives.get(str(self.chain_id))
+        self.routers = tuple(
+            registry.contracts_with_interface(self.chain_id, "uniswap_router_v2_02")
+        )
+        self._fork_block: Optional[int] = None
+
+    @property
+    def fork_block(self) -> int:
+        """Block the connected hardhat node forked from, or its current height otherwise"""
+        if self._fork_block is None:
+            response = web3.provider.make_request("hardhat_metadata", [])
+            forked = (response.get("result") or {}).get("forkedNetwork")
+            if forked:
+                self._fork_block = int(forked["forkBlockNumber"])
+            else:
+                self._fork_block = web3.eth.block_number
+        return self._fork_block
+
+    @classmethod
+    def resolve(cls) -> "ChainContext":
+        active_network = network.show_active()
+        if active_network:
+            return cls(active_network)
+        return cls(get_network(), provisional=True)
+
+
+_chain_context: Optional[ChainContext] = None
+
+
+def get_chain_context() -> ChainContext:
+    global _chain_context
+    if _chain_context is None or (_chain_context.provisional and network.show_active()):
+        _chain_context = ChainContext.resolve()
+    return _chain_context
+
+
+def invalidate_chain_context():
+    global _chain_context
+    _chain_context = None
+
+
 def get_chain():
-    connected_network = get_network()
-    (chain, _) = get_chain_from_network_name(connected_network)
-    return chain
+    return get_chain_context().chain
 
 
 def get_chain_id():
-    chain = get_chain()
-    return chain["chain_id"]
+    return get_chain_context().chain_id
+
+
+def get_fork_block() -> int:
+    return get_chain_context().fork_block
+
+
+def last_shared_block(block_number: int) -> int:
+    """Latest block up to `block_number` whose state doesn't depend on the session
+
+    On a fork, blocks after the fork point are local to the node and differ on every run.
+    """
+    context = get_chain_context()
+    if context.mode == "fork":
+        return min(block_number, context.fork_block)
+    return block_number
 
 
 def is_uniswapv3_on_chain(chain):
-    for contract in chain["contracts"]:
-        if "uniswap_router_v3" in contract["interfaces"]:
-            return True
-    return False
+    return bool(get_registry().contracts_with_interface(chain["chain_id"], "uniswap_router_v3"))
 
 
 def is_venue_on_chain(venue, chain):
@@ -134,10 +448,8 @@ def is_venue_on_chain(venue, chain):
         "uniswap",
         "sushiswap",
     ], "unrecognised venue"
-    for contract in chain["contracts"]:
-        if venue == contract["venue"]:
-            return contract["address"]
-    return None
+    contract = get_registry().contract(chain["chain_id"], venue)
+    return contract.address if contract else None
 
 
 def get_chain_tokens():
@@ -146,5 +458,4 @@ def get_chain_tokens():
 
 
 def get_chain_token(symbol: str):
-    tokens = get_chain_tokens()
-    return [a for a in tokens if a["symbol"] == symbol.upper()][0]
+    return get_registry().token(get_chain_context().chain_id, symbol.upper())
@@ -1,9 +1,13 @@
 import os
 from dataclasses import dataclass
 from enum import IntEnum
-from typing import List, Optional
+from functools import lru_cache
+from itertools import permutations
+from typing import Dict, FrozenSet, List, Optional, Tuple
 
-import yaml
+from data.yaml_snapshot import load_yaml
+
+CURVE_DATA_PATH = os.path.join("data", "curve.yaml")
 
 
 class CurveAssetType(IntEnum):
@@ -18,6 +22,19 @@ class CurveAssetType(IntEnum):
     CRYPTO = 4
 
 
+class CurveSwapType(IntEnum):
+    """Mirrors ICSwapCurve.CurveSwapType, the `swapType` of CSwapCurve params"""
+
+    STABLESWAP_EXCHANGE = 0
+    STABLESWAP_UNDERLYING = 1
+    CRYPTOSWAP_EXCHANGE = 2
+    CRYPTOSWAP_UNDERLYING = 3
+
+    @staticmethod
+    def for_pool(pool: "CurvePool", underlying: bool = False) -> "CurveSwapType":
+        return CurveSwapType(pool.is_crypto * 2 + underlying)
+
+
 @dataclass
 class CurvePool:
     balance_abi: str
@@ -43,12 +60,116 @@ class CurvePool:
         return hash(self.__key())
 
 
-def get_curve_pools(chain_id: str):
-    with open(os.path.join("data", "curve.yaml"), "r") as infile:
-        _input = yaml.safe_load(infile)
+CoinPair = Tuple[int, int]
 
+_PAIRS: Dict[int, Tuple[CoinPair, ...]] = {}
+
+
+def _index_pairs(n_coins: int) -> Tuple[CoinPair, ...]:
     try:
-        curve_pools = [CurvePool(**_data) for _data in _input]
-        return curve_pools
+        return _PAIRS[n_coins]
     except KeyError:
-        return []
+        pairs = _PAIRS[n_coins] = tuple(permutations(range(n_coins), 2))
+        return pairs
+
+
+class CurvePoolIndex:
+    """Lookups over curve.yaml, built once per process
+
+    Pools are grouped by chain id (as a string). Within a chain they can be looked up by pool
+    address, LP token, coin, and unordered coin / underlying coin pair. Addresses are lowercase.
+    """
+
+    def __init__(self, pools: List[CurvePool]):
+        self.chains: Dict[str, List[CurvePool]] = {}
+        self.by_address: Dict[str, Dict[str, CurvePool]] = {}
+        self.by_lp_token: Dict[str, Dict[str, CurvePool]] = {}
+        self.by_coin: Dict[str, Dict[str, List[CurvePool]]] = {}
+        self.by_pair: Dict[str, Dict[FrozenSet[str], List[CurvePool]]] = {}
+        self.by_underlying_pair: Dict[str, Dict[FrozenSet[str], List[CurvePool]]] = {}
+        self.coin_indexes: Dict[CurvePool, Dict[str, int]] = {}
+        self.underlying_indexes: Dict[CurvePool, Dict[str, int]] = {}
+
+        for pool in pools:
+            chain_id = str(pool.chain_id)
+            self.chains.setdefault(chain_id, []).append(pool)
+            self.by_address.setdefault(chain_id, {})[pool.pool_address] = pool
+            self.by_lp_token.setdefault(chain_id, {})[pool.lp_token] = pool
+
+            coins = self.coin_indexes[pool] = {coin: i for i, coin in enumerate(pool.coins)}
+            underlying = self.underlying_indexes[pool] = {
+                coin: i for i, coin in enumerate(pool.underlying_coins or [])
+            }
+
+            by_coin = self.by_coin.setdefault(chain_id, {})
+            for coin in coins.keys() | underlying.keys():
+                by_coin.setdefault(coin, []).append(pool)
+
+            by_pair = self.by_pair.setdefault(chain_id, {})
+            for i, j in self.coin_pairs(pool):
+                if i < j:
+                    by_pair.setdefault(frozenset((pool.coins[i], pool.coins[j])), []).append(pool)
+
+            by_underlying_pair = self.by_underlying_pair.setdefault(chain_id, {})
+            for i, j in self.underlying_pairs(pool):
+                if i < j:
+                    pair = frozenset((pool.underlying_coins[i], pool.underlying_coins[j]))
+                    by_underlying_pair.setdefault(pair, []).append(pool)
+
+    @classmethod
+    def from_file(cls, path=CURVE_DATA_PATH) -> "CurvePoolIndex":
+        return cls([CurvePool(**_data) for _data in load_yaml(path)])
+
+    def pools(self, chain_id) -> List[CurvePool]:
+        return self.chains.get(str(chain_id), [])
+
+    def pool(self, chain_id, address: str) -> Optional[CurvePool]:
+        return self.by_address.get(str(chain_id), {}).get(address.lower())
+
+    def pool_for_lp_token(self, chain_id, lp_token: str) -> Optional[CurvePool]:
+        return self.by_lp_token.get(str(chain_id), {}).get(lp_token.lower())
+
+    def pools_with_coin(self, chain_id, coin: str) -> List[CurvePool]:
+        """Pools holding `coin`, either directly or as an underlying coin"""
+        return self.by_coin.get(str(chain_id), {}).get(coin.lower(), [])
+
+    def pools_for_pair(self, chain_id, coin_a: str, coin_b: str) -> List[CurvePool]:
+        pair = frozenset((coin_a.lower(), coin_b.lower()))
+        return self.by_pair.get(str(chain_id), {}).get(pair, [])
+
+    def pools_for_underlying_pair(self, chain_id, coin_a: str, coin_b: str) -> List[CurvePool]:
+        pair = frozenset((coin_a.lower(), coin_b.lower()))
+        return self.by_underlying_pair.get(str(chain_id), {}).get(pair, [])
+
+    def coins(self, chain_id) -> List[str]:
+        return sorted({coin for pool in self.pools(chain_id) for coin in pool.coins})
+
+    def underlying_coins(self, chain_id) -> List[str]:
+        return sorted(
+            {coin for pool in self.pools(chain_id) for coin in pool.underlying_coins or []}
+        )
+
+    @staticmethod
+    def coin_pairs(pool: CurvePool) -> Tuple[CoinPair, ...]:
+        """All ordered (i, j) coin index pairs of `pool`"""
+        return _index_pairs(len(pool.coins))
+
+    @staticmethod
+    def underlying_pairs(pool: CurvePool) -> Tuple[CoinPair, ...]:
+        """All ordered (i, j) underlying coin index pairs of `pool`"""
+        return _index_pairs(len(pool.underlying_coins or []))
+
+    def coin_index(self, pool: CurvePool, coin: str) -> Optional[int]:
+        return self.coin_indexes[pool].get(coin.lower())
+
+    def underlying_index(self, pool: CurvePool, coin: str) -> Optional[int]:
+        return self.underlying_indexes[pool].get(coin.lower())
+
+
+@lru_cache(maxsize=None)
+def get_curve_pool_index() -> CurvePoolIndex:
+    return CurvePoolIndex.from_file()
+
+
+def get_curve_pools(chain_id: str) -> List[CurvePool]:
+    return get_curve_pool_index().pools(chain_id)
@@ -0,0 +1,244 @@
+"""Offline, integer-exact CryptoSwap (curve v2) quotes
+
+A port of `get_dy` of the two-coin v2 pools and of tricrypto (through its math and views
+contracts), working from a `CryptoSwapState` snapshot. As in the StableSwap engine, arithmetic
+is floor division on Python ints in the same order as the Vyper sources.
+
+The two-coin pools inline collapsed versions of `geometric_mean`, `newton_D` and `newton_y`,
+which round differently from the N-coin loops; both forms are kept and picked by coin count.
+`CryptoSwapPool` has the same quoting methods as `StableSwapPool`.
+"""
+
+from dataclasses import dataclass
+from typing import List, Sequence
+
+from data.curve_stableswap import FEE_DENOMINATOR, PRECISION
+
+A_MULTIPLIER = 10000
+MAX_ITERATIONS = 255
+
+
+@dataclass
+class CryptoSwapState:
+    balances: List[int]
+    precisions: List[int]  # 10 ** (18 - decimals) of each coin
+    price_scale: List[int]  # price of coins 1.. in terms of coin 0, 1e18 based
+    A: int  # A * N ** N * A_MULTIPLIER, as returned by `A()`
+    gamma: int
+    D: int
+    mid_fee: int
+    out_fee: int
+    fee_gamma: int
+    future_A_gamma_time: int = 0
+
+    @property
+    def n_coins(self) -> int:
+        return len(self.balances)
+
+
+def _sort_desc(x: Sequence[int]) -> List[int]:
+    return sorted(x, reverse=True)
+
+
+class CryptoSwapPool:
+    def __init__(self, state: CryptoSwapState) -> None:
+        self.state = state
+        self.n = state.n_coins
+        self._D = None
+
+    @property
+    def D(self) -> int:
+        """The pool's D, recomputed from the balances while A and gamma are ramping"""
+        if self._D is None:
+            if self.state.future_A_gamma_time > 0:
+                self._D = self.newton_D(self._scale(self.state.balances))
+            else:
+                self._D = self.state.D
+        return self._D
+
+    # math
+
+    def geometric_mean(self, x: Sequence[int]) -> int:
+        """Geometric mean of x, which must already be sorted high to low"""
+        n = self.n
+        D = x[0]
+        for _ in range(MAX_ITERATIONS):
+            D_prev = D
+            if n == 2:
+                D = (D + x[0] * x[1] // D) // n
+            else:
+                tmp = 10**18
+                for _x in x:
+                    tmp = tmp * _x // D
+                D = D * ((n - 1) * 10**18 + tmp) // (n * 10**18)
+            diff = abs(D - D_prev)
+            if diff <= 1 or diff * 10**18 < D:
+                return D
+        raise ValueError("geometric_mean did not converge")
+
+    def _g1k0_mul1(self, K0: int, D: int):
+        ANN, gamma = self.state.A, self.state.gamma
+        _g1k0 = gamma + 10**18
+        if _g1k0 > K0:
+            _g1k0 = _g1k0 - K0 + 1
+        else:
+            _g1k0 = K0 - _g1k0 + 1
+        # D / (A * N**N) * _g1k0**2 / gamma**2
+        mul1 = 10**18 * D // gamma * _g1k0 // gamma * _g1k0 * A_MULTIPLIER // ANN
+        return _g1k0, mul1
+
+    def newton_D(self, x_unsorted: Sequence[int]) -> int:
+        n = self.n
+        x = _sort_desc(x_unsorted)
+        D = n * self.geometric_mean(x)
+        S = sum(x)
+
+        for _ in range(MAX_ITERATIONS):
+            D_prev = D
+            if n == 2:
+                K0 = (10**18 * n**2) * x[0] // D * x[1] // D
+            else:
+                K0 = 10**18
+                for _x in x:
+                    K0 = K0 * _x * n // D
+
+            _g1k0, mul1 = self._g1k0_mul1(K0, D)
+            # 2*N*K0 / _g1k0
+            mul2 = (2 * 10**18) * n * K0 // _g1k0
+            neg_fprime = (S + S * mul2 // 10**18) + mul1 * n // K0 - mul2 * D // 10**18
+
+            D_plus = D * (neg_fprime + S) // neg_fprime
+            D_minus = D * D // neg_fprime
+            if 10**18 > K0:
+                D_minus += D * (mul1 // neg_fprime) // 10**18 * (10**18 - K0) // K0
+            else:
+                D_minus -= D * (mul1 // neg_fprime) // 10**18 * (K0 - 10**18) // K0
+
+            if D_plus > D_minus:
+                D = D_plus - D_minus
+            else:
+                D = (D_minus - D_plus) // 2
+
+            if abs(D - D_prev) * 10**14 < max(10**16, D):
+                for _x in x:
+                    frac = _x * 10**18 // D
+                    if not 10**16 - 1 < frac < 10**20 + 1:
+                        raise ValueError("Unsafe values x[i]")
+                return D
+        raise ValueError("newton_D did not converge")
+
+    def newton_y(self, x: Sequence[int], D: int, i: int) -> int:
+        """Balance of coin i (in price scaled units) that keeps invariant D"""
+        n = self.n
+        if n == 2:
+            x_j = x[1 - i]
+            y = D**2 // (x_j * n**2)
+            K0_i = (10**18 * n) * x_j // D
+            S_i = x_j
+            convergence_limit = max(x_j // 10**14, D // 10**14, 100)
+        else:
+            y = D // n
+            K0_i = 10**18
+            S_i = 0
+            x_sorted = list(x)
+            x_sorted[i] = 0
+            x_sorted = _sort_desc(x_sorted)
+            convergence_limit = max(x_sorted[0] // 10**14, D // 10**14, 100)
+            for k in range(2, n + 1):
+                _x = x_sorted[n - k]
+                y = y * D // (_x * n)  # small _x first
+                S_i += _x
+            for k in range(n - 1):
+                K0_i = K0_i * x_sorted[k] * n // D  # large _x first
+
+        for _ in range(MAX_ITERATIONS):
+            y_prev = y
+            K0 = K0_i * y * n // D
+            S = S_i + y
+
+            _g1k0, mul1 = self._g1k0_mul1(K0, D)
+            # 2*K0 / _g1k0
+            mul2 = 10**18 + (2 * 10**18) * K0 // _g1k0
+
+            yfprime = 10**18 * y + S * mul2 + mul1
+            _dyfprime = D * mul2
+            if yfprime < _dyfprime:
+                y = y_prev // 2
+                continue
+            yfprime -= _dyfprime
+            fprime = yfprime // y
+
+            y_minus = mul1 // fprime
+            y_plus = (yfprime + 10**18 * D) // fprime + y_minus * 10**18 // K0
+            y_minus += 10**18 * S // fprime
+
+            if y_plus < y_minus:
+                y = y_prev // 2
+            else:
+                y = y_plus - y_minus
+
+            if abs(y - y_prev) < max(convergence_limit, y // 10**14):
+                frac = y * 10**18 // D
+                if not 10**16 - 1 < frac < 10**20 + 1:
+                    raise ValueError("Unsafe value for y")
+                return y
+        raise ValueError("newton_y did not converge")
+
+    def fee_calc(self, xp: Sequence[int]) -> int:
+        state = self.state
+        if self.n == 2:
+            f = xp[0] + xp[1]
+            f = (
+                state.fee_gamma
+                * 10**18
+                // (
+                    state.fee_gamma
+                    + 10**18
+                    - (10**18 * self.n**self.n) * xp[0] // f * xp[1] // f
+                )
+            )
+        else:
+            # reduction_coefficient
+            S = sum(xp)
+            f = 10**18
+            for x_i in xp:
+                f = f * self.n * x_i // S
+            if state.fee_gamma > 0:
+                f = state.fee_gamma * 10**18 // (state.fee_gamma + 10**18 - f)
+        return (state.mid_fee * f + state.out_fee * (10**18 - f)) // 10**18
+
+    def _scale(self, balances: Sequence[int]) -> List[int]:
+        state = self.state
+        xp = [balances[0] * state.precisions[0]]
+        for k in range(1, self.n):
+            xp.append(balances[k] * state.price_scale[k - 1] * state.precisions[k] // PRECISION)
+        return xp
+
+    # quotes
+
+    def get_dy(self, i: int, j: int, dx: int) -> int:
+        if i == j or dx <= 0:
+            raise ValueError("Swap would revert")
+        state = self.state
+        balances = list(state.balances)
+        balances[i] += dx
+        xp = self._scale(balances)
+
+        y = self.newton_y(xp, self.D, j)
+        dy = xp[j] - y - 1
+        if dy < 0:
+            raise ValueError("Swap would revert")
+        xp[j] = y
+        if j > 0:
+            dy = dy * PRECISION // state.price_scale[j - 1]
+        dy //= state.precisions[j]
+        return dy - self.fee_calc(xp) * dy // FEE_DENOMINATOR
+
+    def get_dy_many(self, i: int, j: int, amounts: Sequence[int]) -> List[int]:
+        return [self.get_dy(i, j, dx) for dx in amounts]
+
+    def get_dy_underlying(self, i: int, j: int, dx: int) -> int:
+        raise ValueError("Pool has no underlying coins")
+
+    def get_dy_underlying_many(self, i: int, j: int, amounts: Sequence[int]) -> List[int]:
+        raise ValueError("Pool has no underlying coins")
@@ -0,0 +1,240 @@
+"""Multi-hop route planning over the Curve pool graph
+
+Every pool in curve.yaml contributes directed edges between each ordered pair of its coins
+and, for pools with `is_underlying`, between each ordered pair of its underlying coins. An edge
+is exactly one CSwapCurve.sell step. Adjacency lists are built once per chain; a search only
+expands tokens that can still reach the target within the remaining hop budget, and keeps a
+bounded number of partial routes per token and hop (beam search), since Curve quotes depend on
+the amount and best paths can't be found with a plain shortest-path search.
+
+Quotes come from a `Quoter`: a callable taking (edge, amount_in) and returning the output
+amount, or None if the pool can't be quoted. `quote_onchain` asks the pool over RPC,
+`local_quoter` uses the offline StableSwap / CryptoSwap engines.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from brownie import interface
+from brownie.exceptions import VirtualMachineError
+
+from data.curve import CurvePool, CurvePoolIndex, CurveSwapType, get_curve_pool_index
+from data.curve_snapshot import CurveSnapshot
+
+DEFAULT_MAX_HOPS = 3
+DEFAULT_BEAM_WIDTH = 4
+
+
+@dataclass(frozen=True)
+class CurveEdge:
+    pool: CurvePool
+    i: int
+    j: int
+    token_in: str
+    token_out: str
+    underlying: bool
+
+    @property
+    def swap_type(self) -> CurveSwapType:
+        return CurveSwapType.for_pool(self.pool, self.underlying)
+
+    @property
+    def params(self) -> list:
+        """`CurveSwapParams` for CSwapCurve.sell"""
+        return [self.pool.pool_address, self.i, self.j, self.swap_type]
+
+
+Quoter = Callable[[CurveEdge, int], Optional[int]]
+
+
+@dataclass(frozen=True)
+class CurveRoute:
+    edges: Tuple[CurveEdge, ...]
+    amounts: Tuple[int, ...]  # amount in, then the quoted output of each edge
+
+    @property
+    def amount_in(self) -> int:
+        return self.amounts[0]
+
+    @property
+    def amount_out(self) -> int:
+        return self.amounts[-1]
+
+    @property
+    def tokens(self) -> Tuple[str, ...]:
+        return (self.edges[0].token_in, *[edge.token_out for edge in self.edges])
+
+    def sell_steps(self, quoter: Quoter, slippage: float) -> List[tuple]:
+        """Arguments for one CSwapCurve.sell call per hop:
+        (amountIn, tokenIn, tokenOut, minAmountOut, params)
+
+        Every hop after the first sells the previous hop's minimum output, so the invocation
+        never tries to sell more than the invoker is guaranteed to hold. The minimum output of
+        each hop is the (re-quoted) output for that conservative input, scaled by `slippage`.
+        """
+        steps = []
+        amount = self.amount_in
+        for edge in self.edges:
+            quote = quoter(edge, amount)
+            if quote is None:
+                raise ValueError(f"Could not quote {edge.pool.name} {edge.pool.pool_address}")
+            min_amount_out = int(quote * slippage)
+            steps.append((amount, edge.token_in, edge.token_out, min_amount_out, edge.params))
+            amount = min_amount_out
+        return steps
+
+
+def encode_sell_steps(cswap_curve, steps: List[tuple]) -> List[bytes]:
+    """Calldata for each step, to pass to Invoker.invoke alongside [cswap_curve] * len(steps)"""
+    return [cswap_curve.sell.encode_input(*step) for step in steps]
+
+
+def quote_onchain(edge: CurveEdge, amount: int) -> Optional[int]:
+    if edge.pool.is_crypto:
+        contract = interface.CurveCryptoPool(edge.pool.pool_address)
+    else:
+        contract = interface.CurvePool(edge.pool.pool_address)
+    try:
+        if edge.underlying:
+            return contract.get_dy_underlying(edge.i, edge.j, amount)
+        return contract.get_dy(edge.i, edge.j, amount)
+    except (VirtualMachineError, ValueError):
+        return None
+
+
+def cached_quoter(quoter: Quoter) -> Quoter:
+    """Memoizes `quoter` per (pool, i, j, underlying, amount)"""
+    cache: Dict[tuple, Optional[int]] = {}
+
+    def quote(edge: CurveEdge, amount: int) -> Optional[int]:
+        key = (edge.pool.pool_address, edge.i, edge.j, edge.underlying, amount)
+        try:
+            return cache[key]
+        except KeyError:
+            result = cache[key] = quoter(edge, amount)
+            return result
+
+    return quote
+
+
+def read_engine(pool: CurvePool):
+    """An offline quote engine for `pool`, from its state at the latest block"""
+    return CurveSnapshot.take([pool]).engine(pool)
+
+
+def local_quoter(engines: Dict[str, object]) -> Quoter:
+    """A `Quoter` over StableSwapPool / CryptoSwapPool engines keyed by pool address
+    Edges of pools without an engine can't be quoted
+    """
+
+    def quote(edge: CurveEdge, amount: int) -> Optional[int]:
+        engine = engines.get(edge.pool.pool_address)
+        if engine is None:
+            return None
+        try:
+            if edge.underlying:
+                return engine.get_dy_underlying(edge.i, edge.j, amount)
+            return engine.get_dy(edge.i, edge.j, amount)
+        except (ValueError, ZeroDivisionError):
+            return None
+
+    return quote
+
+
+class CurveRouter:
+    def __init__(self, chain_id, index: Optional[CurvePoolIndex] = None) -> None:
+        index = index or get_curve_pool_index()
+        self.chain_id = str(chain_id)
+        self.edges: Dict[str, List[CurveEdge]] = {}
+
+        for pool in index.pools(chain_id):
+            for i, j in index.coin_pairs(pool):
+                self._add(CurveEdge(pool, i, j, pool.coins[i], pool.coins[j], False))
+            if pool.is_underlying:
+                for i, j in index.underlying_pairs(pool):
+                    coins = pool.underlying_coins
+                    self._add(CurveEdge(pool, i, j, coins[i], coins[j], True))
+
+    def _add(self, edge: CurveEdge):
+        self.edges.setdefault(edge.token_in, []).append(edge)
+
+    def distances_to(self, token_out: str, max_hops: int) -> Dict[str, int]:
+        """Minimum hop count from every token that reaches `token_out` within `max_hops`
+        The graph is symmetric (every pool pair has edges both ways), so this is a plain BFS
+        """
+        distances = {token_out: 0}
+        queue = deque([token_out])
+        while queue:
+            token = queue.popleft()
+            if distances[token] == max_hops:
+                continue
+            for edge in self.edges.get(token, []):
+                if edge.token_out not in distances:
+                    distances[edge.token_out] = distances[token] + 1
+                    queue.append(edge.token_out)
+        return distances
+
+    def find_routes(
+        self,
+        token_in: str,
+        token_out: str,
+        amount_in: int,
+        quoter: Quoter,
+        max_hops: int = DEFAULT_MAX_HOPS,
+        beam_width: int = DEFAULT_BEAM_WIDTH,
+        limit: int = 1,
+    ) -> List[CurveRoute]:
+        """Best routes (by output amount, at most `limit`) of up to `max_hops` hops
+        Routes never revisit a token or reuse a pool
+        """
+        token_in, token_out = token_in.lower(), token_out.lower()
+        distances = self.distances_to(token_out, max_hops)
+        if token_in not in distances:
+            return []
+
+        # partial routes: (edges, amounts, visited tokens, used pools)
+        frontier: List[Tuple[Tuple[CurveEdge, ...], Tuple[int, ...], Set[str], Set[str]]] = [
+            ((), (amount_in,), {token_in}, set())
+        ]
+        complete: List[CurveRoute] = []
+
+        for hop in range(max_hops):
+            remaining = max_hops - hop - 1
+            candidates: Dict[str, list] = {}
+            for edges, amounts, visited, used in frontier:
+                token = edges[-1].token_out if edges else token_in
+                for edge in self.edges.get(token, []):
+                    if edge.token_out in visited or edge.pool.pool_address in used:
+                        continue
+                    if distances.get(edge.token_out, max_hops + 1) > remaining:
+                        continue
+                    amount_out = quoter(edge, amounts[-1])
+                    if not amount_out:
+                        continue
+                    route = (
+                        edges + (edge,),
+                        amounts + (amount_out,),
+                        visited | {edge.token_out},
+                        used | {edge.pool.pool_address},
+                    )
+                    if edge.token_out == token_out:
+                        complete.append(CurveRoute(route[0], route[1]))
+                    else:
+                        candidates.setdefault(edge.token_out, []).append(route)
+
+            frontier = []
+            for routes in candidates.values():
+                routes.sort(key=lambda route: route[1][-1], reverse=True)
+                frontier.extend(routes[:beam_width])
+            if not frontier:
+                break
+
+        complete.sort(key=lambda route: route.amount_out, reverse=True)
+        return complete[:limit]
+
+    def best_route(
+        self, token_in: str, token_out: str, amount_in: int, quoter: Quoter, **kwargs
+    ) -> Optional[CurveRoute]:
+        routes = self.find_routes(token_in, token_out, amount_in, quoter, limit=1, **kwargs)
+        return routes[0] if routes else None
@@ -0,0 +1,404 @@
+"""Block-pinned Curve pool state snapshots
+
+`CurveSnapshot.take` reads the state of many pools (balances, A, fees, rates, virtual price,
+crypto pool parameters) and the decimals and lending rates of their coins through Multicall3,
+all at one block. Snapshots are stored column-wise, one list per field with one entry per pool
+(or coin), under data/snapshots/curve/<chain id>/<block>.pkl, so tests and tooling can load
+them again and build StableSwap / CryptoSwap engines without a node. On a fork, only snapshots
+up to the fork block are loaded by default: later blocks are local to the session that took them.
+
+A failed read is stored as None. Base pools of metapools are always included.
+"""
+
+import os
+import pickle
+from typing import Dict, Iterable, List, Optional
+
+from brownie import network, web3
+
+from data.chain import last_shared_block
+from data.curve import CurvePool, get_curve_pool_index
+from data.curve_cryptoswap import CryptoSwapPool, CryptoSwapState
+from data.curve_stableswap import (
+    A_PRECISION,
+    ETH_ADDRESS,
+    PRECISION,
+    StableSwapPool,
+    StableSwapState,
+    calibrate,
+)
+from data.multicall import DEFAULT_BATCH_SIZE, Call, aggregate, block_timestamp_call
+from data.yaml_snapshot import atomic_write
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DIR = os.path.join("data", "snapshots", "curve")
+
+# metapools use their cached base pool virtual price for this long
+BASE_CACHE_EXPIRES = 10 * 60
+# stableswap pools are probed with get_dy(0, 1, balances[0] // PROBE_FRACTION)
+PROBE_FRACTION = 1000
+
+# column name -> getter, for every pool / every stableswap pool / every crypto pool
+POOL_VIEWS = {"virtual_price": "get_virtual_price()", "A": "A()", "fee": "fee()"}
+STABLESWAP_VIEWS = {
+    "A_precise": "A_precise()",
+    "offpeg_fee_multiplier": "offpeg_fee_multiplier()",
+    "base_virtual_price": "base_virtual_price()",
+    "base_cache_updated": "base_cache_updated()",
+}
+CRYPTOSWAP_VIEWS = {
+    "gamma": "gamma()",
+    "D": "D()",
+    "mid_fee": "mid_fee()",
+    "out_fee": "out_fee()",
+    "fee_gamma": "fee_gamma()",
+    "future_A_gamma_time": "future_A_gamma_time()",
+}
+# column name -> getter, for coins held by lending pools
+LENDING_VIEWS = {
+    "exchange_rate_stored": "exchangeRateStored()",
+    "supply_rate_per_block": "supplyRatePerBlock()",
+    "accrual_block_number": "accrualBlockNumber()",
+    "price_per_full_share": "getPricePerFullShare()",
+}
+
+
+def snapshot_dir(chain_id, directory=SNAPSHOT_DIR) -> str:
+    return os.path.join(directory, str(chain_id))
+
+
+def snapshot_blocks(chain_id, directory=SNAPSHOT_DIR) -> List[int]:
+    """Blocks with a stored snapshot for `chain_id`, oldest first"""
+    try:
+        names = os.listdir(snapshot_dir(chain_id, directory))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-4]) for name in names if name.endswith(".pkl"))
+
+
+def _is_lending(pool: CurvePool) -> bool:
+    return pool.is_underlying and not pool.is_meta and not pool.is_crypto
+
+
+def _base_pool(pool: CurvePool) -> Optional[CurvePool]:
+    return get_curve_pool_index().pool_for_lp_token(pool.chain_id, pool.coins[-1])
+
+
+def _with_base_pools(pools: Iterable[CurvePool]) -> List[CurvePool]:
+    ordered: Dict[str, CurvePool] = {}
+    for pool in pools:
+        if pool.is_meta:
+            base = _base_pool(pool)
+            if base is not None:
+                ordered.setdefault(base.pool_address, base)
+        ordered.setdefault(pool.pool_address, pool)
+    return list(ordered.values())
+
+
+class _Batch:
+    """Collects calls and routes their results into snapshot columns"""
+
+    def __init__(self) -> None:
+        self.calls: List[Call] = []
+        self.slots: List[tuple] = []
+
+    def add(self, call: Call, columns: Dict[str, list], name: str, row: int, item=None):
+        self.calls.append(call)
+        self.slots.append((columns, name, row, item))
+
+    def run(self, block_number: int, batch_size: int) -> List:
+        results = aggregate(self.calls, block_number, batch_size)
+        for (columns, name, row, item), result in zip(self.slots, results):
+            if item is None:
+                columns[name][row] = result
+            else:
+                columns[name][row][item] = result
+        return results
+
+
+class CurveSnapshot:
+    def __init__(
+        self,
+        chain_id,
+        block_number: int,
+        timestamp: int,
+        pools: List[str],
+        columns: Dict[str, list],
+        coins: List[str],
+        coin_columns: Dict[str, list],
+    ) -> None:
+        self.chain_id = str(chain_id)
+        self.block_number = block_number
+        self.timestamp = timestamp
+        self.pools = pools
+        self.columns = columns
+        self.coins = coins
+        self.coin_columns = coin_columns
+        self._pool_rows = {address: row for row, address in enumerate(pools)}
+        self._coin_rows = {address: row for row, address in enumerate(coins)}
+
+    # reading
+
+    @classmethod
+    def take(
+        cls,
+        pools: Iterable[CurvePool],
+        block_number: Optional[int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> "CurveSnapshot":
+        pools = _with_base_pools(pools)
+        if not pools:
+            raise ValueError("No pools to snapshot")
+        if block_number is None:
+            block_number = web3.eth.block_number
+
+        names = [*POOL_VIEWS, *STABLESWAP_VIEWS, *CRYPTOSWAP_VIEWS]
+        columns: Dict[str, list] = {name: [None] * len(pools) for name in names}
+        columns["balances"] = [[None] * len(pool.coins) for pool in pools]
+        columns["price_scale"] = [
+            [None] * (len(pool.coins) - 1) if pool.is_crypto else None for pool in pools
+        ]
+        columns["total_supply"] = [None] * len(pools)
+        columns["probe_dx"] = [None] * len(pools)
+        columns["probe_dy"] = [None] * len(pools)
+
+        coins = sorted({c for p in pools for c in [*p.coins, *(p.underlying_coins or [])]})
+        lending = {c for p in pools if _is_lending(p) for c in p.coins}
+        coin_columns: Dict[str, list] = {"decimals": [None] * len(coins)}
+        coin_columns.update({name: [None] * len(coins) for name in LENDING_VIEWS})
+
+        batch = _Batch()
+        timestamp = {"timestamp": [None]}
+        batch.add(block_timestamp_call(), timestamp, "timestamp", 0)
+
+        for row, pool in enumerate(pools):
+            address = pool.pool_address
+            balance_signature = f"balances({pool.balance_abi})"
+            for k in range(len(pool.coins)):
+                batch.add(Call.uint(address, balance_signature, k), columns, "balances", row, k)
+            views = {**POOL_VIEWS, **(CRYPTOSWAP_VIEWS if pool.is_crypto else STABLESWAP_VIEWS)}
+            for name, signature in views.items():
+                batch.add(Call.uint(address, signature), columns, name, row)
+            batch.add(Call.uint(pool.lp_token, "totalSupply()"), columns, "total_supply", row)
+            if pool.is_crypto and len(pool.coins) == 2:
+                price_scale = Call.uint(address, "price_scale()")
+                batch.add(price_scale, columns, "price_scale", row, 0)
+            elif pool.is_crypto:
+                for k in range(len(pool.coins) - 1):
+                    price_scale = Call.uint(address, "price_scale(uint256)", k)
+                    batch.add(price_scale, columns, "price_scale", row, k)
+
+        for row, coin in enumerate(coins):
+            if coin == ETH_ADDRESS:
+                coin_columns["decimals"][row] = 18
+                continue
+            batch.add(Call.uint(coin, "decimals()"), coin_columns, "decimals", row)
+            if coin in lending:
+                for name, signature in LENDING_VIEWS.items():
+                    batch.add(Call.uint(coin, signature), coin_columns, name, row)
+
+        batch.run(block_number, batch_size)
+
+        # second round: one get_dy per stableswap pool, to calibrate its rounding
+        probes = _Batch()
+        for row, pool in enumerate(pools):
+            balance = columns["balances"][row][0]
+            if pool.is_crypto or not balance:
+                continue
+            dx = columns["probe_dx"][row] = max(balance // PROBE_FRACTION, 1)
+            signature = f"get_dy({pool.dy_abi},{pool.dy_abi},uint256)"
+            probes.add(Call.uint(pool.pool_address, signature, 0, 1, dx), columns, "probe_dy", row)
+        probes.run(block_number, batch_size)
+
+        return cls(
+            pools[0].chain_id,
+            block_number,
+            timestamp["timestamp"][0],
+            [pool.pool_address for pool in pools],
+            columns,
+            coins,
+            coin_columns,
+        )
+
+    # storage
+
+    def path(self, directory=SNAPSHOT_DIR) -> str:
+        return os.path.join(snapshot_dir(self.chain_id, directory), f"{self.block_number}.pkl")
+
+    def save(self, directory=SNAPSHOT_DIR) -> str:
+        path = self.path(directory)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "chain_id": self.chain_id,
+            "block_number": self.block_number,
+            "timestamp": self.timestamp,
+            "pools": self.pools,
+            "columns": self.columns,
+            "coins": self.coins,
+            "coin_columns": self.coin_columns,
+        }
+        atomic_write(path, pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL))
+        return path
+
+    @classmethod
+    def load(
+        cls,
+        chain_id,
+        block_number: Optional[int] = None,
+        directory=SNAPSHOT_DIR,
+        max_block: Optional[int] = None,
+    ) -> "CurveSnapshot":
+        """Loads the snapshot of `chain_id` at `block_number`
+
+        By default, the latest one at or before `max_block`, which is the fork block on a
+        connected fork.
+        """
+        if block_number is None:
+            if max_block is None and network.show_active():
+                max_block = last_shared_block(web3.eth.block_number)
+            blocks = [
+                block
+                for block in snapshot_blocks(chain_id, directory)
+                if max_block is None or block <= max_block
+            ]
+            if not blocks:
+                raise FileNotFoundError(f"No Curve snapshots for chain {chain_id}")
+            block_number = blocks[-1]
+        path = os.path.join(snapshot_dir(chain_id, directory), f"{block_number}.pkl")
+        with open(path, "rb") as infile:
+            snapshot = pickle.load(infile)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version in {path}")
+        del snapshot["version"]
+        return cls(**snapshot)
+
+    # lookups
+
+    def __contains__(self, pool_address: str) -> bool:
+        return pool_address in self._pool_rows
+
+    def value(self, pool_address: str, column: str):
+        return self.columns[column][self._pool_rows[pool_address]]
+
+    def coin_value(self, coin: str, column: str):
+        return self.coin_columns[column][self._coin_rows[coin]]
+
+    def row(self, pool_address: str) -> dict:
+        row = self._pool_rows[pool_address]
+        return {name: values[row] for name, values in self.columns.items()}
+
+    # engines
+
+    def _require(self, pool: CurvePool, *columns: str) -> dict:
+        row = self.row(pool.pool_address)
+        missing = [name for name in columns if row[name] is None]
+        missing += ["balances"] if None in row["balances"] else []
+        if missing:
+            raise ValueError(f"Snapshot of {pool.name} is missing {', '.join(missing)}")
+        return row
+
+    def _lending_rate(self, coin: str) -> int:
+        """Exchange rate of a wrapped lending coin, as the pool's `_stored_rates` computes it"""
+        rate = self.coin_value(coin, "exchange_rate_stored")
+        if rate is not None:
+            # compound cTokens, accrued to the snapshot block
+            supply_rate = self.coin_value(coin, "supply_rate_per_block")
+            old_block = self.coin_value(coin, "accrual_block_number")
+            return rate + rate * supply_rate * (self.block_number - old_block) // PRECISION
+        rate = self.coin_value(coin, "price_per_full_share")
+        if rate is not None:
+            # yearn yTokens
+            return rate
+        # rebasing (aave) tokens are 1:1 with their underlying
+        return PRECISION
+
+    def _precisions(self, coins: List[str]) -> List[int]:
+        return [10 ** (18 - self.coin_value(coin, "decimals")) for coin in coins]
+
+    def stableswap_state(self, pool: CurvePool) -> StableSwapState:
+        row = self._require(pool, "A", "fee", "total_supply")
+        precisions = self._precisions(pool.coins)
+        underlying_precisions = None
+        base_pool = None
+
+        if pool.is_meta:
+            base = _base_pool(pool)
+            if base is None or base.pool_address not in self:
+                raise ValueError(f"Base pool of {pool.name} is not in the snapshot")
+            base_pool = self.stableswap_state(base)
+            vp_rate = self.value(base.pool_address, "virtual_price")
+            updated = row["base_cache_updated"]
+            if updated is not None and updated > self.timestamp - BASE_CACHE_EXPIRES:
+                vp_rate = row["base_virtual_price"]
+            rates = [precisions[0] * PRECISION, vp_rate]
+        elif _is_lending(pool):
+            underlying_precisions = self._precisions(pool.underlying_coins)
+            rates = [
+                p * self._lending_rate(coin) for p, coin in zip(underlying_precisions, pool.coins)
+            ]
+        else:
+            rates = [p * PRECISION for p in precisions]
+
+        amp, a_precision = row["A_precise"], A_PRECISION
+        if amp is None:
+            amp, a_precision = row["A"], 1
+
+        state = StableSwapState(
+            balances=list(row["balances"]),
+            rates=rates,
+            amp=amp,
+            fee=row["fee"],
+            a_precision=a_precision,
+            total_supply=row["total_supply"],
+            offpeg_fee_multiplier=row["offpeg_fee_multiplier"] or 0,
+            underlying_precisions=underlying_precisions,
+            base_pool=base_pool,
+        )
+        if row["probe_dy"] is not None:
+            if not calibrate(state, row["probe_dy"], 0, 1, row["probe_dx"]):
+                raise ValueError(f"Could not reproduce get_dy of {pool.name} {pool.pool_address}")
+        return state
+
+    def cryptoswap_state(self, pool: CurvePool) -> CryptoSwapState:
+        row = self._require(pool, "A", "gamma", "D", "mid_fee", "out_fee", "fee_gamma")
+        if None in row["price_scale"]:
+            raise ValueError(f"Snapshot of {pool.name} is missing price_scale")
+        return CryptoSwapState(
+            balances=list(row["balances"]),
+            precisions=self._precisions(pool.coins),
+            price_scale=list(row["price_scale"]),
+            A=row["A"],
+            gamma=row["gamma"],
+            D=row["D"],
+            mid_fee=row["mid_fee"],
+            out_fee=row["out_fee"],
+            fee_gamma=row["fee_gamma"],
+            future_A_gamma_time=row["future_A_gamma_time"] or 0,
+        )
+
+    def engine(self, pool: CurvePool):
+        """A StableSwapPool or CryptoSwapPool quoting `pool` at the snapshot block"""
+        if pool.is_crypto:
+            return CryptoSwapPool(self.cryptoswap_state(pool))
+        return StableSwapPool(self.stableswap_state(pool))
+
+    def engines(self, pools: Iterable[CurvePool]) -> Dict[str, object]:
+        """Engines keyed by pool address, skipping pools whose state is incomplete"""
+        engines = {}
+        for pool in pools:
+            try:
+                engines[pool.pool_address] = self.engine(pool)
+            except (ValueError, KeyError, TypeError):
+                continue
+        return engines
+
+
+def read_stableswap_state(pool: CurvePool) -> StableSwapState:
+    """State of a (non crypto) pool at the latest block, calibrated against get_dy"""
+    return CurveSnapshot.take([pool]).stableswap_state(pool)
+
+
+def read_cryptoswap_state(pool: CurvePool) -> CryptoSwapState:
+    """State of a crypto pool at the latest block"""
+    return CurveSnapshot.take([pool]).cryptoswap_state(pool)
@@ -0,0 +1,261 @@
+"""Offline, integer-exact StableSwap quotes
+
+A port of the StableSwap math used by Curve's `get_dy` / `get_dy_underlying`, working from a
+`StableSwapState` snapshot instead of RPC calls. All arithmetic is floor division on Python
+ints, in the same order as the Vyper sources, so quotes match the chain to the wei.
+
+Curve pool generations differ in a few details, captured as fields of the state:
+- `a_precision`: newer pools store A multiplied by 100 (`A_precise()`)
+- `dy_offset`: most pools withhold 1 wei from `dy` for rounding, the oldest ones don't
+- `dp_offset`: the oldest pools add 1 to the `D_P` denominator to avoid division by zero
+- `offpeg_fee_multiplier`: aave-style pools charge a dynamic fee when off peg
+`calibrate` detects the rounding details from one on-chain quote, see data/curve_snapshot.py.
+"""
+
+from dataclasses import dataclass, replace
+from itertools import product
+from typing import List, Optional, Sequence
+
+ETH_ADDRESS = "0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee"
+
+FEE_DENOMINATOR = 10**10
+PRECISION = 10**18
+A_PRECISION = 100  # pools with `A_precise()`
+MAX_ITERATIONS = 255
+
+
+@dataclass
+class StableSwapState:
+    balances: List[int]
+    rates: List[int]  # xp[i] = balances[i] * rates[i] // PRECISION
+    amp: int  # A * a_precision, i.e. `A_precise()` on pools that have it
+    fee: int
+    a_precision: int = 1
+    total_supply: int = 0
+    offpeg_fee_multiplier: int = 0
+    dy_offset: int = 1
+    dp_offset: int = 0
+    # lending pools: 10 ** (18 - decimals) of each underlying coin
+    underlying_precisions: Optional[List[int]] = None
+    # metapools: state of the base pool, whose LP token is the last coin
+    base_pool: Optional["StableSwapState"] = None
+
+    @property
+    def n_coins(self) -> int:
+        return len(self.balances)
+
+
+class StableSwapPool:
+    """Quotes for one pool state. D is computed once and reused for every quote"""
+
+    def __init__(self, state: StableSwapState) -> None:
+        self.state = state
+        self.n = state.n_coins
+        self.xp = self._xp(state.balances)
+        self._D = None
+        self._base = StableSwapPool(state.base_pool) if state.base_pool else None
+
+    # invariant
+
+    def _xp(self, balances: Sequence[int]) -> List[int]:
+        return [b * r // PRECISION for b, r in zip(balances, self.state.rates)]
+
+    def get_D(self, xp: Sequence[int]) -> int:
+        n = self.n
+        a_precision = self.state.a_precision
+        dp_offset = self.state.dp_offset
+        S = sum(xp)
+        if S == 0:
+            return 0
+        D = S
+        Ann = self.state.amp * n
+        for _ in range(MAX_ITERATIONS):
+            D_P = D
+            for x in xp:
+                D_P = D_P * D // (x * n + dp_offset)
+            D_prev = D
+            D = (
+                (Ann * S // a_precision + D_P * n)
+                * D
+                // ((Ann - a_precision) * D // a_precision + (n + 1) * D_P)
+            )
+            if abs(D - D_prev) <= 1:
+                break
+        return D
+
+    @property
+    def D(self) -> int:
+        if self._D is None:
+            self._D = self.get_D(self.xp)
+        return self._D
+
+    def _solve_y(self, S_: int, c: int, D: int) -> int:
+        a_precision = self.state.a_precision
+        Ann = self.state.amp * self.n
+        c = c * D * a_precision // (Ann * self.n)
+        b = S_ + D * a_precision // Ann
+        y = D
+        for _ in range(MAX_ITERATIONS):
+            y_prev = y
+            y = (y * y + c) // (2 * y + b - D)
+            if abs(y - y_prev) <= 1:
+                break
+        return y
+
+    def get_y(self, i: int, j: int, x: int, xp: Sequence[int], D: Optional[int] = None) -> int:
+        """New balance of coin j (in xp units) after coin i's balance becomes x"""
+        if D is None:
+            D = self.get_D(xp)
+        c = D
+        S_ = 0
+        for k in range(self.n):
+            if k == i:
+                _x = x
+            elif k != j:
+                _x = xp[k]
+            else:
+                continue
+            S_ += _x
+            c = c * D // (_x * self.n)
+        return self._solve_y(S_, c, D)
+
+    def get_y_D(self, i: int, xp: Sequence[int], D: int) -> int:
+        """Balance of coin i (in xp units) that gives invariant D"""
+        c = D
+        S_ = 0
+        for k in range(self.n):
+            if k == i:
+                continue
+            S_ += xp[k]
+            c = c * D // (xp[k] * self.n)
+        return self._solve_y(S_, c, D)
+
+    def _dynamic_fee(self, xpi: int, xpj: int) -> int:
+        fee = self.state.fee
+        feemul = self.state.offpeg_fee_multiplier
+        if feemul <= FEE_DENOMINATOR:
+            return fee
+        xps2 = (xpi + xpj) ** 2
+        return (
+            feemul * fee // ((feemul - FEE_DENOMINATOR) * 4 * xpi * xpj // xps2 + FEE_DENOMINATOR)
+        )
+
+    def _fee(self, dy: int, xp: Sequence[int], i: int, j: int, x: int, y: int) -> int:
+        if self.state.offpeg_fee_multiplier:
+            fee = self._dynamic_fee((xp[i] + x) // 2, (xp[j] + y) // 2)
+        else:
+            fee = self.state.fee
+        return fee * dy // FEE_DENOMINATOR
+
+    # quotes
+
+    def _dy(self, i: int, j: int, x: int, scale_out) -> int:
+        y = self.get_y(i, j, x, self.xp, self.D)
+        dy = self.xp[j] - y - self.state.dy_offset
+        if dy < 0:
+            raise ValueError("Swap would revert")
+        dy = scale_out(dy)
+        return dy - self._fee(dy, self.xp, i, j, x, y)
+
+    def get_dy(self, i: int, j: int, dx: int) -> int:
+        rates = self.state.rates
+        x = self.xp[i] + dx * rates[i] // PRECISION
+        return self._dy(i, j, x, lambda dy: dy * PRECISION // rates[j])
+
+    def get_dy_many(self, i: int, j: int, amounts: Sequence[int]) -> List[int]:
+        return [self.get_dy(i, j, dx) for dx in amounts]
+
+    def get_dy_underlying(self, i: int, j: int, dx: int) -> int:
+        if self._base is not None:
+            return self._get_dy_underlying_meta(i, j, dx)
+        precisions = self.state.underlying_precisions
+        if precisions is None:
+            raise ValueError("Pool has no underlying coins")
+        x = self.xp[i] + dx * precisions[i]
+        return self._dy(i, j, x, lambda dy: dy // precisions[j])
+
+    def get_dy_underlying_many(self, i: int, j: int, amounts: Sequence[int]) -> List[int]:
+        return [self.get_dy_underlying(i, j, dx) for dx in amounts]
+
+    def _get_dy_underlying_meta(self, i: int, j: int, dx: int) -> int:
+        # underlying coins are [coin 0 of the metapool, *base pool coins]
+        base = self._base
+        max_coin = self.n - 1
+        rates = self.state.rates
+        vp_rate = rates[max_coin]
+
+        base_i, base_j, meta_i, meta_j = 0, 0, 0, 0
+        if i != 0:
+            base_i, meta_i = i - max_coin, 1
+        if j != 0:
+            base_j, meta_j = j - max_coin, 1
+
+        if i == 0:
+            x = self.xp[i] + dx * (rates[0] // PRECISION)
+        elif j == 0:
+            base_inputs = [0] * base.n
+            base_inputs[base_i] = dx
+            x = base.calc_token_amount(base_inputs, True) * vp_rate // PRECISION
+            # accounts for the base pool's deposit fee approximately, like the pool does
+            x -= x * base.state.fee // (2 * FEE_DENOMINATOR)
+            x += self.xp[max_coin]
+        else:
+            return base.get_dy(base_i, base_j, dx)
+
+        y = self.get_y(meta_i, meta_j, x, self.xp, self.D)
+        dy = self.xp[meta_j] - y - 1
+        dy = dy - self.state.fee * dy // FEE_DENOMINATOR
+
+        if j == 0:
+            return dy * PRECISION // rates[0]
+        return base.calc_withdraw_one_coin(dy * PRECISION // vp_rate, base_j)
+
+    # liquidity
+
+    def calc_token_amount(self, amounts: Sequence[int], is_deposit: bool) -> int:
+        D0 = self.D
+        sign = 1 if is_deposit else -1
+        balances = [b + sign * a for b, a in zip(self.state.balances, amounts)]
+        D1 = self.get_D(self._xp(balances))
+        diff = D1 - D0 if is_deposit else D0 - D1
+        return diff * self.state.total_supply // D0
+
+    def calc_withdraw_one_coin(self, token_amount: int, i: int) -> int:
+        n = self.n
+        rates = self.state.rates
+        fee = self.state.fee * n // (4 * (n - 1))
+        xp = self.xp
+        D0 = self.D
+        D1 = D0 - token_amount * D0 // self.state.total_supply
+        new_y = self.get_y_D(i, xp, D1)
+
+        xp_reduced = list(xp)
+        for k in range(n):
+            if k == i:
+                dx_expected = xp[k] * D1 // D0 - new_y
+            else:
+                dx_expected = xp[k] - xp[k] * D1 // D0
+            xp_reduced[k] -= fee * dx_expected // FEE_DENOMINATOR
+
+        dy = xp_reduced[i] - self.get_y_D(i, xp_reduced, D1)
+        return (dy - 1) * PRECISION // rates[i]
+
+
+def quote(state: StableSwapState, i: int, j: int, dx: int, underlying: bool = False) -> int:
+    pool = StableSwapPool(state)
+    return pool.get_dy_underlying(i, j, dx) if underlying else pool.get_dy(i, j, dx)
+
+
+def calibrate(state: StableSwapState, onchain_dy: int, i: int, j: int, dx: int) -> bool:
+    """Picks the `dy_offset` / `dp_offset` variant that reproduces `onchain_dy`
+    Returns False (leaving the state untouched) if no variant matches
+    """
+    for dy_offset, dp_offset in product((1, 0), (0, 1)):
+        candidate = replace(state, dy_offset=dy_offset, dp_offset=dp_offset)
+        try:
+            if StableSwapPool(candidate).get_dy(i, j, dx) == onchain_dy:
+                state.dy_offset, state.dp_offset = dy_offset, dp_offset
+                return True
+        except (ValueError, ZeroDivisionError):
+            continue
+    return False
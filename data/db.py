@@ -0,0 +1,30 @@
+"""SQLite helpers for local, machine-specific state (quarantined pools, caches)
+
+Databases live in data/db/ (gitignored). Connections use WAL journaling and a busy timeout so
+that several pytest workers or scripts can read and write the same database concurrently.
+"""
+
+import os
+import sqlite3
+
+DB_DIR = os.path.join("data", "db")
+BUSY_TIMEOUT_MS = 30_000
+
+
+def db_path(name: str, directory=DB_DIR) -> str:
+    return os.path.join(directory, f"{name}.sqlite3")
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open (creating if needed) the database at `path`
+    Rows are returned as sqlite3.Row. Use the connection as a context manager to commit
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    connection.row_factory = sqlite3.Row
+    connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    return connection
@@ -0,0 +1,132 @@
+"""Persistent cache of token mint strategies, shared by every worker and network
+
+`get_mint_strategy` (data/test_helpers.py) discovers how to mint a token on a fork by tracing
+and poking storage, which is slow. Its results are kept in data/db/mint_strategies.sqlite3,
+keyed by chain, fork block and token, so each token is discovered once per fork no matter how
+many pytest workers or networks run at the same time. Writes only ever insert: when two workers
+discover the same token concurrently, the first result stored wins and the other is discarded.
+
+Usage: `python -m data.mint_cache list [--chain 1]` or
+`python -m data.mint_cache invalidate [--chain 1] [--fork-block N] [--token 0x...]`
+"""
+
+import argparse
+import json
+import time
+from typing import Any, List, Optional, Tuple
+
+from tabulate import tabulate
+
+from data.db import connect, db_path
+
+MINT_CACHE_DB_PATH = db_path("mint_strategies")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mint_strategies (
+    chain_id TEXT NOT NULL,
+    fork_block INTEGER NOT NULL,
+    token TEXT NOT NULL,
+    strategy INTEGER NOT NULL,
+    params TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (chain_id, fork_block, token)
+)
+"""
+
+
+class MintCache:
+    def __init__(self, path=MINT_CACHE_DB_PATH) -> None:
+        self.connection = connect(path)
+        with self.connection:
+            self.connection.execute(SCHEMA)
+
+    def get(self, chain_id, fork_block: int, token: str) -> Optional[Tuple[int, Any]]:
+        """(strategy, params) stored for the token, params as decoded from JSON"""
+        row = self.connection.execute(
+            """
+            SELECT strategy, params FROM mint_strategies
+            WHERE chain_id = ? AND fork_block = ? AND token = ?
+            """,
+            (str(chain_id), fork_block, token.lower()),
+        ).fetchone()
+        if row is None:
+            return None
+        return row["strategy"], json.loads(row["params"])
+
+    def put(self, chain_id, fork_block: int, token: str, strategy: int, params: Any):
+        """Store a discovered strategy, unless another process stored one first"""
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT OR IGNORE INTO mint_strategies
+                    (chain_id, fork_block, token, strategy, params, created)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    str(chain_id),
+                    fork_block,
+                    token.lower(),
+                    strategy,
+                    json.dumps(params),
+                    time.time(),
+                ),
+            )
+
+    def entries(self, chain_id=None) -> List[dict]:
+        query = "SELECT * FROM mint_strategies"
+        args: tuple = ()
+        if chain_id is not None:
+            query += " WHERE chain_id = ?"
+            args = (str(chain_id),)
+        query += " ORDER BY chain_id, fork_block, token"
+        return [dict(row) for row in self.connection.execute(query, args)]
+
+    def invalidate(
+        self, chain_id=None, fork_block: Optional[int] = None, token: Optional[str] = None
+    ) -> int:
+        """Delete the entries matching every given key (all entries if none is given)"""
+        conditions, args = [], []
+        for column, value in (
+            ("chain_id", None if chain_id is None else str(chain_id)),
+            ("fork_block", fork_block),
+            ("token", None if token is None else token.lower()),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                args.append(value)
+        query = "DELETE FROM mint_strategies"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self.connection:
+            return self.connection.execute(query, args).rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m data.mint_cache")
+    parser.add_argument("--db", default=MINT_CACHE_DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="list cached mint strategies")
+    list_parser.add_argument("--chain", help="only this chain id")
+
+    invalidate_parser = commands.add_parser("invalidate", help="delete cached mint strategies")
+    invalidate_parser.add_argument("--chain", help="only this chain id")
+    invalidate_parser.add_argument("--fork-block", type=int, help="only this fork block")
+    invalidate_parser.add_argument("--token", help="only this token")
+
+    args = parser.parse_args(argv)
+    cache = MintCache(args.db)
+
+    if args.command == "list":
+        rows = [
+            [e["chain_id"], e["fork_block"], e["token"], e["strategy"], e["params"]]
+            for e in cache.entries(args.chain)
+        ]
+        print(tabulate(rows, headers=["chain", "fork block", "token", "strategy", "params"]))
+    else:
+        count = cache.invalidate(args.chain, args.fork_block, args.token)
+        print(f"Invalidated {count} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Precomputed mint strategies of every known token, by chain
+
+data/mint_strategies.yaml holds, for each fork network, how `mint_tokens_for` mints every token
+of data/chains, every Curve coin and underlying coin of data/curve.yaml and every Aave reserve
+and aToken: a storage write to the balance entry described by a `BalanceLayout` (BALANCES), a
+transfer from a benefactor (BENEFACTOR) or a native balance (NATIVE). It is generated by
+`make mint-strategies` (see scripts/mint_strategies.py), which makes `get_mint_strategy` a
+lookup; tokens missing from it are still discovered on the fork.
+
+The file carries a format version: a table written in another version is ignored as a whole.
+Each chain's entries also record the fork block they were swept at, and only apply to forks of
+that block (see network-config.yaml): token implementations change over time.
+"""
+
+import os
+import warnings
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from data.aave.tokens import get_aave_tokens
+from data.chain import get_registry
+from data.curve import get_curve_pool_index
+from data.yaml_snapshot import load_yaml
+
+MINT_STRATEGIES_PATH = os.path.join("data", "mint_strategies.yaml")
+MINT_STRATEGIES_VERSION = 1
+
+AAVE_VERSIONS = ("2", "3")
+
+
+class BalanceLayout(NamedTuple):
+    """Where a token keeps the balance of a user: the params of MintStrategy.BALANCES
+
+    The balance is in the storage of `contract`, at the user's entry of the mapping in `slot`:
+    keccak(user . slot) for Solidity, keccak(slot . user) for Vyper. It takes the low `bits` of
+    that word (the rest of a packed struct is left as it is), and for shares-based tokens (stETH,
+    Aave aTokens) it is a number of shares that balanceOf converts.
+    """
+
+    contract: str
+    slot: int
+    vyper: bool = False
+    bits: int = 256
+    shares: bool = False
+
+
+_LAYOUT_DEFAULTS = BalanceLayout._field_defaults
+
+
+def to_entry(strategy: str, params: Any) -> Dict[str, Any]:
+    """Table entry of a (MintStrategy name, params) pair"""
+    if strategy == "BALANCES":
+        layout = BalanceLayout(*params)
+        entry = {"strategy": strategy, "contract": layout.contract.lower(), "slot": layout.slot}
+        for field, default in _LAYOUT_DEFAULTS.items():
+            if getattr(layout, field) != default:
+                entry[field] = getattr(layout, field)
+        return entry
+    if strategy == "BENEFACTOR":
+        return {"strategy": strategy, "benefactor": params.lower()}
+    return {"strategy": strategy}
+
+
+def from_entry(entry: Dict[str, Any]) -> Tuple[str, Any]:
+    """(MintStrategy name, params) of a table entry"""
+    strategy = entry["strategy"]
+    if strategy == "BALANCES":
+        return strategy, BalanceLayout(
+            entry["contract"],
+            entry["slot"],
+            **{field: entry.get(field, default) for field, default in _LAYOUT_DEFAULTS.items()},
+        )
+    if strategy == "BENEFACTOR":
+        return strategy, entry["benefactor"]
+    return strategy, None
+
+
+def read_table(path: str = MINT_STRATEGIES_PATH) -> Dict[int, Dict[str, Any]]:
+    """chain id -> {"network", "fork_block", "tokens": token -> entry}, empty if the file is
+    missing or in another version
+    """
+    if not os.path.exists(path):
+        return {}
+    data = load_yaml(path) or {}
+    if data.get("version") != MINT_STRATEGIES_VERSION:
+        return {}
+    return data.get("chains") or {}
+
+
+@lru_cache(maxsize=None)
+def load_table(path: str = MINT_STRATEGIES_PATH) -> Dict[int, Dict[str, Any]]:
+    """`read_table`, read once per process"""
+    return read_table(path)
+
+
+def lookup_mint_strategy(chain_id, fork_block: int, token: str) -> Optional[Tuple[str, Any]]:
+    """(MintStrategy name, params) of `token` on a fork of `fork_block`, None if it isn't in the
+    table or the table was swept at another block
+    """
+    chain = load_table().get(int(chain_id), {})
+    if chain.get("fork_block") != fork_block:
+        if chain:
+            warnings.warn(
+                f"{MINT_STRATEGIES_PATH} was swept at block {chain.get('fork_block')} of chain "
+                f"{chain_id}, not at the fork block {fork_block}: ignoring it"
+            )
+        return None
+    entry = chain.get("tokens", {}).get(token.lower())
+    return None if entry is None else from_entry(entry)
+
+
+def sweep_tokens(chain_id) -> List[str]:
+    """Every token of a chain that tests may mint, lowercased and sorted"""
+    tokens = {token.address for token in get_registry().chain(chain_id).tokens}
+    index = get_curve_pool_index()
+    tokens.update(index.coins(chain_id))
+    tokens.update(index.underlying_coins(chain_id))
+    for version in AAVE_VERSIONS:
+        for reserve in get_aave_tokens(str(chain_id), version):
+            tokens.update((reserve.address, reserve.aTokenAddress))
+    return sorted({token.lower() for token in tokens})
+
+
+def merge_chain(
+    table: Dict[int, Dict[str, Any]],
+    chain_id,
+    network: str,
+    fork_block: int,
+    strategies: Iterable[Tuple[str, str, Any]],
+) -> Dict[int, Dict[str, Any]]:
+    """`table` with the entries of one chain replaced by `strategies` (token, name, params)"""
+    table = dict(table)
+    table[int(chain_id)] = {
+        "network": network,
+        "fork_block": fork_block,
+        "tokens": {
+            token.lower(): to_entry(strategy, params)
+            for token, strategy, params in sorted(strategies)
+        },
+    }
+    return table
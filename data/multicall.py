@@ -0,0 +1,103 @@
+"""Batched view calls through Multicall3
+
+Multicall3 is deployed at the same address on every chain we support. `aggregate` packs
+`Call`s into `aggregate3` batches with `allowFailure` set, so one reverting call doesn't fail
+the whole batch; failed (or undecodable) calls come back as None. All batches of one
+`aggregate` run against the same block.
+
+The multicall itself goes through a web3 contract rather than a brownie one: brownie traces
+reverting calls, which is slow on forks (see UniswapV3Quoter in the uniswap v3 tests).
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence, Union
+
+from brownie import interface, web3
+from eth_utils import to_checksum_address
+
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+DEFAULT_BATCH_SIZE = 500
+
+BlockIdentifier = Union[int, str]
+
+
+def _decode_uint(data: bytes) -> int:
+    if len(data) != 32:
+        raise ValueError("Not a uint256")
+    return int.from_bytes(data, "big")
+
+
+@dataclass(frozen=True)
+class Call:
+    target: str
+    calldata: bytes
+    decode: Callable[[bytes], Any]
+
+    @classmethod
+    def method(cls, method, *args) -> "Call":
+        """A call of a brownie contract method, e.g. `Call.method(token.decimals)`"""
+        return cls(
+            method._address,
+            bytes.fromhex(method.encode_input(*args)[2:]),
+            lambda data: method.decode_output("0x" + data.hex()),
+        )
+
+    @classmethod
+    def uint(cls, target: str, signature: str, *args: int) -> "Call":
+        """A call of a view returning uint256, for getters without an ABI at hand"""
+        return cls(target, calldata(signature, *args), _decode_uint)
+
+
+def calldata(signature: str, *args: int) -> bytes:
+    """Calldata of `signature` with integer arguments (uint or int, as two's complement)"""
+    data = bytes(web3.keccak(text=signature)[:4])
+    return data + b"".join((arg % (1 << 256)).to_bytes(32, "big") for arg in args)
+
+
+def decode_words(data: bytes) -> List[int]:
+    """Return data split into 32-byte words, as unsigned ints"""
+    if not data or len(data) % 32:
+        raise ValueError("Not a sequence of words")
+    return [int.from_bytes(data[i : i + 32], "big") for i in range(0, len(data), 32)]
+
+
+def to_signed(word: int, bits: int = 256) -> int:
+    """A two's complement word as a signed int of `bits` bits"""
+    word &= (1 << bits) - 1
+    return word - (1 << bits) if word >> (bits - 1) else word
+
+
+def multicall():
+    return web3.eth.contract(address=MULTICALL3_ADDRESS, abi=interface.Multicall3.abi)
+
+
+def block_timestamp_call() -> Call:
+    return Call.uint(MULTICALL3_ADDRESS, "getCurrentBlockTimestamp()")
+
+
+def _decode(call: Call, success: bool, data: bytes) -> Optional[Any]:
+    if not success or not data:
+        return None
+    try:
+        return call.decode(bytes(data))
+    except Exception:
+        return None
+
+
+def aggregate(
+    calls: Sequence[Call],
+    block_identifier: Optional[BlockIdentifier] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> List[Optional[Any]]:
+    """Results of `calls`, in order, with None for calls that reverted"""
+    if block_identifier is None:
+        block_identifier = web3.eth.block_number
+    aggregate3 = multicall().functions.aggregate3
+    results: List[Optional[Any]] = []
+    for start in range(0, len(calls), batch_size):
+        batch = calls[start : start + batch_size]
+        returned = aggregate3(
+            [(to_checksum_address(c.target), True, c.calldata) for c in batch]
+        ).call(block_identifier=block_identifier)
+        results.extend(_decode(c, success, data) for c, (success, data) in zip(batch, returned))
+    return results
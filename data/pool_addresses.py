@@ -0,0 +1,223 @@
+"""Uniswap V2 pair and V3 pool addresses, derived offline
+
+Pairs and pools are deployed by their factory with CREATE2, salted with the sorted tokens (and
+the fee tier for V3), so their addresses follow from the factory address and the init code hash
+of the pair / pool contract, with no `getPair` / `getPool` call. `DEPLOYERS` lists both for the
+venues of data/chains whose hash has been checked against their factory; venues missing from it
+(e.g. sushiswap) still need the factory lookup.
+
+Derived addresses are kept in an LRU cache. data/pool_addresses.yaml optionally holds them
+precomputed for every token combination of data/chains (see scripts/pool_addresses.py), and is
+consulted first. A derived address only has code if the pair or pool was actually created.
+"""
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from eth_utils import keccak
+
+from data.yaml_snapshot import load_yaml
+from helpers.addresses import get_create2_address
+
+POOL_ADDRESSES_PATH = os.path.join("data", "pool_addresses.yaml")
+ADDRESS_CACHE_SIZE = 1 << 16
+
+V2 = "v2"
+V3 = "v3"
+V3_FEE_TIERS = (100, 500, 3000, 10000)
+
+UNISWAPV2_PAIR_INIT_CODE_HASH = "0x96e8ac4277198ff8b6f785478aa9a39f403cb768dd02cbee326c3e7da348845f"
+UNISWAPV3_POOL_INIT_CODE_HASH = "0xe34f199b19b2b4f47f68442619d555527d244f78a3297ea89325f843f87b8b54"
+UNISWAPV2_FACTORY = "0x5c69bee701ef814a2b6a3edd4b1652cb9cc5aa6f"
+UNISWAPV3_FACTORY = "0x1f98431c8ad98523631ae4a59f267346ea31f984"
+
+
+@dataclass(frozen=True)
+class Deployer:
+    venue: str  # as in data/chains
+    kind: str  # V2 or V3
+    factory: str  # lowercased
+    init_code_hash: str
+
+
+_UNISWAP_V3 = Deployer("uniswap_v3", V3, UNISWAPV3_FACTORY, UNISWAPV3_POOL_INIT_CODE_HASH)
+
+# by chain id
+DEPLOYERS: Dict[int, Tuple[Deployer, ...]] = {
+    1: (Deployer("uniswap", V2, UNISWAPV2_FACTORY, UNISWAPV2_PAIR_INIT_CODE_HASH), _UNISWAP_V3),
+    5: (Deployer("uniswap", V2, UNISWAPV2_FACTORY, UNISWAPV2_PAIR_INIT_CODE_HASH), _UNISWAP_V3),
+    10: (_UNISWAP_V3,),
+    56: (
+        Deployer(
+            "pancakeswap",
+            V2,
+            "0xca143ce32fe78f1f7019d7d551a6402fc5350c73",
+            "0x00fb7f630766e6a796048ea87d01acd3068e8ff67d078148a3fa3f4a84f69bd5",
+        ),
+    ),
+    137: (
+        Deployer(
+            "quickswap",
+            V2,
+            "0x5757371414417b8c6caad45baef941abc7d3ab32",
+            UNISWAPV2_PAIR_INIT_CODE_HASH,
+        ),
+        _UNISWAP_V3,
+    ),
+    250: (
+        Deployer(
+            "spookyswap",
+            V2,
+            "0x152ee697f2e276fa89e96742e9bb9ab1f2e61be3",
+            "0xcdf2deca40a0bd56de8e3ce5c7df6727e5b1bf2ac96f283fa9c4b3e6b42ea9d2",
+        ),
+    ),
+    42161: (_UNISWAP_V3,),
+    43114: (
+        Deployer(
+            "trader_joe",
+            V2,
+            "0x9ad6c38be94206ca50bb0d90783181662f0cfa10",
+            "0x0bbca9af0511ad1a1da383135cf3a8d2ac620e549ef9f6ae3a4c33c2fed0af91",
+        ),
+    ),
+}
+
+
+def deployers(chain_id, kind: Optional[str] = None) -> List[Deployer]:
+    return [d for d in DEPLOYERS.get(int(chain_id), ()) if kind is None or d.kind == kind]
+
+
+def deployer(chain_id, venue: str) -> Optional[Deployer]:
+    return next((d for d in DEPLOYERS.get(int(chain_id), ()) if d.venue == venue), None)
+
+
+def sort_tokens(token_a: str, token_b: str) -> Tuple[str, str]:
+    token_a, token_b = token_a.lower(), token_b.lower()
+    if token_a == token_b:
+        raise ValueError("Identical addresses")
+    return (token_a, token_b) if token_a < token_b else (token_b, token_a)
+
+
+def _table_key(token0: str, token1: str, fee: Optional[int] = None) -> str:
+    return f"{token0}:{token1}" if fee is None else f"{token0}:{token1}:{fee}"
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def _pair_address(factory: str, token0: str, token1: str, init_code_hash: str) -> str:
+    salt = keccak(bytes.fromhex(token0[2:]) + bytes.fromhex(token1[2:]))
+    return get_create2_address(factory, "0x" + salt.hex(), init_code_hash).lower()
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def _pool_address(factory: str, token0: str, token1: str, fee: int, init_code_hash: str) -> str:
+    # abi.encode(token0, token1, fee)
+    encoded = b"".join(
+        value.to_bytes(32, "big") for value in (int(token0, 16), int(token1, 16), fee)
+    )
+    salt = keccak(encoded)
+    return get_create2_address(factory, "0x" + salt.hex(), init_code_hash).lower()
+
+
+def derive_pair_address(
+    factory: str, token_a: str, token_b: str, init_code_hash: str = UNISWAPV2_PAIR_INIT_CODE_HASH
+) -> str:
+    """UniswapV2Library.pairFor"""
+    return _pair_address(factory.lower(), *sort_tokens(token_a, token_b), init_code_hash)
+
+
+def derive_pool_address(
+    factory: str,
+    token_a: str,
+    token_b: str,
+    fee: int,
+    init_code_hash: str = UNISWAPV3_POOL_INIT_CODE_HASH,
+) -> str:
+    """PoolAddress.computeAddress"""
+    return _pool_address(factory.lower(), *sort_tokens(token_a, token_b), fee, init_code_hash)
+
+
+@lru_cache(maxsize=None)
+def load_table(path: str = POOL_ADDRESSES_PATH) -> Dict[int, Dict[str, Dict[str, str]]]:
+    """The precomputed addresses: chain id -> venue -> "token0:token1[:fee]" -> address"""
+    if not os.path.exists(path):
+        return {}
+    return load_yaml(path) or {}
+
+
+def _lookup(chain_id, venue: str, key: str) -> Optional[str]:
+    return load_table().get(int(chain_id), {}).get(venue, {}).get(key)
+
+
+def pair_address(chain_id, venue: str, token_a: str, token_b: str) -> str:
+    """Address of the `venue` pair of two tokens, raises ValueError for unknown venues"""
+    d = deployer(chain_id, venue)
+    if d is None or d.kind != V2:
+        raise ValueError(f"No Uniswap V2 deployer {venue} on chain {chain_id}")
+    token0, token1 = sort_tokens(token_a, token_b)
+    return _lookup(chain_id, venue, _table_key(token0, token1)) or derive_pair_address(
+        d.factory, token0, token1, d.init_code_hash
+    )
+
+
+def pool_address(chain_id, token_a: str, token_b: str, fee: int, venue: str = "uniswap_v3") -> str:
+    """Address of the `venue` pool of two tokens and a fee tier"""
+    d = deployer(chain_id, venue)
+    if d is None or d.kind != V3:
+        raise ValueError(f"No Uniswap V3 deployer {venue} on chain {chain_id}")
+    token0, token1 = sort_tokens(token_a, token_b)
+    return _lookup(chain_id, venue, _table_key(token0, token1, fee)) or derive_pool_address(
+        d.factory, token0, token1, fee, d.init_code_hash
+    )
+
+
+def candidate_pairs(chain_id, tokens: Iterable[str]) -> Dict[Tuple[str, str, str], str]:
+    """(venue, token0, token1) -> pair address, for every combination of `tokens`"""
+    pairs = sorted(
+        {sort_tokens(a, b) for a, b in combinations(tokens, 2) if a.lower() != b.lower()}
+    )
+    return {
+        (d.venue, token0, token1): pair_address(chain_id, d.venue, token0, token1)
+        for d in deployers(chain_id, V2)
+        for token0, token1 in pairs
+    }
+
+
+def candidate_pools(
+    chain_id, tokens: Iterable[str], fees: Sequence[int] = V3_FEE_TIERS
+) -> Dict[Tuple[str, str, str, int], str]:
+    """(venue, token0, token1, fee) -> pool address, for every combination of `tokens` and fees"""
+    pairs = sorted(
+        {sort_tokens(a, b) for a, b in combinations(tokens, 2) if a.lower() != b.lower()}
+    )
+    return {
+        (d.venue, token0, token1, fee): pool_address(chain_id, token0, token1, fee, d.venue)
+        for d in deployers(chain_id, V3)
+        for token0, token1 in pairs
+        for fee in fees
+    }
+
+
+def build_table(tokens_by_chain: Dict[int, Sequence[str]]) -> Dict[int, Dict[str, Dict[str, str]]]:
+    """Derived addresses of every pair and pool between the tokens of each chain"""
+    table: Dict[int, Dict[str, Dict[str, str]]] = {}
+    for chain_id, tokens in sorted(tokens_by_chain.items()):
+        pairs = sorted(
+            {sort_tokens(a, b) for a, b in combinations(tokens, 2) if a.lower() != b.lower()}
+        )
+        for d in deployers(chain_id):
+            venue = table.setdefault(int(chain_id), {}).setdefault(d.venue, {})
+            for token0, token1 in pairs:
+                if d.kind == V2:
+                    venue[_table_key(token0, token1)] = derive_pair_address(
+                        d.factory, token0, token1, d.init_code_hash
+                    )
+                else:
+                    for fee in V3_FEE_TIERS:
+                        venue[_table_key(token0, token1, fee)] = derive_pool_address(
+                            d.factory, token0, token1, fee, d.init_code_hash
+                        )
+    return table
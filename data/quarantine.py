@@ -0,0 +1,188 @@
+"""Persistent quarantine of Curve pools that fail integration tests
+
+Failures recorded by `tests/conftest.py` are kept in data/db/quarantine.sqlite3, keyed by chain,
+fork block, pool and failure class, so later runs against the same fork can act on them.
+`CURVE_QUARANTINE` selects what collection does with quarantined pools:
+- unset: run everything (failures are still recorded)
+- `skip`: deselect them
+- `last`: run them after everything else
+- `verify`: run only them, and only if not verified within `CURVE_QUARANTINE_VERIFY_AGE`
+  seconds (default one day); entries of pools that then pass are cleared
+
+Usage: `python -m data.quarantine list [--chain 1]` or
+`python -m data.quarantine expire (--days N | --all) [--chain 1]`
+"""
+
+import argparse
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from tabulate import tabulate
+
+from data.db import connect, db_path
+
+QUARANTINE_DB_PATH = db_path("quarantine")
+
+# failure classes
+BAD_POOL = "bad_pool"  # the pool reverts or quotes wrongly
+BAD_TOKEN = "bad_token"  # a coin of the pool can't be minted (see BenefactorError)
+FAILURE_CLASSES = (BAD_POOL, BAD_TOKEN)
+
+MODES = ("skip", "last", "verify")
+DEFAULT_VERIFY_AGE = 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quarantine (
+    chain_id TEXT NOT NULL,
+    fork_block INTEGER NOT NULL,
+    pool TEXT NOT NULL,
+    failure TEXT NOT NULL,
+    name TEXT,
+    nodeid TEXT,
+    failures INTEGER NOT NULL DEFAULT 1,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_verified REAL,
+    PRIMARY KEY (chain_id, fork_block, pool, failure)
+)
+"""
+
+
+class Quarantine:
+    def __init__(self, path=QUARANTINE_DB_PATH) -> None:
+        self.connection = connect(path)
+        with self.connection:
+            self.connection.execute(SCHEMA)
+
+    def record(
+        self,
+        chain_id,
+        fork_block: int,
+        pool: str,
+        failure: str,
+        name: Optional[str] = None,
+        nodeid: Optional[str] = None,
+    ):
+        if failure not in FAILURE_CLASSES:
+            raise ValueError(f"Unknown failure class {failure}")
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO quarantine
+                    (chain_id, fork_block, pool, failure, name, nodeid, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (chain_id, fork_block, pool, failure) DO UPDATE SET
+                    failures = failures + 1, last_seen = excluded.last_seen,
+                    nodeid = excluded.nodeid
+                """,
+                (str(chain_id), fork_block, pool, failure, name, nodeid, now, now),
+            )
+
+    def pools(self, chain_id, fork_block: int) -> Dict[str, Set[str]]:
+        """Quarantined pools at this fork, with their failure classes"""
+        rows = self.connection.execute(
+            "SELECT pool, failure FROM quarantine WHERE chain_id = ? AND fork_block = ?",
+            (str(chain_id), fork_block),
+        )
+        result: Dict[str, Set[str]] = {}
+        for row in rows:
+            result.setdefault(row["pool"], set()).add(row["failure"])
+        return result
+
+    def due_for_verification(self, chain_id, fork_block: int, max_age: float) -> Set[str]:
+        """Quarantined pools not verified in the last `max_age` seconds"""
+        rows = self.connection.execute(
+            """
+            SELECT DISTINCT pool FROM quarantine
+            WHERE chain_id = ? AND fork_block = ?
+                AND (last_verified IS NULL OR last_verified < ?)
+            """,
+            (str(chain_id), fork_block, time.time() - max_age),
+        )
+        return {row["pool"] for row in rows}
+
+    def mark_verified(self, chain_id, fork_block: int, pools: Iterable[str]):
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                """
+                UPDATE quarantine SET last_verified = ?
+                WHERE chain_id = ? AND fork_block = ? AND pool = ?
+                """,
+                [(now, str(chain_id), fork_block, pool) for pool in pools],
+            )
+
+    def clear(self, chain_id, fork_block: int, pools: Iterable[str]):
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM quarantine WHERE chain_id = ? AND fork_block = ? AND pool = ?",
+                [(str(chain_id), fork_block, pool) for pool in pools],
+            )
+
+    def entries(self, chain_id=None) -> List[dict]:
+        query = "SELECT * FROM quarantine"
+        args: tuple = ()
+        if chain_id is not None:
+            query += " WHERE chain_id = ?"
+            args = (str(chain_id),)
+        query += " ORDER BY chain_id, fork_block, name, failure"
+        return [dict(row) for row in self.connection.execute(query, args)]
+
+    def expire(self, older_than: Optional[float] = None, chain_id=None) -> int:
+        """Delete entries last seen more than `older_than` seconds ago (all if None)"""
+        query = "DELETE FROM quarantine WHERE last_seen < ?"
+        args: list = [time.time() - older_than if older_than is not None else float("inf")]
+        if chain_id is not None:
+            query += " AND chain_id = ?"
+            args.append(str(chain_id))
+        with self.connection:
+            return self.connection.execute(query, args).rowcount
+
+
+def _format_time(timestamp: Optional[float]) -> str:
+    if timestamp is None:
+        return "-"
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m data.quarantine")
+    parser.add_argument("--db", default=QUARANTINE_DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="list quarantined pools")
+    list_parser.add_argument("--chain", help="only this chain id")
+
+    expire_parser = commands.add_parser("expire", help="delete quarantine entries")
+    expire_parser.add_argument("--chain", help="only this chain id")
+    age = expire_parser.add_mutually_exclusive_group(required=True)
+    age.add_argument("--days", type=float, help="entries last seen more than DAYS ago")
+    age.add_argument("--all", action="store_true", help="every entry")
+
+    args = parser.parse_args(argv)
+    quarantine = Quarantine(args.db)
+
+    if args.command == "list":
+        rows = [
+            [
+                e["chain_id"],
+                e["fork_block"],
+                e["name"],
+                e["pool"],
+                e["failure"],
+                e["failures"],
+                _format_time(e["last_seen"]),
+                _format_time(e["last_verified"]),
+            ]
+            for e in quarantine.entries(args.chain)
+        ]
+        headers = ["chain", "fork block", "name", "pool", "failure", "count", "last seen"]
+        print(tabulate(rows, headers=headers + ["last verified"]))
+    else:
+        older_than = None if args.all else args.days * 24 * 60 * 60
+        print(f"Expired {quarantine.expire(older_than, args.chain)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Raw JSON-RPC requests to the connected node, sent as batches
+
+web3 sends one HTTP request per call. For node-side bookkeeping that needs no ABI handling
+(hardhat_setStorageAt, impersonation, eth_sendTransaction...) `batch_request` sends many
+requests in a single JSON-RPC batch, i.e. a single round trip, to the provider's endpoint.
+"""
+
+from typing import Any, List, Sequence, Tuple
+
+import requests
+from brownie import web3
+
+RPC_TIMEOUT = 120
+
+Request = Tuple[str, list]  # (method, params)
+
+
+class RPCError(Exception):
+    pass
+
+
+def batch_request(calls: Sequence[Request]) -> List[dict]:
+    """Responses (with either "result" or "error") to `calls`, in order
+    Providers without an HTTP endpoint get the requests one by one.
+    """
+    if not calls:
+        return []
+    endpoint = getattr(web3.provider, "endpoint_uri", None)
+    if not endpoint:
+        return [web3.provider.make_request(method, params) for method, params in calls]
+    payload = [
+        {"jsonrpc": "2.0", "id": n, "method": method, "params": params}
+        for n, (method, params) in enumerate(calls)
+    ]
+    response = requests.post(endpoint, json=payload, timeout=RPC_TIMEOUT)
+    response.raise_for_status()
+    by_id = {item["id"]: item for item in response.json()}
+    return [by_id[n] for n in range(len(calls))]
+
+
+def results(responses: Sequence[dict]) -> List[Any]:
+    """The results of `responses`, raising RPCError for the first error"""
+    for response in responses:
+        if "error" in response:
+            raise RPCError(response["error"].get("message", response["error"]))
+    return [response["result"] for response in responses]
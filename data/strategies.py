@@ -29,8 +29,7 @@ def _uniswapv3_fee_strategy() -> SearchStrategy:
 
 
 def token_strategy() -> SearchStrategy:
-    chain = get_chain()
-    tokens = [asset for asset in chain["assets"] if asset.get("address")]
+    tokens = get_chain().tokens
 
     return _DeferredStrategyRepr(lambda: st.sampled_from(tokens), "ERC20 token")
 
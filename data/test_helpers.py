@@ -1,5 +1,4 @@
 import binascii
-import pickle
 from contextlib import contextmanager
 from enum import Enum
 from functools import wraps
@@ -10,7 +9,11 @@ from brownie.exceptions import VirtualMachineError
 from eth_abi import encode_single
 from eth_utils import keccak
 
-from data.chain import get_chain_id
+from data.chain import get_chain_id, get_fork_block
+from data.mint_cache import MintCache
+from data.mint_strategies import BalanceLayout, lookup_mint_strategy
+from data.multicall import calldata
+from data.rpc import batch_request, results
 
 
 @contextmanager
@@ -34,22 +37,43 @@ class DisableTrace(object):
         self.web3._supports_traces = self.initial_traces
 
 
+_mint_cache = None
+
+
+def get_mint_cache() -> MintCache:
+    global _mint_cache
+    if _mint_cache is None:
+        _mint_cache = MintCache()
+    return _mint_cache
+
+
 def cached(func):
-    try:
-        with open("data/balances_cache.pkl", "rb") as infile:
-            func.cache = pickle.load(infile)
-    except FileNotFoundError:
-        func.cache = {}
+    """Memoizes `func(token, chain_id) -> (MintStrategy, params)` per fork, in memory and in the
+    mint strategy database shared by all workers (see data/mint_cache.py)
+    """
+    func.cache = {}
 
     @wraps(func)
-    def wrapper(*args):
+    def wrapper(token, network):
+        key = (network, get_fork_block(), token.lower())
         try:
-            return func.cache[args]
+            return func.cache[key]
         except KeyError:
-            func.cache[args] = result = func(*args)
-            with open("data/balances_cache.pkl", "wb") as outfile:
-                pickle.dump(func.cache, outfile)
-            return result
+            pass
+        stored = get_mint_cache().get(*key)
+        if stored is None:
+            result = func(token, network)
+            get_mint_cache().put(*key, result[0].value, result[1])
+            # another worker may have got there first, everyone uses the stored result
+            stored = get_mint_cache().get(*key)
+        strategy, params = stored
+        if strategy == MintStrategy.BALANCES.value:
+            params = BalanceLayout(*params)
+        elif isinstance(params, list):
+            params = tuple(params)
+        result = (MintStrategy(strategy), params)
+        func.cache[key] = result
+        return result
 
     return wrapper
 
@@ -58,14 +82,111 @@ def bytes32(i):
     return binascii.unhexlify("%064x" % i)
 
 
-def get_storage_key(address, storage_slot):
+def get_storage_key(address, storage_slot, vyper=False):
+    """Key of the entry of `address` in the mapping at `storage_slot`
+    Solidity hashes the key then the slot, Vyper the slot then the key
+    """
     user = int(address, 16)
-    key = bytes32(user) + bytes32(storage_slot)
+    if vyper:
+        key = bytes32(storage_slot) + bytes32(user)
+    else:
+        key = bytes32(user) + bytes32(storage_slot)
     return "0x" + keccak(key).hex()
 
 
+PROBE_USER = "0x1234567890123456789012345678901234567890"
+
+BALANCE_SLOT_CANDIDATES = 256
+PROBE_TOKENS_PER_BATCH = 32
+# the n-th candidate entry is probed with PROBE_MARKER + n in its low 32 bits and every higher
+# bit set, which tells the entry read apart and how many bits of the word the balance takes
+PROBE_MARKER = 0xBA1A << 16
+PROBE_HIGH_BITS = (1 << 256) - (1 << 32)
+# views returning the raw shares of shares-based tokens (stETH, Aave aTokens)
+SHARES_VIEWS = ("sharesOf(address)", "scaledBalanceOf(address)")
+
+
+def _probe_candidates(candidates):
+    """(slot, vyper) of every candidate mapping entry, in marker order"""
+    return [(slot, vyper) for slot in range(candidates) for vyper in (False, True)]
+
+
+def _probed_layout(token, response, candidates, shares):
+    if "error" in response or len(response.get("result") or "0x") < 66:
+        return None
+    value = int(response["result"][:66], 16)
+    n = (value & 0xFFFFFFFF) - PROBE_MARKER
+    if not 0 <= n < len(candidates):
+        return None
+    bits = value.bit_length()
+    if bits < 32 or value != (PROBE_HIGH_BITS | PROBE_MARKER + n) & ((1 << bits) - 1):
+        return None
+    slot, vyper = candidates[n]
+    return BalanceLayout(token, slot, vyper, bits, shares)
+
+
+def discover_balance_layouts(tokens, candidates=BALANCE_SLOT_CANDIDATES):
+    """BalanceLayout of each token, or None, found without a transaction or a trace
+
+    The probe user's entry of every candidate mapping, Solidity and Vyper keyed, is given its
+    own value in each token's storage, so one balanceOf call tells which entry the token reads,
+    and how many bits of it. Tokens whose balanceOf converts shares are read through their
+    shares view instead (SHARES_VIEWS). Tokens are probed PROBE_TOKENS_PER_BATCH at a time, with
+    one batch of writes and one of calls, inside a snapshot that is reverted afterwards. Tokens
+    whose balances live in another contract are not found.
+    """
+    tokens = list(tokens)
+    entries = _probe_candidates(candidates)
+    writes = [
+        (strip_zeros(get_storage_key(PROBE_USER, slot, vyper)), PROBE_HIGH_BITS | PROBE_MARKER + n)
+        for n, (slot, vyper) in enumerate(entries)
+    ]
+    views = [("balanceOf(address)", False)] + [(view, True) for view in SHARES_VIEWS]
+    view_calldata = [
+        ("0x" + calldata(view, int(PROBE_USER, 16)).hex(), shares) for view, shares in views
+    ]
+
+    layouts = {}
+    for start in range(0, len(tokens), PROBE_TOKENS_PER_BATCH):
+        chunk = tokens[start : start + PROBE_TOKENS_PER_BATCH]
+        (snapshot,) = results(batch_request([("evm_snapshot", [])]))
+        try:
+            results(
+                batch_request(
+                    [
+                        ("hardhat_setStorageAt", [token, key, "0x%064x" % value])
+                        for token in chunk
+                        for key, value in writes
+                    ]
+                )
+            )
+            responses = batch_request(
+                [
+                    ("eth_call", [{"to": token, "data": data}, "latest"])
+                    for token in chunk
+                    for data, _ in view_calldata
+                ]
+            )
+        finally:
+            results(batch_request([("evm_revert", [snapshot])]))
+
+        for n, token in enumerate(chunk):
+            token_responses = responses[n * len(views) : (n + 1) * len(views)]
+            layouts[token] = next(
+                (
+                    layout
+                    for response, (_, shares) in zip(token_responses, view_calldata)
+                    for layout in [_probed_layout(token, response, entries, shares)]
+                    if layout is not None
+                ),
+                None,
+            )
+    return layouts
+
+
 def get_balance_slot(token, network):
-    user = "0x1234567890123456789012345678901234567890"
+    """(storage contract, slot, vyper) of the balances mapping read by a traced balanceOf"""
+    user = PROBE_USER
     token = interface.ERC20Detailed(token)
 
     tx = token.balanceOf.transact(user, {"from": user})
@@ -77,7 +198,10 @@ def get_balance_slot(token, network):
         sha_opcode["stack"][-2]
         == "0000000000000000000000000000000000000000000000000000000000000040"
     )
-    balances_slot = int("0x" + sha_opcode["memory"][word_offset + 1], 16)
+    first, second = sha_opcode["memory"][word_offset : word_offset + 2]
+    # Solidity hashes (user, slot), Vyper (slot, user)
+    vyper = int(second, 16) == int(user, 16)
+    balances_slot = int("0x" + (first if vyper else second), 16)
 
     storage_address = sha_opcode["address"]
 
@@ -87,7 +211,7 @@ def get_balance_slot(token, network):
         else:
             break
 
-    return storage_address, balances_slot
+    return storage_address, balances_slot, vyper
 
 
 class MintStrategy(Enum):
@@ -315,26 +439,86 @@ class BenefactorError(Exception):
     pass
 
 
-@cached
+# blocks `fund_from_benefactors` mines at most before dropping the transfers still pending
+MAX_FUNDING_BLOCKS = 8
+# wei a transfer may credit short of its amount: rebasing tokens (stETH, Aave aTokens) move
+# shares, and round the amount down to them
+FUNDING_ROUNDING = 2
+
+
+# (network, fork block, token) of the tokens a `discover_mint_strategies` probe missed
+_probe_misses = set()
+
+
+def discover_mint_strategies(tokens, network):
+    """Stores the BALANCES strategy of every token `discover_balance_layouts` finds in the mint
+    cache, in one probe for all of them, and remembers the misses so that `get_mint_strategy`
+    goes straight to tracing them instead of probing them again one by one
+    """
+    fork_block = get_fork_block()
+    pending = sorted(
+        {
+            token
+            for token in tokens
+            if token not in OVERRIDES[network]
+            and token.lower() not in NATIVES
+            and lookup_mint_strategy(network, fork_block, token) is None
+            and get_mint_cache().get(network, fork_block, token) is None
+        }
+    )
+    if not pending:
+        return
+    for token, layout in discover_balance_layouts(pending).items():
+        if layout is None:
+            _probe_misses.add((network, fork_block, token.lower()))
+        else:
+            get_mint_cache().put(network, fork_block, token, MintStrategy.BALANCES.value, layout)
+
+
 def get_mint_strategy(token, network):
 
     if token in OVERRIDES[network]:
         return OVERRIDES[network][token]
 
-    user = "0x1234567890123456789012345678901234567890"
+    stored = lookup_mint_strategy(network, get_fork_block(), token)
+    if stored is not None:
+        return (MintStrategy[stored[0]], stored[1])
+
+    return cached_mint_strategy(token, network)
+
+
+@cached
+def cached_mint_strategy(token, network):
+    """`discover_mint_strategy`, once per fork: only discovered strategies go to the mint cache,
+    so that OVERRIDES and a regenerated table always take precedence over it
+    """
+    probed = (network, get_fork_block(), token.lower()) in _probe_misses
+    return discover_mint_strategy(token, network, probe=not probed)
+
+
+def discover_mint_strategy(token, network, probe=True):
+    """How to mint `token` on the connected fork, ignoring OVERRIDES and the precomputed table
+    `probe=False` skips straight to tracing, for tokens `discover_balance_layouts` already missed
+    """
+    user = PROBE_USER
 
     if token.lower() in NATIVES:
         return (MintStrategy.NATIVE, None)
 
+    if probe:
+        layout = discover_balance_layouts([token])[token]
+        if layout is not None:
+            return (MintStrategy.BALANCES, layout)
+
     try:
-        balance_contract, balance_slot = get_balance_slot(token, network)
-        user_slot = get_storage_key(user, balance_slot)
+        balance_contract, balance_slot, vyper = get_balance_slot(token, network)
+        user_slot = get_storage_key(user, balance_slot, vyper)
         encoded_value = "0x" + encode_single("uint256", 123456789).hex()
         web3.provider.make_request(
             "hardhat_setStorageAt", [balance_contract, user_slot, encoded_value]
         )
         assert interface.ERC20Detailed(token).balanceOf(user) == 123456789
-        return (MintStrategy.BALANCES, (balance_contract, balance_slot))
+        return (MintStrategy.BALANCES, BalanceLayout(balance_contract, balance_slot, vyper))
     except (AssertionError):
         if token.lower() in BENEFACTORS[network]:
             return (MintStrategy.BENEFACTOR, BENEFACTORS[network][token.lower()])
@@ -348,6 +532,140 @@ def strip_zeros(val):
     return hex(int(val, 16))
 
 
+def _balance_calls(pairs):
+    """balanceOf eth_call requests of (token, user) pairs"""
+    return [
+        (
+            "eth_call",
+            [
+                {"to": token, "data": "0x" + calldata("balanceOf(address)", int(user, 16)).hex()},
+                "latest",
+            ],
+        )
+        for token, user in pairs
+    ]
+
+
+def fund_from_benefactors(transfers, network):
+    """Sends every (token, benefactor, user, amount) transfer, mined in as few blocks as fit them
+
+    Benefactors are impersonated in one batch, then automine is turned off while every transfer
+    is submitted in another, and blocks are mined until none is pending (a single one, unless
+    the transfers don't fit its gas limit). Balances are read before and after in one batch
+    each: the tokens whose transfers failed, reverted or credited short of their amounts (by
+    more than FUNDING_ROUNDING wei each) are all reported in one BenefactorError, with the rest
+    of the batch still funded.
+    """
+    pairs = sorted({(token, user) for token, _, user, _ in transfers})
+    expected = dict.fromkeys(pairs, 0)
+    for token, _, user, amount in transfers:
+        expected[(token, user)] += int(amount) - FUNDING_ROUNDING
+    before = results(batch_request(_balance_calls(pairs)))
+
+    benefactors = sorted({benefactor for _, benefactor, _, _ in transfers})
+    results(batch_request([("hardhat_impersonateAccount", [b]) for b in benefactors]))
+    txs = [
+        {
+            "from": benefactor,
+            "to": token,
+            "data": "0x" + calldata("transfer(address,uint256)", int(user, 16), int(amount)).hex(),
+        }
+        for token, benefactor, user, amount in transfers
+    ]
+    failed = set()
+    results(batch_request([("evm_setAutomine", [False])]))
+    try:
+        sent = []
+        responses = batch_request([("eth_sendTransaction", [tx]) for tx in txs])
+        for (token, _, _, _), response in zip(transfers, responses):
+            if "error" in response:
+                failed.add(token)
+            else:
+                sent.append((token, response["result"]))
+
+        pending = sent
+        for _ in range(MAX_FUNDING_BLOCKS):
+            if not pending:
+                break
+            results(batch_request([("evm_mine", [])]))
+            receipts = results(
+                batch_request([("eth_getTransactionReceipt", [tx]) for _, tx in pending])
+            )
+            for (token, _), receipt in zip(pending, receipts):
+                if receipt is not None and int(receipt["status"], 16) == 0:
+                    failed.add(token)
+            pending = [tx for tx, receipt in zip(pending, receipts) if receipt is None]
+        # never mined, don't leave them to the next test's block
+        results(batch_request([("hardhat_dropTransaction", [tx]) for _, tx in pending]))
+        failed.update(token for token, _ in pending)
+    finally:
+        results(batch_request([("evm_setAutomine", [True])]))
+
+    after = results(batch_request(_balance_calls(pairs)))
+    for (token, user), old, new in zip(pairs, before, after):
+        if int(new, 16) - int(old, 16) < expected[(token, user)]:
+            failed.add(token)
+
+    if failed:
+        raise BenefactorError(
+            "; ".join(
+                f"{interface.ERC20Detailed(token).name()} - {token} - {network}"
+                for token in sorted(failed)
+            )
+        )
+
+
+def write_balances(mints):
+    """Writes the balances of (token, user, amount, BalanceLayout) to storage, returning the
+    balances held afterwards: the amounts, except for shares-based tokens whose balances round
+
+    Packed words are read first so that the rest of them is kept. Shares are sized from the
+    balance a first write of `amount` shares gives, and the result read back, each step one
+    JSON-RPC batch for all tokens.
+    """
+    keys = [
+        strip_zeros(get_storage_key(user, layout.slot, layout.vyper))
+        for _, user, _, layout in mints
+    ]
+    words = [0] * len(mints)
+    packed = [n for n, (_, _, _, layout) in enumerate(mints) if layout.bits < 256]
+    stored = results(
+        batch_request(
+            [("eth_getStorageAt", [mints[n][3].contract, keys[n], "latest"]) for n in packed]
+        )
+    )
+    for n, word in zip(packed, stored):
+        words[n] = int(word, 16)
+
+    def write(n, value):
+        token, _, _, layout = mints[n]
+        mask = (1 << layout.bits) - 1
+        if not 0 <= value <= mask:
+            raise ValueError(f"{value} doesn't fit the {layout.bits} bit balances of {token}")
+        return (
+            "hardhat_setStorageAt",
+            [layout.contract, keys[n], "0x%064x" % (words[n] & ~mask | value)],
+        )
+
+    amounts = [int(amount) for _, _, amount, _ in mints]
+    values = list(amounts)
+    shares = [n for n, (_, _, _, layout) in enumerate(mints) if layout.shares]
+    if shares:
+        results(batch_request([write(n, values[n]) for n in shares]))
+        pairs = [mints[n][:2] for n in shares]
+        for n, balance in zip(shares, results(batch_request(_balance_calls(pairs)))):
+            balance = int(balance, 16)
+            if balance == 0:
+                raise ValueError(f"{mints[n][0]} is worth nothing per share")
+            values[n] = -(-values[n] * values[n] // balance)
+
+    results(batch_request([write(n, value) for n, value in enumerate(values)]))
+    if shares:
+        for n, balance in zip(shares, results(batch_request(_balance_calls(pairs)))):
+            amounts[n] = int(balance, 16)
+    return amounts
+
+
 def mint_tokens_for(token, user, amount=0):
     if hasattr(user, "address"):
         user = user.address
@@ -364,13 +682,10 @@ def mint_tokens_for(token, user, amount=0):
         return amount
 
     elif strategy == MintStrategy.BALANCES:
-        token = interface.ERC20Detailed(token)
         if amount == 0:
-            amount = 10 ** token.decimals()
+            amount = 10 ** interface.ERC20Detailed(token).decimals()
 
-        user_slot = strip_zeros(get_storage_key(user, params[1]))
-        encoded_value = "0x" + encode_single("uint256", int(amount)).hex()
-        web3.provider.make_request("hardhat_setStorageAt", [params[0], user_slot, encoded_value])
+        (amount,) = write_balances([(token, user, amount, BalanceLayout(*params))])
 
     elif strategy == MintStrategy.BENEFACTOR:
         token = interface.ERC20Detailed(token)
@@ -383,3 +698,68 @@ def mint_tokens_for(token, user, amount=0):
             raise BenefactorError(f"{token.name()} - {token.address} - {active_network}")
 
     return amount
+
+
+def _address(account) -> str:
+    return account.address if hasattr(account, "address") else account
+
+
+def mint_many(mints):
+    """`mint_tokens_for` for many (token, user, amount) at once, returning the amounts minted
+
+    Strategies are looked up once per token, with the storage slots of tokens not yet in the
+    mint cache probed together (see `discover_balance_layouts`), and missing decimals read in one
+    batch of eth_calls. Native balances are then set in one JSON-RPC batch, token balances
+    written in a few (see `write_balances`), and benefactor transfers mined together (see
+    `fund_from_benefactors`).
+    """
+    mints = [(_address(token), _address(user), amount) for token, user, amount in mints]
+    active_network = str(get_chain_id())
+    discover_mint_strategies({token for token, _, _ in mints}, active_network)
+    strategies = {token: get_mint_strategy(token, active_network) for token, _, _ in mints}
+
+    defaults = sorted(
+        {
+            token
+            for token, _, amount in mints
+            if amount == 0 and strategies[token][0] != MintStrategy.NATIVE
+        }
+    )
+    decimals_calldata = "0x" + calldata("decimals()").hex()
+    decimals = dict(
+        zip(
+            defaults,
+            results(
+                batch_request(
+                    [
+                        ("eth_call", [{"to": token, "data": decimals_calldata}, "latest"])
+                        for token in defaults
+                    ]
+                )
+            ),
+        )
+    )
+
+    amounts, writes, balances, transfers = [], [], [], []
+    for n, (token, user, amount) in enumerate(mints):
+        strategy, params = strategies[token]
+        if amount == 0:
+            amount = 1e18 if strategy == MintStrategy.NATIVE else 10 ** int(decimals[token], 16)
+        amounts.append(amount)
+
+        if strategy == MintStrategy.NATIVE:
+            writes.append(("hardhat_setBalance", [user, hex(int(amount))]))
+        elif strategy == MintStrategy.BALANCES:
+            balances.append((n, (token, user, amount, BalanceLayout(*params))))
+        else:
+            transfers.append((token, params, user, amount))
+
+    results(batch_request(writes))
+    if balances:
+        written = write_balances([mint for _, mint in balances])
+        for (n, _), amount in zip(balances, written):
+            amounts[n] = amount
+    if transfers:
+        fund_from_benefactors(transfers, active_network)
+
+    return amounts
@@ -0,0 +1,335 @@
+"""Offline Uniswap V2 quotes and routing
+
+`UniswapV2Snapshot.take` reads, for every Uniswap V2 style router of a chain (the
+`uniswap_router_v2_02` contracts of data/chains), the pairs between all tokens of the chain and
+their reserves, in Multicall3 batches at one block: the routers' factories, the pair of every
+token pair on every factory, then the reserves and token0 of the existing pairs. Pair addresses
+of the venues in data/pool_addresses.py are derived rather than read.
+`refresh` re-reads only the reserves, in one round.
+
+Quotes are `UniswapV2Library.getAmountsOut` / `getAmountsIn` over the snapshot, so they match
+the routers to the unit at the snapshot block, without a node round trip per quote. `best_sell`
+and `best_buy` search every venue and path (direct or through other tokens of the chain) for
+the `CSwapUniswapV2.sell` / `buy` parameters giving the best price.
+
+The library's reverts are raised as ValueError.
+"""
+
+import warnings
+from dataclasses import dataclass, field
+from itertools import combinations
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from brownie import web3
+
+from data.chain import Chain, get_chain, get_registry
+from data.multicall import DEFAULT_BATCH_SIZE, Call, aggregate, calldata, decode_words
+from data.pool_addresses import deployer, pair_address
+
+FEE_DENOMINATOR = 10**4
+DEFAULT_FEE = 30  # bips, 0.3% as Uniswap V2 itself
+# forks charging another swap fee, by venue name in data/chains
+VENUE_FEES = {"pancakeswap": 25, "spookyswap": 20}
+DEFAULT_MAX_HOPS = 2
+
+PairKey = Tuple[str, str]  # sorted lowercase token addresses
+
+
+def pair_key(token_a: str, token_b: str) -> PairKey:
+    token_a, token_b = token_a.lower(), token_b.lower()
+    if token_a == token_b:
+        raise ValueError("UniswapV2Library: IDENTICAL_ADDRESSES")
+    return (token_a, token_b) if token_a < token_b else (token_b, token_a)
+
+
+def get_amount_out(
+    amount_in: int, reserve_in: int, reserve_out: int, fee: int = DEFAULT_FEE
+) -> int:
+    """UniswapV2Library.getAmountOut, with the fee in bips"""
+    if amount_in <= 0:
+        raise ValueError("UniswapV2Library: INSUFFICIENT_INPUT_AMOUNT")
+    if reserve_in <= 0 or reserve_out <= 0:
+        raise ValueError("UniswapV2Library: INSUFFICIENT_LIQUIDITY")
+    amount_in_with_fee = amount_in * (FEE_DENOMINATOR - fee)
+    return (amount_in_with_fee * reserve_out) // (reserve_in * FEE_DENOMINATOR + amount_in_with_fee)
+
+
+def get_amount_in(
+    amount_out: int, reserve_in: int, reserve_out: int, fee: int = DEFAULT_FEE
+) -> int:
+    """UniswapV2Library.getAmountIn, with the fee in bips"""
+    if amount_out <= 0:
+        raise ValueError("UniswapV2Library: INSUFFICIENT_OUTPUT_AMOUNT")
+    if reserve_in <= 0 or reserve_out <= 0:
+        raise ValueError("UniswapV2Library: INSUFFICIENT_LIQUIDITY")
+    if amount_out >= reserve_out:
+        # the library's SafeMath reverts on the underflow
+        raise ValueError("UniswapV2Library: INSUFFICIENT_LIQUIDITY")
+    numerator = reserve_in * amount_out * FEE_DENOMINATOR
+    denominator = (reserve_out - amount_out) * (FEE_DENOMINATOR - fee)
+    return numerator // denominator + 1
+
+
+@dataclass
+class UniswapV2Pair:
+    address: str
+    token0: str
+    token1: str
+    reserve0: int
+    reserve1: int
+
+    def reserves(self, token_in: str) -> Tuple[int, int]:
+        """(reserve in, reserve out) for selling `token_in`"""
+        if token_in == self.token0:
+            return self.reserve0, self.reserve1
+        return self.reserve1, self.reserve0
+
+
+@dataclass
+class UniswapV2Venue:
+    name: str
+    router: str
+    factory: str
+    fee: int = DEFAULT_FEE
+    pairs: Dict[PairKey, UniswapV2Pair] = field(default_factory=dict)
+    # token -> tokens it has a pair with liquidity with, built by `index_pairs`
+    neighbours: Optional[Dict[str, List[str]]] = field(default=None, repr=False, compare=False)
+
+    def index_pairs(self) -> None:
+        """Rebuild the adjacency `paths` searches, after the pairs or their reserves changed"""
+        self.neighbours = {}
+        for (token0, token1), pair in self.pairs.items():
+            if pair.reserve0 and pair.reserve1:
+                self.neighbours.setdefault(token0, []).append(token1)
+                self.neighbours.setdefault(token1, []).append(token0)
+
+    def pair(self, token_a: str, token_b: str) -> UniswapV2Pair:
+        try:
+            return self.pairs[pair_key(token_a, token_b)]
+        except KeyError:
+            raise ValueError(f"No {self.name} pair for {token_a} and {token_b}") from None
+
+    def get_amounts_out(self, amount_in: int, path: Sequence[str]) -> List[int]:
+        """UniswapV2Library.getAmountsOut"""
+        if len(path) < 2:
+            raise ValueError("UniswapV2Library: INVALID_PATH")
+        amounts = [amount_in]
+        for token_in, token_out in zip(path, path[1:]):
+            reserve_in, reserve_out = self.pair(token_in, token_out).reserves(token_in.lower())
+            amounts.append(get_amount_out(amounts[-1], reserve_in, reserve_out, self.fee))
+        return amounts
+
+    def get_amounts_in(self, amount_out: int, path: Sequence[str]) -> List[int]:
+        """UniswapV2Library.getAmountsIn"""
+        if len(path) < 2:
+            raise ValueError("UniswapV2Library: INVALID_PATH")
+        amounts = [amount_out]
+        for token_in, token_out in zip(reversed(path[:-1]), reversed(path[1:])):
+            reserve_in, reserve_out = self.pair(token_in, token_out).reserves(token_in.lower())
+            amounts.insert(0, get_amount_in(amounts[0], reserve_in, reserve_out, self.fee))
+        return amounts
+
+    def paths(self, token_in: str, token_out: str, max_hops: int = DEFAULT_MAX_HOPS) -> List[list]:
+        """Every path of at most `max_hops` swaps through pairs with liquidity"""
+        if self.neighbours is None:
+            self.index_pairs()
+        neighbours = self.neighbours
+
+        token_out = token_out.lower()
+        paths = []
+        stack = [[token_in.lower()]]
+        while stack:
+            path = stack.pop()
+            for token in neighbours.get(path[-1], []):
+                if token == token_out:
+                    paths.append(path + [token])
+                elif len(path) < max_hops and token not in path:
+                    stack.append(path + [token])
+        return paths
+
+
+class Route(NamedTuple):
+    venue: str
+    router: str
+    path: List[str]
+    amounts: List[int]  # as returned by getAmountsOut / getAmountsIn
+
+    @property
+    def amount_in(self) -> int:
+        return self.amounts[0]
+
+    @property
+    def amount_out(self) -> int:
+        return self.amounts[-1]
+
+    def swap_params(self, receiver: str, deadline: int = 0) -> tuple:
+        """UniswapV2SwapParams of CSwapUniswapV2 for this route"""
+        return (self.router, self.path, receiver, deadline)
+
+
+def _decode_address(data: bytes) -> str:
+    return "0x" + (decode_words(data)[0] & ((1 << 160) - 1)).to_bytes(20, "big").hex()
+
+
+def _decode_reserves(data: bytes) -> Tuple[int, int]:
+    words = decode_words(data)
+    return words[0], words[1]
+
+
+@dataclass
+class UniswapV2Snapshot:
+    chain_id: int
+    block_number: int
+    venues: Dict[str, UniswapV2Venue]
+
+    @classmethod
+    def take(
+        cls,
+        chain: Optional[Chain] = None,
+        block_number: Optional[int] = None,
+        tokens: Optional[Sequence[str]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> "UniswapV2Snapshot":
+        """Pairs between `tokens` (default: every token of the chain) on every V2 venue"""
+        if chain is None:
+            chain = get_chain()
+        if block_number is None:
+            block_number = web3.eth.block_number
+        if tokens is None:
+            tokens = [token.address for token in chain.tokens]
+        keys = sorted(
+            {pair_key(a, b) for a, b in combinations(tokens, 2) if a.lower() != b.lower()}
+        )
+        routers = get_registry().contracts_with_interface(chain.chain_id, "uniswap_router_v2_02")
+
+        factories = aggregate(
+            [Call(router.address, calldata("factory()"), _decode_address) for router in routers],
+            block_number,
+            batch_size,
+        )
+        venues = {
+            router.venue: UniswapV2Venue(
+                router.venue, router.address, factory, VENUE_FEES.get(router.venue, DEFAULT_FEE)
+            )
+            for router, factory in zip(routers, factories)
+            if factory is not None
+        }
+
+        # pairs of venues with a known init code hash are derived, others looked up
+        derived = {
+            venue.name
+            for venue in venues.values()
+            if getattr(deployer(chain.chain_id, venue.name), "factory", None) == venue.factory
+        }
+        lookups = [venue for venue in venues.values() if venue.name not in derived]
+        calls = [
+            Call(
+                venue.factory,
+                calldata("getPair(address,address)", int(a, 16), int(b, 16)),
+                _decode_address,
+            )
+            for venue in lookups
+            for a, b in keys
+        ]
+        pairs = iter(aggregate(calls, block_number, batch_size))
+        addresses = [
+            (
+                venue,
+                key,
+                pair_address(chain.chain_id, venue.name, *key)
+                if venue.name in derived
+                else next(pairs),
+            )
+            for venue in venues.values()
+            for key in keys
+        ]
+        addresses = [(venue, key, pair) for venue, key, pair in addresses if pair and int(pair, 16)]
+
+        calls = []
+        for _, _, pair in addresses:
+            calls += [
+                Call(pair, calldata("getReserves()"), _decode_reserves),
+                Call(pair, calldata("token0()"), _decode_address),
+            ]
+        results = aggregate(calls, block_number, batch_size)
+        for n, (venue, (token_a, token_b), pair) in enumerate(addresses):
+            reserves, token0 = results[2 * n : 2 * n + 2]
+            if reserves is None and venue.name in derived:
+                continue  # never created
+            if reserves is None or token0 not in (token_a, token_b):
+                warnings.warn(f"Could not read {venue.name} pair {pair}, skipping")
+                continue
+            token1 = token_b if token0 == token_a else token_a
+            venue.pairs[(token_a, token_b)] = UniswapV2Pair(pair, token0, token1, *reserves)
+        for venue in venues.values():
+            venue.index_pairs()
+
+        return cls(chain.chain_id, block_number, venues)
+
+    def refresh(
+        self, block_number: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> "UniswapV2Snapshot":
+        """Re-read the reserves of every known pair at `block_number` (default: latest)"""
+        if block_number is None:
+            block_number = web3.eth.block_number
+        pairs = [pair for venue in self.venues.values() for pair in venue.pairs.values()]
+        calls = [Call(pair.address, calldata("getReserves()"), _decode_reserves) for pair in pairs]
+        for pair, reserves in zip(pairs, aggregate(calls, block_number, batch_size)):
+            if reserves is None:
+                raise ValueError(f"Could not read the reserves of pair {pair.address}")
+            pair.reserve0, pair.reserve1 = reserves
+        for venue in self.venues.values():
+            venue.index_pairs()
+        self.block_number = block_number
+        return self
+
+    def venue(self, name: str) -> UniswapV2Venue:
+        try:
+            return self.venues[name]
+        except KeyError:
+            raise ValueError(f"No Uniswap V2 venue {name} on chain {self.chain_id}") from None
+
+    def best_sell(
+        self,
+        token_in: str,
+        token_out: str,
+        amount_in: int,
+        max_hops: int = DEFAULT_MAX_HOPS,
+        venues: Optional[Sequence[str]] = None,
+    ) -> Optional[Route]:
+        """The route selling exactly `amount_in` for the most `token_out`, None if there is none"""
+        best = None
+        for venue in self._venues(venues):
+            for path in venue.paths(token_in, token_out, max_hops):
+                try:
+                    amounts = venue.get_amounts_out(amount_in, path)
+                except ValueError:
+                    continue
+                if amounts[-1] and (best is None or amounts[-1] > best.amount_out):
+                    best = Route(venue.name, venue.router, path, amounts)
+        return best
+
+    def best_buy(
+        self,
+        token_in: str,
+        token_out: str,
+        amount_out: int,
+        max_hops: int = DEFAULT_MAX_HOPS,
+        venues: Optional[Sequence[str]] = None,
+    ) -> Optional[Route]:
+        """The route buying exactly `amount_out` for the least `token_in`, None if there is none"""
+        best = None
+        for venue in self._venues(venues):
+            for path in venue.paths(token_in, token_out, max_hops):
+                try:
+                    amounts = venue.get_amounts_in(amount_out, path)
+                except ValueError:
+                    continue
+                if best is None or amounts[0] < best.amount_in:
+                    best = Route(venue.name, venue.router, path, amounts)
+        return best
+
+    def _venues(self, names: Optional[Sequence[str]]) -> List[UniswapV2Venue]:
+        if names is None:
+            return list(self.venues.values())
+        return [self.venue(name) for name in names]
@@ -1,5 +1,15 @@
+"""Bit-exact ports of Uniswap V3's FullMath, TickMath, SqrtPriceMath and LiquidityAmounts
+
+Every function works on Python ints and rounds exactly like the Solidity libraries, so results
+match the chain to the wei. Inputs that may arrive as floats (e.g. `100e6` in tests) are
+coerced with int(); pass ints for values above 2**53, where floats are no longer exact.
+Reverts of the Solidity code are raised as ValueError.
+"""
+
 import math
 from enum import IntEnum
+from functools import lru_cache
+from typing import List, Tuple
 
 
 class UniswapV3FeeAmount(IntEnum):
@@ -23,68 +33,451 @@ class UniswapV3FeeAmount(IntEnum):
 
 
 Q96 = 0x1000000000000000000000000
+Q128 = 1 << 128
 RESOLUTION = 96
+MAX_UINT128 = (1 << 128) - 1
+MAX_UINT160 = (1 << 160) - 1
+MAX_UINT256 = (1 << 256) - 1
+
+MIN_TICK = -887272
+MAX_TICK = -MIN_TICK
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+
+
+# FullMath / UnsafeMath
+
+
+def mul_div(a: int, b: int, denominator: int) -> int:
+    result = a * b // denominator
+    if result > MAX_UINT256:
+        raise ValueError("mulDiv overflow")
+    return result
+
+
+def mul_div_rounding_up(a: int, b: int, denominator: int) -> int:
+    result, remainder = divmod(a * b, denominator)
+    if remainder:
+        result += 1
+    if result > MAX_UINT256:
+        raise ValueError("mulDiv overflow")
+    return result
+
+
+def div_rounding_up(x: int, y: int) -> int:
+    return -(-x // y)
+
+
+def _to_uint128(x: int) -> int:
+    if x > MAX_UINT128:
+        raise ValueError("uint128 overflow")
+    return x
+
+
+# TickMath
+
+# ratio multipliers for each bit of |tick|: 2**128 / sqrt(1.0001) ** bit, in Q128.128
+_TICK_BIT_RATIOS = (
+    0xFFFCB933BD6FAD37AA2D162D1A594001,
+    0xFFF97272373D413259A46990580E213A,
+    0xFFF2E50F5F656932EF12357CF3C7FDCC,
+    0xFFE5CACA7E10E4E61C3624EAA0941CD0,
+    0xFFCB9843D60F6159C9DB58835C926644,
+    0xFF973B41FA98C081472E6896DFB254C0,
+    0xFF2EA16466C96A3843EC78B326B52861,
+    0xFE5DEE046A99A2A811C461F1969C3053,
+    0xFCBE86C7900A88AEDCFFC83B479AA3A4,
+    0xF987A7253AC413176F2B074CF7815E54,
+    0xF3392B0822B70005940C7A398E4B70F3,
+    0xE7159475A2C29B7443B29C7FA6E889D9,
+    0xD097F3BDFD2022B8845AD8F792AA5825,
+    0xA9F746462D870FDF8A65DC1F90E061E5,
+    0x70D869A156D2A1B890BB3DF62BAF32F7,
+    0x31BE135F97D08FD981231505542FCFA6,
+    0x9AA508B5B7A84E1C677DE54F3E99BC9,
+    0x5D6AF8DEDB81196699C329225EE604,
+    0x2216E584F5FA1EA926041BEDFE98,
+    0x48A170391F7DC42444E8FA2,
+)
+
+# the ratio for every combination of the low bits of |tick|, built with the same sequence of
+# multiply-and-shift steps as TickMath so that continuing from it stays bit-exact
+_TABLE_BITS = 10
+
+
+def _low_bit_ratios():
+    table = []
+    for low in range(1 << _TABLE_BITS):
+        ratio = _TICK_BIT_RATIOS[0] if low & 1 else Q128
+        for bit in range(1, _TABLE_BITS):
+            if low & (1 << bit):
+                ratio = (ratio * _TICK_BIT_RATIOS[bit]) >> 128
+        table.append(ratio)
+    return tuple(table)
+
+
+_LOW_BIT_RATIOS = _low_bit_ratios()
 
 
-def get_sqrt_ratio_at_tick(tick):
-    return math.sqrt(1.0001**tick) * Q96
+@lru_cache(maxsize=65536)
+def _sqrt_ratio_at_tick(tick: int) -> int:
+    abs_tick = -tick if tick < 0 else tick
+    if abs_tick > MAX_TICK:
+        raise ValueError("T")
+    ratio = _LOW_BIT_RATIOS[abs_tick & ((1 << _TABLE_BITS) - 1)]
+    high = abs_tick >> _TABLE_BITS
+    bit = _TABLE_BITS
+    while high:
+        if high & 1:
+            ratio = (ratio * _TICK_BIT_RATIOS[bit]) >> 128
+        high >>= 1
+        bit += 1
+    if tick > 0:
+        ratio = MAX_UINT256 // ratio
+    # Q128.128 -> Q64.96, rounding up
+    return (ratio >> 32) + (1 if ratio & 0xFFFFFFFF else 0)
 
 
-def get_liquidity_for_amount0(sqrt_ratioA, sqrt_ratioB, amount0):
+def get_sqrt_ratio_at_tick(tick) -> int:
+    """sqrt(1.0001 ** tick) * 2**96, as TickMath.getSqrtRatioAtTick"""
+    return _sqrt_ratio_at_tick(int(tick))
+
+
+_LOG_2 = math.log(2)
+_LOG_SQRT_10001 = math.log(1.0001) / 2
+# the float estimate of the tick is off by far less than this (log error ~1e-9 ticks, and the
+# rounding of getSqrtRatioAtTick ~1e-5 ticks near MIN_TICK), so farther from a tick boundary
+# its floor is exact and only closer estimates are checked against getSqrtRatioAtTick
+_TICK_ESTIMATE_MARGIN = 1e-3
+
+
+def get_tick_at_sqrt_ratio(sqrt_price_x96) -> int:
+    """Greatest tick whose sqrt ratio is <= `sqrt_price_x96`, as TickMath.getTickAtSqrtRatio"""
+    sqrt_price_x96 = int(sqrt_price_x96)
+    if not MIN_SQRT_RATIO <= sqrt_price_x96 < MAX_SQRT_RATIO:
+        raise ValueError("R")
+    # keep 53 significant bits so the log argument is an exact float
+    shift = max(sqrt_price_x96.bit_length() - 53, 0)
+    log_price = math.log(sqrt_price_x96 >> shift) + (shift - RESOLUTION) * _LOG_2
+    estimate = log_price / _LOG_SQRT_10001
+    tick = math.floor(estimate)
+    if _TICK_ESTIMATE_MARGIN < estimate - tick < 1 - _TICK_ESTIMATE_MARGIN:
+        return tick
+    tick = min(max(tick, MIN_TICK), MAX_TICK - 1)
+    while tick > MIN_TICK and _sqrt_ratio_at_tick(tick) > sqrt_price_x96:
+        tick -= 1
+    while tick < MAX_TICK - 1 and _sqrt_ratio_at_tick(tick + 1) <= sqrt_price_x96:
+        tick += 1
+    return tick
+
+
+# SqrtPriceMath
+
+
+def get_next_sqrt_price_from_amount0_rounding_up(
+    sqrt_price_x96: int, liquidity: int, amount: int, add: bool
+) -> int:
+    if amount == 0:
+        return sqrt_price_x96
+    numerator1 = liquidity << RESOLUTION
+    product = amount * sqrt_price_x96
+    if add:
+        # the precise formula, unless the intermediates overflow uint256 in Solidity
+        if product <= MAX_UINT256 and numerator1 + product <= MAX_UINT256:
+            return mul_div_rounding_up(numerator1, sqrt_price_x96, numerator1 + product)
+        return div_rounding_up(numerator1, numerator1 // sqrt_price_x96 + amount)
+    if product > MAX_UINT256 or numerator1 <= product:
+        raise ValueError("Not enough liquidity")
+    result = mul_div_rounding_up(numerator1, sqrt_price_x96, numerator1 - product)
+    if result > MAX_UINT160:
+        raise ValueError("uint160 overflow")
+    return result
+
+
+def get_next_sqrt_price_from_amount1_rounding_down(
+    sqrt_price_x96: int, liquidity: int, amount: int, add: bool
+) -> int:
+    if add:
+        result = sqrt_price_x96 + (amount << RESOLUTION) // liquidity
+        if result > MAX_UINT160:
+            raise ValueError("uint160 overflow")
+        return result
+    quotient = div_rounding_up(amount << RESOLUTION, liquidity)
+    if sqrt_price_x96 <= quotient:
+        raise ValueError("Not enough liquidity")
+    return sqrt_price_x96 - quotient
+
+
+def get_next_sqrt_price_from_input(
+    sqrt_price_x96: int, liquidity: int, amount_in: int, zero_for_one: bool
+) -> int:
+    if sqrt_price_x96 <= 0 or liquidity <= 0:
+        raise ValueError("Price and liquidity must be positive")
+    if zero_for_one:
+        return get_next_sqrt_price_from_amount0_rounding_up(
+            sqrt_price_x96, liquidity, amount_in, True
+        )
+    return get_next_sqrt_price_from_amount1_rounding_down(
+        sqrt_price_x96, liquidity, amount_in, True
+    )
+
+
+def get_next_sqrt_price_from_output(
+    sqrt_price_x96: int, liquidity: int, amount_out: int, zero_for_one: bool
+) -> int:
+    if sqrt_price_x96 <= 0 or liquidity <= 0:
+        raise ValueError("Price and liquidity must be positive")
+    if zero_for_one:
+        return get_next_sqrt_price_from_amount1_rounding_down(
+            sqrt_price_x96, liquidity, amount_out, False
+        )
+    return get_next_sqrt_price_from_amount0_rounding_up(
+        sqrt_price_x96, liquidity, amount_out, False
+    )
+
+
+def get_amount0_delta(sqrt_ratioA: int, sqrt_ratioB: int, liquidity: int, round_up: bool) -> int:
+    """Amount of token0 between two prices for (unsigned) `liquidity`"""
     if sqrt_ratioA > sqrt_ratioB:
         sqrt_ratioA, sqrt_ratioB = (sqrt_ratioB, sqrt_ratioA)
-    intermediate = sqrt_ratioA * sqrt_ratioB / Q96
-    return int(amount0 * intermediate / (sqrt_ratioB - sqrt_ratioA))
+    if sqrt_ratioA <= 0:
+        raise ValueError("Price must be positive")
+    numerator1 = liquidity << RESOLUTION
+    numerator2 = sqrt_ratioB - sqrt_ratioA
+    if round_up:
+        return div_rounding_up(
+            mul_div_rounding_up(numerator1, numerator2, sqrt_ratioB), sqrt_ratioA
+        )
+    return mul_div(numerator1, numerator2, sqrt_ratioB) // sqrt_ratioA
 
 
-def get_liquidity_for_amount1(sqrt_ratioA, sqrt_ratioB, amount1):
+def get_amount1_delta(sqrt_ratioA: int, sqrt_ratioB: int, liquidity: int, round_up: bool) -> int:
+    """Amount of token1 between two prices for (unsigned) `liquidity`"""
     if sqrt_ratioA > sqrt_ratioB:
         sqrt_ratioA, sqrt_ratioB = (sqrt_ratioB, sqrt_ratioA)
-    return int(amount1 * Q96 / (sqrt_ratioB - sqrt_ratioA))
+    if round_up:
+        return mul_div_rounding_up(liquidity, sqrt_ratioB - sqrt_ratioA, Q96)
+    return mul_div(liquidity, sqrt_ratioB - sqrt_ratioA, Q96)
+
+
+def get_amount0_delta_signed(sqrt_ratioA: int, sqrt_ratioB: int, liquidity: int) -> int:
+    """Signed token0 delta for a signed liquidity delta (rounded against the caller)"""
+    if liquidity < 0:
+        return -get_amount0_delta(sqrt_ratioA, sqrt_ratioB, -liquidity, False)
+    return get_amount0_delta(sqrt_ratioA, sqrt_ratioB, liquidity, True)
+
 
+def get_amount1_delta_signed(sqrt_ratioA: int, sqrt_ratioB: int, liquidity: int) -> int:
+    """Signed token1 delta for a signed liquidity delta (rounded against the caller)"""
+    if liquidity < 0:
+        return -get_amount1_delta(sqrt_ratioA, sqrt_ratioB, -liquidity, False)
+    return get_amount1_delta(sqrt_ratioA, sqrt_ratioB, liquidity, True)
 
-def get_liquidity_for_amounts(sqrt_ratio, sqrt_ratioA, sqrt_ratioB, amount0, amount1):
+
+# LiquidityAmounts
+#
+# Divisions by Q96 are shifts, which floor the same on the non-negative values here.
+# The public functions coerce their arguments with int() (callers pass float amounts such as
+# `100e6`) and sort the range bounds; the underscored cores take sorted ints.
+
+
+def _liquidity_for_amount0(sqrt_ratioA: int, sqrt_ratioB: int, amount0: int) -> int:
+    intermediate = (sqrt_ratioA * sqrt_ratioB) >> RESOLUTION
+    return _to_uint128(amount0 * intermediate // (sqrt_ratioB - sqrt_ratioA))
+
+
+def _liquidity_for_amount1(sqrt_ratioA: int, sqrt_ratioB: int, amount1: int) -> int:
+    return _to_uint128((amount1 << RESOLUTION) // (sqrt_ratioB - sqrt_ratioA))
+
+
+def _amount0_for_liquidity(sqrt_ratioA: int, sqrt_ratioB: int, liquidity: int) -> int:
+    # mulDiv(...) / sqrt_ratioA: nested floor divisions equal one by the product
+    return (liquidity << RESOLUTION) * (sqrt_ratioB - sqrt_ratioA) // (sqrt_ratioB * sqrt_ratioA)
+
+
+def _amount1_for_liquidity(sqrt_ratioA: int, sqrt_ratioB: int, liquidity: int) -> int:
+    return (liquidity * (sqrt_ratioB - sqrt_ratioA)) >> RESOLUTION
+
+
+def _sorted(sqrt_ratioA, sqrt_ratioB):
+    sqrt_ratioA, sqrt_ratioB = int(sqrt_ratioA), int(sqrt_ratioB)
     if sqrt_ratioA > sqrt_ratioB:
-        sqrt_ratioA, sqrt_ratioB = (sqrt_ratioB, sqrt_ratioA)
+        return sqrt_ratioB, sqrt_ratioA
+    return sqrt_ratioA, sqrt_ratioB
+
+
+def get_liquidity_for_amount0(sqrt_ratioA, sqrt_ratioB, amount0) -> int:
+    return _liquidity_for_amount0(*_sorted(sqrt_ratioA, sqrt_ratioB), int(amount0))
+
+
+def get_liquidity_for_amount1(sqrt_ratioA, sqrt_ratioB, amount1) -> int:
+    return _liquidity_for_amount1(*_sorted(sqrt_ratioA, sqrt_ratioB), int(amount1))
+
+
+def get_liquidity_for_amounts(sqrt_ratio, sqrt_ratioA, sqrt_ratioB, amount0, amount1) -> int:
+    sqrt_ratio = int(sqrt_ratio)
+    sqrt_ratioA, sqrt_ratioB = _sorted(sqrt_ratioA, sqrt_ratioB)
 
     if sqrt_ratio <= sqrt_ratioA:
-        liquidity = get_liquidity_for_amount0(sqrt_ratioA, sqrt_ratioB, amount0)
+        liquidity = _liquidity_for_amount0(sqrt_ratioA, sqrt_ratioB, int(amount0))
     elif sqrt_ratio < sqrt_ratioB:
-        liquidity0 = get_liquidity_for_amount0(sqrt_ratio, sqrt_ratioB, amount0)
-        liquidity1 = get_liquidity_for_amount1(sqrt_ratioA, sqrt_ratio, amount1)
+        liquidity0 = _liquidity_for_amount0(sqrt_ratio, sqrt_ratioB, int(amount0))
+        liquidity1 = _liquidity_for_amount1(sqrt_ratioA, sqrt_ratio, int(amount1))
         liquidity = liquidity0 if liquidity0 < liquidity1 else liquidity1
     else:
-        liquidity = get_liquidity_for_amount1(sqrt_ratioA, sqrt_ratioB, amount1)
+        liquidity = _liquidity_for_amount1(sqrt_ratioA, sqrt_ratioB, int(amount1))
 
     return liquidity
 
 
-def get_amount0_for_liquidity(sqrt_ratioA, sqrt_ratioB, liquidity):
-    if sqrt_ratioA > sqrt_ratioB:
-        sqrt_ratioA, sqrt_ratioB = (sqrt_ratioB, sqrt_ratioA)
-    return int(
-        ((liquidity << RESOLUTION) * (sqrt_ratioB - sqrt_ratioA) / sqrt_ratioB) / sqrt_ratioA
-    )
+def get_amount0_for_liquidity(sqrt_ratioA, sqrt_ratioB, liquidity) -> int:
+    return _amount0_for_liquidity(*_sorted(sqrt_ratioA, sqrt_ratioB), int(liquidity))
 
 
-def get_amount1_for_liquidity(sqrt_ratioA, sqrt_ratioB, liquidity):
-    if sqrt_ratioA > sqrt_ratioB:
-        sqrt_ratioA, sqrt_ratioB = (sqrt_ratioB, sqrt_ratioA)
-    return int(liquidity * (sqrt_ratioB - sqrt_ratioA) / Q96)
+def get_amount1_for_liquidity(sqrt_ratioA, sqrt_ratioB, liquidity) -> int:
+    return _amount1_for_liquidity(*_sorted(sqrt_ratioA, sqrt_ratioB), int(liquidity))
 
 
 def get_amounts_for_liquidity(sqrt_ratio, sqrt_ratioA, sqrt_ratioB, liquidity):
-    if sqrt_ratioA > sqrt_ratioB:
-        sqrt_ratioA, sqrt_ratioB = (sqrt_ratioB, sqrt_ratioA)
+    sqrt_ratio, liquidity = int(sqrt_ratio), int(liquidity)
+    sqrt_ratioA, sqrt_ratioB = _sorted(sqrt_ratioA, sqrt_ratioB)
 
     amount0, amount1 = (0, 0)
 
     if sqrt_ratio <= sqrt_ratioA:
-        amount0 = get_amount0_for_liquidity(sqrt_ratioA, sqrt_ratioB, liquidity)
+        amount0 = _amount0_for_liquidity(sqrt_ratioA, sqrt_ratioB, liquidity)
     elif sqrt_ratio < sqrt_ratioB:
-        amount0 = get_amount0_for_liquidity(sqrt_ratio, sqrt_ratioB, liquidity)
-        amount1 = get_amount1_for_liquidity(sqrt_ratioA, sqrt_ratio, liquidity)
+        amount0 = _amount0_for_liquidity(sqrt_ratio, sqrt_ratioB, liquidity)
+        amount1 = _amount1_for_liquidity(sqrt_ratioA, sqrt_ratio, liquidity)
     else:
-        amount1 = get_amount1_for_liquidity(sqrt_ratioA, sqrt_ratioB, liquidity)
+        amount1 = _amount1_for_liquidity(sqrt_ratioA, sqrt_ratioB, liquidity)
 
     return (amount0, amount1)
+
+
+# Batches
+#
+# Column-wise versions of the LiquidityAmounts helpers for planning over many candidate ranges
+# in one call. Each argument is a sequence (list, tuple, numpy object array, ...) with one value
+# per row, or a single value used for every row. Values are checked to be exact integers: floats
+# are only accepted when integral and below 2**53, so a sqrt price or an 18-decimals amount that
+# already lost its low bits in a float is rejected instead of silently rounded. Results are
+# lists of ints; numpy int64 arrays can't hold Q96 values, so keep object dtype if converting.
+
+_MAX_EXACT_FLOAT = 1 << 53
+
+
+def _exact_int(value, name: str, row: int) -> int:
+    if type(value) is int:
+        return value
+    if isinstance(value, float) and not abs(value) < _MAX_EXACT_FLOAT:
+        raise ValueError(f"{name}[{row}] = {value!r} is a float too large to be exact")
+    result = int(value)
+    if result != value:
+        raise ValueError(f"{name}[{row}] = {value!r} is not an integer")
+    return result
+
+
+def _columns(**columns):
+    """Columns as lists of exact ints, broadcasting single values to the common length"""
+    length = None
+    for name, values in columns.items():
+        if hasattr(values, "__len__") and not isinstance(values, (str, bytes)):
+            if length is None:
+                length = len(values)
+            elif len(values) != length:
+                raise ValueError(f"{name} has {len(values)} rows, expected {length}")
+    length = 1 if length is None else length
+    result = []
+    for name, values in columns.items():
+        if hasattr(values, "__len__") and not isinstance(values, (str, bytes)):
+            result.append([_exact_int(v, name, row) for row, v in enumerate(values)])
+        else:
+            result.append([_exact_int(values, name, 0)] * length)
+    return result
+
+
+def _sqrt_ratios(*tick_columns) -> dict:
+    ticks = set()
+    for column in tick_columns:
+        ticks.update(column)
+    return {tick: _sqrt_ratio_at_tick(tick) for tick in ticks}
+
+
+def get_liquidity_for_amounts_many(
+    sqrt_prices, ticks_lower, ticks_upper, amounts0, amounts1
+) -> List[int]:
+    """get_liquidity_for_amounts for every (sqrt price, tick range, amount0, amount1) row"""
+    sqrt_prices, ticks_lower, ticks_upper, amounts0, amounts1 = _columns(
+        sqrt_prices=sqrt_prices,
+        ticks_lower=ticks_lower,
+        ticks_upper=ticks_upper,
+        amounts0=amounts0,
+        amounts1=amounts1,
+    )
+    sqrt_ratios = _sqrt_ratios(ticks_lower, ticks_upper)
+    liquidities = []
+    append = liquidities.append
+    for sqrt_ratio, lower, upper, amount0, amount1 in zip(
+        sqrt_prices, ticks_lower, ticks_upper, amounts0, amounts1
+    ):
+        sqrt_ratioA, sqrt_ratioB = sqrt_ratios[lower], sqrt_ratios[upper]
+        if sqrt_ratioA > sqrt_ratioB:
+            sqrt_ratioA, sqrt_ratioB = (sqrt_ratioB, sqrt_ratioA)
+        if sqrt_ratio <= sqrt_ratioA:
+            liquidity = amount0 * ((sqrt_ratioA * sqrt_ratioB) >> RESOLUTION)
+            liquidity //= sqrt_ratioB - sqrt_ratioA
+        elif sqrt_ratio < sqrt_ratioB:
+            liquidity = amount0 * ((sqrt_ratio * sqrt_ratioB) >> RESOLUTION)
+            liquidity //= sqrt_ratioB - sqrt_ratio
+            liquidity1 = (amount1 << RESOLUTION) // (sqrt_ratio - sqrt_ratioA)
+            # both sides are cast to uint128 before taking the smaller one
+            if liquidity1 > MAX_UINT128:
+                liquidity = liquidity1
+            elif liquidity1 < liquidity <= MAX_UINT128:
+                liquidity = liquidity1
+        else:
+            liquidity = (amount1 << RESOLUTION) // (sqrt_ratioB - sqrt_ratioA)
+        if liquidity > MAX_UINT128:
+            raise ValueError(f"uint128 overflow in row {len(liquidities)}")
+        append(liquidity)
+    return liquidities
+
+
+def get_amounts_for_liquidity_many(
+    sqrt_prices, ticks_lower, ticks_upper, liquidities
+) -> Tuple[List[int], List[int]]:
+    """get_amounts_for_liquidity for every (sqrt price, tick range, liquidity) row
+    Returns (amounts0, amounts1)
+    """
+    sqrt_prices, ticks_lower, ticks_upper, liquidities = _columns(
+        sqrt_prices=sqrt_prices,
+        ticks_lower=ticks_lower,
+        ticks_upper=ticks_upper,
+        liquidities=liquidities,
+    )
+    sqrt_ratios = _sqrt_ratios(ticks_lower, ticks_upper)
+    amounts0, amounts1 = [], []
+    for sqrt_ratio, lower, upper, liquidity in zip(
+        sqrt_prices, ticks_lower, ticks_upper, liquidities
+    ):
+        sqrt_ratioA, sqrt_ratioB = sqrt_ratios[lower], sqrt_ratios[upper]
+        if sqrt_ratioA > sqrt_ratioB:
+            sqrt_ratioA, sqrt_ratioB = (sqrt_ratioB, sqrt_ratioA)
+        amount0 = amount1 = 0
+        if sqrt_ratio <= sqrt_ratioA:
+            amount0 = (
+                (liquidity << RESOLUTION)
+                * (sqrt_ratioB - sqrt_ratioA)
+                // (sqrt_ratioB * sqrt_ratioA)
+            )
+        elif sqrt_ratio < sqrt_ratioB:
+            amount0 = (
+                (liquidity << RESOLUTION) * (sqrt_ratioB - sqrt_ratio) // (sqrt_ratioB * sqrt_ratio)
+            )
+            amount1 = (liquidity * (sqrt_ratio - sqrt_ratioA)) >> RESOLUTION
+        else:
+            amount1 = (liquidity * (sqrt_ratioB - sqrt_ratioA)) >> RESOLUTION
+        amounts0.append(amount0)
+        amounts1.append(amount1)
+    return amounts0, amounts1
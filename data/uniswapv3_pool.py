@@ -0,0 +1,257 @@
+"""Offline Uniswap V3 swaps
+
+A port of `UniswapV3Pool.swap`, with `SwapMath.computeSwapStep` and
+`TickBitmap.nextInitializedTickWithinOneWord`, working from a `UniswapV3State` snapshot of
+slot0, the active liquidity, the tick bitmap and the liquidityNet of initialized ticks. Swaps
+step to the next initialized tick or bitmap word boundary exactly like the contract, so quotes
+match `Quoter.quoteExactInputSingle` / `quoteExactOutputSingle` to the unit as long as the
+snapshot is current.
+
+Arithmetic is the integer math of data/uniswapv3.py; reverts are raised as ValueError.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from data.uniswapv3 import (
+    MAX_SQRT_RATIO,
+    MAX_TICK,
+    MAX_UINT128,
+    MIN_SQRT_RATIO,
+    MIN_TICK,
+    get_amount0_delta,
+    get_amount1_delta,
+    get_next_sqrt_price_from_input,
+    get_next_sqrt_price_from_output,
+    get_sqrt_ratio_at_tick,
+    get_tick_at_sqrt_ratio,
+    mul_div,
+    mul_div_rounding_up,
+)
+
+FEE_DENOMINATOR = 10**6  # fees are in hundredths of a bip
+
+
+@dataclass
+class UniswapV3State:
+    address: str
+    token0: str
+    token1: str
+    fee: int
+    tick_spacing: int
+    sqrt_price_x96: int
+    tick: int
+    liquidity: int
+    # word position -> bitmap word, for every non-empty word of the pool
+    tick_bitmap: Dict[int, int] = field(default_factory=dict)
+    # initialized tick -> liquidityNet
+    liquidity_net: Dict[int, int] = field(default_factory=dict)
+
+
+class SwapResult(NamedTuple):
+    amount0: int  # positive: paid into the pool, negative: paid out
+    amount1: int
+    sqrt_price_x96: int
+    tick: int
+    liquidity: int
+
+
+def position(compressed: int) -> Tuple[int, int]:
+    """(word position, bit position) of a compressed tick in the bitmap"""
+    return compressed >> 8, compressed & 0xFF
+
+
+def compute_swap_step(
+    sqrt_ratio_current: int,
+    sqrt_ratio_target: int,
+    liquidity: int,
+    amount_remaining: int,
+    fee_pips: int,
+) -> Tuple[int, int, int, int]:
+    """SwapMath.computeSwapStep: (sqrt ratio next, amount in, amount out, fee amount)
+    `amount_remaining` is positive for exact input and negative for exact output
+    """
+    zero_for_one = sqrt_ratio_current >= sqrt_ratio_target
+    exact_in = amount_remaining >= 0
+
+    if exact_in:
+        remaining_less_fee = mul_div(amount_remaining, FEE_DENOMINATOR - fee_pips, FEE_DENOMINATOR)
+        if zero_for_one:
+            amount_in = get_amount0_delta(sqrt_ratio_target, sqrt_ratio_current, liquidity, True)
+        else:
+            amount_in = get_amount1_delta(sqrt_ratio_current, sqrt_ratio_target, liquidity, True)
+        if remaining_less_fee >= amount_in:
+            sqrt_ratio_next = sqrt_ratio_target
+        else:
+            sqrt_ratio_next = get_next_sqrt_price_from_input(
+                sqrt_ratio_current, liquidity, remaining_less_fee, zero_for_one
+            )
+    else:
+        if zero_for_one:
+            amount_out = get_amount1_delta(sqrt_ratio_target, sqrt_ratio_current, liquidity, False)
+        else:
+            amount_out = get_amount0_delta(sqrt_ratio_current, sqrt_ratio_target, liquidity, False)
+        if -amount_remaining >= amount_out:
+            sqrt_ratio_next = sqrt_ratio_target
+        else:
+            sqrt_ratio_next = get_next_sqrt_price_from_output(
+                sqrt_ratio_current, liquidity, -amount_remaining, zero_for_one
+            )
+
+    reached_target = sqrt_ratio_target == sqrt_ratio_next
+
+    if zero_for_one:
+        if not (reached_target and exact_in):
+            amount_in = get_amount0_delta(sqrt_ratio_next, sqrt_ratio_current, liquidity, True)
+        if not (reached_target and not exact_in):
+            amount_out = get_amount1_delta(sqrt_ratio_next, sqrt_ratio_current, liquidity, False)
+    else:
+        if not (reached_target and exact_in):
+            amount_in = get_amount1_delta(sqrt_ratio_current, sqrt_ratio_next, liquidity, True)
+        if not (reached_target and not exact_in):
+            amount_out = get_amount0_delta(sqrt_ratio_current, sqrt_ratio_next, liquidity, False)
+
+    # cap the output amount to not exceed the remaining output amount
+    if not exact_in and amount_out > -amount_remaining:
+        amount_out = -amount_remaining
+
+    if exact_in and sqrt_ratio_next != sqrt_ratio_target:
+        # we didn't reach the target, so take the remainder of the maximum input as fee
+        fee_amount = amount_remaining - amount_in
+    else:
+        fee_amount = mul_div_rounding_up(amount_in, fee_pips, FEE_DENOMINATOR - fee_pips)
+
+    return sqrt_ratio_next, amount_in, amount_out, fee_amount
+
+
+class UniswapV3Pool:
+    def __init__(self, state: UniswapV3State) -> None:
+        self.state = state
+
+    def next_initialized_tick_within_one_word(self, tick: int, lte: bool) -> Tuple[int, bool]:
+        """TickBitmap.nextInitializedTickWithinOneWord: (next tick, whether it is initialized)
+        Stops at the boundary of the bitmap word when no tick of the word is initialized.
+        """
+        spacing = self.state.tick_spacing
+        compressed = tick // spacing  # rounds towards negative infinity, as the contract does
+
+        if lte:
+            word_pos, bit_pos = position(compressed)
+            # all the 1s at or to the right of the current bit_pos
+            masked = self.state.tick_bitmap.get(word_pos, 0) & ((2 << bit_pos) - 1)
+            if masked:
+                most_significant_bit = masked.bit_length() - 1
+                return (compressed - (bit_pos - most_significant_bit)) * spacing, True
+            return (compressed - bit_pos) * spacing, False
+
+        word_pos, bit_pos = position(compressed + 1)
+        # all the 1s at or to the left of bit_pos
+        masked = self.state.tick_bitmap.get(word_pos, 0) & ~((1 << bit_pos) - 1)
+        if masked:
+            least_significant_bit = (masked & -masked).bit_length() - 1
+            return (compressed + 1 + (least_significant_bit - bit_pos)) * spacing, True
+        return (compressed + 1 + (255 - bit_pos)) * spacing, False
+
+    def swap(
+        self,
+        zero_for_one: bool,
+        amount_specified: int,
+        sqrt_price_limit_x96: Optional[int] = None,
+    ) -> SwapResult:
+        """UniswapV3Pool.swap, without changing the state
+        `amount_specified` is positive for exact input and negative for exact output. Without a
+        price limit the swap may move the price anywhere, as the Quoter does with a 0 limit.
+        """
+        state = self.state
+        if amount_specified == 0:
+            raise ValueError("AS")
+        if sqrt_price_limit_x96 is None:
+            sqrt_price_limit_x96 = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+        if zero_for_one:
+            if not MIN_SQRT_RATIO < sqrt_price_limit_x96 < state.sqrt_price_x96:
+                raise ValueError("SPL")
+        elif not state.sqrt_price_x96 < sqrt_price_limit_x96 < MAX_SQRT_RATIO:
+            raise ValueError("SPL")
+
+        exact_input = amount_specified > 0
+        fee = state.fee
+        remaining = amount_specified
+        calculated = 0
+        sqrt_price = state.sqrt_price_x96
+        tick = state.tick
+        liquidity = state.liquidity
+
+        while remaining != 0 and sqrt_price != sqrt_price_limit_x96:
+            sqrt_price_start = sqrt_price
+            tick_next, initialized = self.next_initialized_tick_within_one_word(tick, zero_for_one)
+            # the bitmap isn't aware of the tick bounds
+            tick_next = min(max(tick_next, MIN_TICK), MAX_TICK)
+            sqrt_price_next = get_sqrt_ratio_at_tick(tick_next)
+
+            if zero_for_one:
+                target = max(sqrt_price_next, sqrt_price_limit_x96)
+            else:
+                target = min(sqrt_price_next, sqrt_price_limit_x96)
+            sqrt_price, amount_in, amount_out, fee_amount = compute_swap_step(
+                sqrt_price, target, liquidity, remaining, fee
+            )
+
+            if exact_input:
+                remaining -= amount_in + fee_amount
+                calculated -= amount_out
+            else:
+                remaining += amount_out
+                calculated += amount_in + fee_amount
+
+            if sqrt_price == sqrt_price_next:
+                # crossed to the next tick, updating the active liquidity if it is initialized
+                if initialized:
+                    liquidity_net = state.liquidity_net.get(tick_next, 0)
+                    liquidity += -liquidity_net if zero_for_one else liquidity_net
+                    if liquidity < 0:
+                        raise ValueError("LS")
+                    if liquidity > MAX_UINT128:
+                        raise ValueError("LA")
+                tick = tick_next - 1 if zero_for_one else tick_next
+            elif sqrt_price != sqrt_price_start:
+                tick = get_tick_at_sqrt_ratio(sqrt_price)
+
+        if zero_for_one == exact_input:
+            amount0, amount1 = amount_specified - remaining, calculated
+        else:
+            amount0, amount1 = calculated, amount_specified - remaining
+        return SwapResult(amount0, amount1, sqrt_price, tick, liquidity)
+
+    # quotes
+
+    def quote_exact_input(self, zero_for_one: bool, amount_in: int) -> int:
+        """Output amount of selling `amount_in`, as Quoter.quoteExactInputSingle
+        If the pool runs out of liquidity, this is the output for the part it could take.
+        """
+        result = self.swap(zero_for_one, amount_in)
+        return -(result.amount1 if zero_for_one else result.amount0)
+
+    def quote_exact_output(self, zero_for_one: bool, amount_out: int) -> int:
+        """Input amount needed to buy `amount_out`, as Quoter.quoteExactOutputSingle"""
+        result = self.swap(zero_for_one, -amount_out)
+        amount_in, received = (
+            (result.amount0, -result.amount1) if zero_for_one else (result.amount1, -result.amount0)
+        )
+        if received != amount_out:
+            raise ValueError("Not enough liquidity")
+        return amount_in
+
+    def quote_exact_input_many(self, zero_for_one: bool, amounts: Sequence[int]) -> List[int]:
+        return [self.quote_exact_input(zero_for_one, amount) for amount in amounts]
+
+    def quote_exact_output_many(self, zero_for_one: bool, amounts: Sequence[int]) -> List[int]:
+        return [self.quote_exact_output(zero_for_one, amount) for amount in amounts]
+
+    def zero_for_one(self, token_in: str) -> bool:
+        """Swap direction for selling `token_in`"""
+        token_in = token_in.lower()
+        if token_in == self.state.token0.lower():
+            return True
+        if token_in == self.state.token1.lower():
+            return False
+        raise ValueError(f"{token_in} is not a token of pool {self.state.address}")
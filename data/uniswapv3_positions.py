@@ -0,0 +1,296 @@
+"""Batch valuation of Uniswap V3 NFT positions, and the CLPUniswapV3 calls to act on them
+
+`value_positions` reads any number of positions in two rounds of Multicall3 batches at one
+block: the position manager's `positions(tokenId)`, then slot0, the global fee growth and the
+fee growth outside the bounds of every position from their pools, whose addresses are derived
+(see data/pool_addresses.py). From that it computes, exactly as the position manager would on
+`collect`, each position's uncollected fees and the token amounts its liquidity is worth now.
+
+`plan_actions` turns valuations into a ranked list of `withdrawAll` (out of range positions,
+which earn nothing) and `collectAll` (in range positions with enough fees) calls, and
+`encode_plan` into the commands and calldata of a single `invoke`. The invoker acts as the
+owner, so the positions have to be approved for it (`setApprovalForAll`) first.
+"""
+
+import warnings
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from brownie import web3
+
+from data.multicall import DEFAULT_BATCH_SIZE, Call, aggregate, calldata, decode_words, to_signed
+from data.pool_addresses import (
+    UNISWAPV3_FACTORY,
+    UNISWAPV3_POOL_INIT_CODE_HASH,
+    derive_pool_address,
+)
+from data.uniswapv3 import MAX_UINT128, MAX_UINT256, Q128, get_amounts_for_liquidity_many
+
+# the same on every chain Uniswap deployed V3 to itself
+NONFUNGIBLE_POSITION_MANAGER = "0xC36442b4a4522E871399CD717aBDD847Ab11FE88"
+
+COLLECT = "collect"
+CLOSE = "close"
+
+
+@dataclass
+class PositionValue:
+    token_id: int
+    pool: str
+    token0: str
+    token1: str
+    fee: int
+    tick_lower: int
+    tick_upper: int
+    tick: int  # current tick of the pool
+    sqrt_price_x96: int
+    liquidity: int
+    amount0: int  # tokens the liquidity is worth at the current price
+    amount1: int
+    fees0: int  # uncollected fees, including tokens already owed
+    fees1: int
+
+    @property
+    def in_range(self) -> bool:
+        return self.tick_lower <= self.tick < self.tick_upper
+
+    def value_in_token1(self, amount0: int, amount1: int) -> int:
+        """amount0 priced at the pool price, plus amount1"""
+        return amount0 * self.sqrt_price_x96**2 // (1 << 192) + amount1
+
+
+@dataclass
+class PositionAction:
+    action: str  # COLLECT or CLOSE
+    position: PositionValue
+    value: float  # of the tokens the action releases, used for ranking
+    amount0_min: int = 0
+    amount1_min: int = 0
+
+
+def _address(word: int) -> str:
+    return "0x" + (word & ((1 << 160) - 1)).to_bytes(20, "big").hex()
+
+
+def _decode_position(data: bytes) -> dict:
+    words = decode_words(data)
+    return {
+        "token0": _address(words[2]),
+        "token1": _address(words[3]),
+        "fee": words[4],
+        "tick_lower": to_signed(words[5], 24),
+        "tick_upper": to_signed(words[6], 24),
+        "liquidity": words[7],
+        "fee_growth_inside0_last": words[8],
+        "fee_growth_inside1_last": words[9],
+        "tokens_owed0": words[10],
+        "tokens_owed1": words[11],
+    }
+
+
+def _decode_slot0(data: bytes) -> Tuple[int, int]:
+    words = decode_words(data)
+    return words[0], to_signed(words[1], 24)
+
+
+def _decode_fee_growth_outside(data: bytes) -> Tuple[int, int]:
+    words = decode_words(data)
+    return words[2], words[3]
+
+
+def token_ids_of(
+    owner: str,
+    manager: str = NONFUNGIBLE_POSITION_MANAGER,
+    block_number: Optional[int] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> List[int]:
+    """Token ids of every position held by `owner`"""
+    owner_arg = int(owner, 16)
+    (balance,) = aggregate([Call.uint(manager, "balanceOf(address)", owner_arg)], block_number)
+    calls = [
+        Call.uint(manager, "tokenOfOwnerByIndex(address,uint256)", owner_arg, index)
+        for index in range(balance or 0)
+    ]
+    return [token_id for token_id in aggregate(calls, block_number, batch_size) if token_id]
+
+
+def fee_growth_inside(
+    tick: int,
+    tick_lower: int,
+    tick_upper: int,
+    global_x128: int,
+    lower_outside_x128: int,
+    upper_outside_x128: int,
+) -> int:
+    """Tick.getFeeGrowthInside, for one token (the contract relies on uint256 wrapping)"""
+    below = lower_outside_x128 if tick >= tick_lower else global_x128 - lower_outside_x128
+    above = upper_outside_x128 if tick < tick_upper else global_x128 - upper_outside_x128
+    return (global_x128 - below - above) & MAX_UINT256
+
+
+def fees_owed(liquidity: int, inside_x128: int, inside_last_x128: int, owed: int) -> int:
+    """tokensOwed after the position manager's collect: owed + liquidity * growth since last"""
+    earned = ((inside_x128 - inside_last_x128) & MAX_UINT256) * liquidity // Q128
+    return owed + (earned & MAX_UINT128)
+
+
+def value_positions(
+    token_ids: Sequence[int],
+    manager: str = NONFUNGIBLE_POSITION_MANAGER,
+    factory: str = UNISWAPV3_FACTORY,
+    block_number: Optional[int] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    init_code_hash: str = UNISWAPV3_POOL_INIT_CODE_HASH,
+) -> List[PositionValue]:
+    """Valuations of the positions `token_ids` (burnt or unknown ids are left out)"""
+    if block_number is None:
+        block_number = web3.eth.block_number
+
+    calls = [Call(manager, calldata("positions(uint256)", i), _decode_position) for i in token_ids]
+    positions = {
+        token_id: position
+        for token_id, position in zip(token_ids, aggregate(calls, block_number, batch_size))
+        if position is not None
+    }
+
+    keys = {(p["token0"], p["token1"], p["fee"]) for p in positions.values()}
+    pools = {key: derive_pool_address(factory, *key, init_code_hash) for key in keys}
+
+    # per pool: slot0 and global fee growth; per (pool, tick): fee growth outside
+    addresses = sorted(set(pools.values()))
+    bounds = sorted(
+        {
+            (pools[(p["token0"], p["token1"], p["fee"])], tick)
+            for p in positions.values()
+            for tick in (p["tick_lower"], p["tick_upper"])
+        }
+    )
+    calls = []
+    for pool in addresses:
+        calls += [
+            Call(pool, calldata("slot0()"), _decode_slot0),
+            Call.uint(pool, "feeGrowthGlobal0X128()"),
+            Call.uint(pool, "feeGrowthGlobal1X128()"),
+        ]
+    calls += [
+        Call(pool, calldata("ticks(int24)", tick), _decode_fee_growth_outside)
+        for pool, tick in bounds
+    ]
+    results = aggregate(calls, block_number, batch_size)
+    pool_state = {pool: results[3 * n : 3 * n + 3] for n, pool in enumerate(addresses)}
+    outside = dict(zip(bounds, results[3 * len(addresses) :]))
+
+    rows = []
+    for token_id, p in positions.items():
+        pool = pools[(p["token0"], p["token1"], p["fee"])]
+        slot0, global0, global1 = pool_state.get(pool, (None, None, None))
+        lower = outside.get((pool, p["tick_lower"]))
+        upper = outside.get((pool, p["tick_upper"]))
+        if None in (slot0, global0, global1, lower, upper):
+            warnings.warn(f"Could not read the pool of position {token_id}, skipping")
+            continue
+        sqrt_price, tick = slot0
+        inside0 = fee_growth_inside(
+            tick, p["tick_lower"], p["tick_upper"], global0, lower[0], upper[0]
+        )
+        inside1 = fee_growth_inside(
+            tick, p["tick_lower"], p["tick_upper"], global1, lower[1], upper[1]
+        )
+        rows.append(
+            PositionValue(
+                token_id=token_id,
+                pool=pool,
+                token0=p["token0"],
+                token1=p["token1"],
+                fee=p["fee"],
+                tick_lower=p["tick_lower"],
+                tick_upper=p["tick_upper"],
+                tick=tick,
+                sqrt_price_x96=sqrt_price,
+                liquidity=p["liquidity"],
+                amount0=0,
+                amount1=0,
+                fees0=fees_owed(
+                    p["liquidity"], inside0, p["fee_growth_inside0_last"], p["tokens_owed0"]
+                ),
+                fees1=fees_owed(
+                    p["liquidity"], inside1, p["fee_growth_inside1_last"], p["tokens_owed1"]
+                ),
+            )
+        )
+
+    amounts0, amounts1 = get_amounts_for_liquidity_many(
+        [row.sqrt_price_x96 for row in rows],
+        [row.tick_lower for row in rows],
+        [row.tick_upper for row in rows],
+        [row.liquidity for row in rows],
+    )
+    for row, amount0, amount1 in zip(rows, amounts0, amounts1):
+        row.amount0, row.amount1 = amount0, amount1
+    return rows
+
+
+def plan_actions(
+    positions: Iterable[PositionValue],
+    prices: Optional[Dict[str, float]] = None,
+    min_collect_value: float = 0,
+    slippage: float = 0.005,
+) -> List[PositionAction]:
+    """Ranked actions for `positions`, most valuable first
+
+    Out of range positions with liquidity are closed (withdrawAll), with min amounts
+    `slippage` below their current worth. Other positions whose fees are worth more than
+    `min_collect_value` are collected (collectAll). Values use `prices`, the value of one
+    unit (wei) of each token keyed by lowercase address; without them they are in token1 of
+    each position's pool, which is only comparable between positions of the same pool.
+    """
+    value: Callable[[PositionValue, int, int], float]
+    if prices is None:
+        value = PositionValue.value_in_token1
+    else:
+
+        def value(position: PositionValue, amount0: int, amount1: int) -> float:
+            return amount0 * prices[position.token0] + amount1 * prices[position.token1]
+
+    actions = []
+    for position in positions:
+        if position.liquidity and not position.in_range:
+            actions.append(
+                PositionAction(
+                    CLOSE,
+                    position,
+                    value(
+                        position,
+                        position.amount0 + position.fees0,
+                        position.amount1 + position.fees1,
+                    ),
+                    int(position.amount0 * (1 - slippage)),
+                    int(position.amount1 * (1 - slippage)),
+                )
+            )
+        elif position.fees0 or position.fees1:
+            fees_value = value(position, position.fees0, position.fees1)
+            if fees_value > min_collect_value:
+                actions.append(PositionAction(COLLECT, position, fees_value))
+    actions.sort(key=lambda action: action.value, reverse=True)
+    return actions
+
+
+def encode_plan(
+    actions: Iterable[PositionAction],
+    clp_uniswapv3,
+    receiver: str,
+    deadline: int,
+    manager: str = NONFUNGIBLE_POSITION_MANAGER,
+) -> Tuple[list, list]:
+    """(commands, calldatas) of one `invoke` carrying out `actions` through `clp_uniswapv3`"""
+    commands, calldatas = [], []
+    for action in actions:
+        token_id = action.position.token_id
+        if action.action == CLOSE:
+            params = (manager, action.amount0_min, action.amount1_min, receiver, deadline)
+            calldatas.append(clp_uniswapv3.withdrawAll.encode_input(token_id, params))
+        else:
+            calldatas.append(clp_uniswapv3.collectAll.encode_input(manager, token_id, receiver))
+        commands.append(clp_uniswapv3)
+    return commands, calldatas
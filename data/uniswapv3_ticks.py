@@ -0,0 +1,322 @@
+"""Block-pinned Uniswap V3 pool snapshots, with every initialized tick
+
+`UniswapV3Snapshot.take` reads a pool's slot0 and active liquidity, then every `tickBitmap`
+word of its tick range, then `ticks(i)` of each tick whose bit is set, in three rounds of
+Multicall3 batches at one block. Snapshots are stored per pool and block under
+data/snapshots/uniswapv3/<chain id>/<pool>/<block>.pkl, and `state()` turns them into the
+`UniswapV3State` of data/uniswapv3_pool.py.
+
+`refresh` moves a snapshot to a later block without reading the tick range again: it replays
+the pool's Mint and Burn logs since the snapshot block on the tick liquidity (the only events
+that initialize, clear or change ticks) and re-reads slot0 and liquidity. `get_snapshot` loads
+the latest stored snapshot of a pool and refreshes it, or takes a new one. On a fork, it only
+stores and reuses snapshots up to the fork block: later blocks are local to the session.
+
+Only liquidityGross and liquidityNet are kept for ticks; fee growth outside a tick changes on
+every crossing and can't be replayed from these logs.
+"""
+
+import os
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+from brownie import web3
+from eth_utils import to_checksum_address
+
+from data.chain import get_chain_id, last_shared_block
+from data.multicall import DEFAULT_BATCH_SIZE, Call, aggregate, calldata, decode_words, to_signed
+from data.uniswapv3 import MAX_TICK, MIN_TICK
+from data.uniswapv3_pool import UniswapV3Pool, UniswapV3State, position
+from data.yaml_snapshot import atomic_write
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DIR = os.path.join("data", "snapshots", "uniswapv3")
+
+MINT_EVENT = "Mint(address,address,int24,int24,uint128,uint256,uint256)"
+BURN_EVENT = "Burn(address,int24,int24,uint128,uint256,uint256)"
+# blocks per eth_getLogs request, below the limits of the common providers
+LOG_BLOCK_RANGE = 2000
+
+# tick -> (liquidityGross, liquidityNet)
+Ticks = Dict[int, Tuple[int, int]]
+
+
+def snapshot_dir(chain_id, pool: str, directory=SNAPSHOT_DIR) -> str:
+    return os.path.join(directory, str(chain_id), pool.lower())
+
+
+def snapshot_blocks(chain_id, pool: str, directory=SNAPSHOT_DIR) -> List[int]:
+    """Blocks with a stored snapshot of `pool`, oldest first"""
+    try:
+        names = os.listdir(snapshot_dir(chain_id, pool, directory))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-4]) for name in names if name.endswith(".pkl"))
+
+
+def _decode_address(data: bytes) -> str:
+    return "0x" + data[12:32].hex()
+
+
+def _decode_slot0(data: bytes) -> Tuple[int, int]:
+    words = decode_words(data)
+    return words[0], to_signed(words[1], 24)
+
+
+def _decode_tick(data: bytes) -> Tuple[int, int]:
+    words = decode_words(data)
+    return words[0], to_signed(words[1], 128)
+
+
+def _decode_int24(data: bytes) -> int:
+    return to_signed(decode_words(data)[0], 24)
+
+
+def word_range(tick_spacing: int) -> range:
+    """Positions of every tick bitmap word a pool with `tick_spacing` can use"""
+    return range(position(MIN_TICK // tick_spacing)[0], position(MAX_TICK // tick_spacing)[0] + 1)
+
+
+class UniswapV3Snapshot:
+    def __init__(
+        self,
+        chain_id,
+        address: str,
+        block_number: int,
+        token0: str,
+        token1: str,
+        fee: int,
+        tick_spacing: int,
+        sqrt_price_x96: int,
+        tick: int,
+        liquidity: int,
+        ticks: Ticks,
+    ) -> None:
+        self.chain_id = str(chain_id)
+        self.address = address.lower()
+        self.block_number = block_number
+        self.token0 = token0
+        self.token1 = token1
+        self.fee = fee
+        self.tick_spacing = tick_spacing
+        self.sqrt_price_x96 = sqrt_price_x96
+        self.tick = tick
+        self.liquidity = liquidity
+        self.ticks = ticks
+
+    # reading
+
+    @staticmethod
+    def _read_globals(address: str, block_number: int, batch_size: int) -> dict:
+        calls = [
+            Call(address, calldata("token0()"), _decode_address),
+            Call(address, calldata("token1()"), _decode_address),
+            Call.uint(address, "fee()"),
+            Call(address, calldata("tickSpacing()"), _decode_int24),
+            Call(address, calldata("slot0()"), _decode_slot0),
+            Call.uint(address, "liquidity()"),
+        ]
+        token0, token1, fee, tick_spacing, slot0, liquidity = aggregate(
+            calls, block_number, batch_size
+        )
+        if None in (token0, token1, fee, tick_spacing, slot0, liquidity):
+            raise ValueError(f"{address} is not a Uniswap V3 pool")
+        return {
+            "token0": token0,
+            "token1": token1,
+            "fee": fee,
+            "tick_spacing": tick_spacing,
+            "sqrt_price_x96": slot0[0],
+            "tick": slot0[1],
+            "liquidity": liquidity,
+        }
+
+    @classmethod
+    def take(
+        cls,
+        address: str,
+        block_number: Optional[int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        chain_id=None,
+    ) -> "UniswapV3Snapshot":
+        if block_number is None:
+            block_number = web3.eth.block_number
+        pool = cls._read_globals(address, block_number, batch_size)
+        spacing = pool["tick_spacing"]
+
+        words = word_range(spacing)
+        bitmap = aggregate(
+            [Call.uint(address, "tickBitmap(int16)", word) for word in words],
+            block_number,
+            batch_size,
+        )
+        initialized = []
+        for word_pos, word in zip(words, bitmap):
+            if word is None:
+                raise ValueError(f"Could not read tick bitmap word {word_pos} of {address}")
+            while word:
+                bit_pos = (word & -word).bit_length() - 1
+                initialized.append((word_pos * 256 + bit_pos) * spacing)
+                word &= word - 1
+
+        calls = [
+            Call(address, calldata("ticks(int24)", tick), _decode_tick) for tick in initialized
+        ]
+        ticks: Ticks = {}
+        for tick, info in zip(initialized, aggregate(calls, block_number, batch_size)):
+            if info is None:
+                raise ValueError(f"Could not read tick {tick} of {address}")
+            ticks[tick] = info
+
+        if chain_id is None:
+            chain_id = get_chain_id()
+        return cls(chain_id, address, block_number, ticks=ticks, **pool)
+
+    def refresh(
+        self, block_number: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> "UniswapV3Snapshot":
+        """This snapshot moved to `block_number`, replaying the Mint and Burn logs in between"""
+        if block_number is None:
+            block_number = web3.eth.block_number
+        if block_number < self.block_number:
+            raise ValueError("Can't refresh a snapshot to an earlier block")
+
+        ticks = dict(self.ticks)
+        for tick_lower, tick_upper, delta in self._liquidity_deltas(block_number):
+            _update_tick(ticks, tick_lower, delta, upper=False)
+            _update_tick(ticks, tick_upper, delta, upper=True)
+
+        pool = self._read_globals(self.address, block_number, batch_size)
+        return type(self)(self.chain_id, self.address, block_number, ticks=ticks, **pool)
+
+    def _liquidity_deltas(self, block_number: int) -> List[Tuple[int, int, int]]:
+        """(tickLower, tickUpper, liquidity delta) of every Mint and Burn after the snapshot"""
+        mint_topic = web3.keccak(text=MINT_EVENT)
+        burn_topic = web3.keccak(text=BURN_EVENT)
+        deltas = []
+        for start in range(self.block_number + 1, block_number + 1, LOG_BLOCK_RANGE):
+            logs = web3.eth.get_logs(
+                {
+                    "address": to_checksum_address(self.address),
+                    "fromBlock": start,
+                    "toBlock": min(start + LOG_BLOCK_RANGE - 1, block_number),
+                    "topics": [[mint_topic.hex(), burn_topic.hex()]],
+                }
+            )
+            for log in sorted(logs, key=lambda log: (log["blockNumber"], log["logIndex"])):
+                topics = log["topics"]
+                data = log["data"]
+                data = bytes.fromhex(data[2:]) if isinstance(data, str) else bytes(data)
+                # Mint(sender, owner, ...) has the sender before the amount in its data
+                is_mint = bytes(topics[0]) == bytes(mint_topic)
+                amount = decode_words(data)[1 if is_mint else 0]
+                if amount == 0:
+                    continue  # a Burn of 0 only pokes the position's fees
+                tick_lower = to_signed(int.from_bytes(bytes(topics[2]), "big"), 24)
+                tick_upper = to_signed(int.from_bytes(bytes(topics[3]), "big"), 24)
+                deltas.append((tick_lower, tick_upper, amount if is_mint else -amount))
+        return deltas
+
+    # storage
+
+    def path(self, directory=SNAPSHOT_DIR) -> str:
+        return os.path.join(
+            snapshot_dir(self.chain_id, self.address, directory), f"{self.block_number}.pkl"
+        )
+
+    def save(self, directory=SNAPSHOT_DIR) -> str:
+        path = self.path(directory)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        snapshot = {"version": SNAPSHOT_VERSION, **vars(self)}
+        atomic_write(path, pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL))
+        return path
+
+    @classmethod
+    def load(
+        cls, chain_id, address: str, block_number: Optional[int] = None, directory=SNAPSHOT_DIR
+    ) -> "UniswapV3Snapshot":
+        """Loads the snapshot of `address` at `block_number` (by default, the latest one)"""
+        if block_number is None:
+            blocks = snapshot_blocks(chain_id, address, directory)
+            if not blocks:
+                raise FileNotFoundError(f"No snapshots of {address} on chain {chain_id}")
+            block_number = blocks[-1]
+        path = os.path.join(snapshot_dir(chain_id, address, directory), f"{block_number}.pkl")
+        with open(path, "rb") as infile:
+            snapshot = pickle.load(infile)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version in {path}")
+        del snapshot["version"]
+        return cls(**snapshot)
+
+    # engines
+
+    def tick_bitmap(self) -> Dict[int, int]:
+        bitmap: Dict[int, int] = {}
+        for tick in self.ticks:
+            word_pos, bit_pos = position(tick // self.tick_spacing)
+            bitmap[word_pos] = bitmap.get(word_pos, 0) | (1 << bit_pos)
+        return bitmap
+
+    def state(self) -> UniswapV3State:
+        return UniswapV3State(
+            address=self.address,
+            token0=self.token0,
+            token1=self.token1,
+            fee=self.fee,
+            tick_spacing=self.tick_spacing,
+            sqrt_price_x96=self.sqrt_price_x96,
+            tick=self.tick,
+            liquidity=self.liquidity,
+            tick_bitmap=self.tick_bitmap(),
+            liquidity_net={tick: net for tick, (_, net) in self.ticks.items()},
+        )
+
+    def engine(self) -> UniswapV3Pool:
+        return UniswapV3Pool(self.state())
+
+
+def _update_tick(ticks: Ticks, tick: int, delta: int, upper: bool):
+    """Tick.update: applies a liquidity delta of a position with `tick` as a bound"""
+    gross, net = ticks.get(tick, (0, 0))
+    gross += delta
+    net += -delta if upper else delta
+    if gross < 0:
+        raise ValueError(f"Liquidity of tick {tick} would go negative, the logs are incomplete")
+    if gross == 0:
+        ticks.pop(tick, None)  # the tick is cleared and its bit flipped off
+    else:
+        ticks[tick] = (gross, net)
+
+
+def get_snapshot(
+    address: str,
+    block_number: Optional[int] = None,
+    directory=SNAPSHOT_DIR,
+    save: bool = True,
+) -> UniswapV3Snapshot:
+    """Snapshot of `address` at `block_number` (by default, the latest block)
+
+    Reuses the latest stored snapshot at or before that block, refreshed through the pool's
+    logs, and only reads the whole tick range when there is none. Snapshots after the fork
+    block of a fork are neither reused nor stored.
+    """
+    chain_id = get_chain_id()
+    if block_number is None:
+        block_number = web3.eth.block_number
+    shared_block = last_shared_block(block_number)
+    blocks = [b for b in snapshot_blocks(chain_id, address, directory) if b <= shared_block]
+    if blocks:
+        snapshot = UniswapV3Snapshot.load(chain_id, address, blocks[-1], directory)
+        if snapshot.block_number == block_number:
+            return snapshot
+        snapshot = snapshot.refresh(block_number)
+    else:
+        snapshot = UniswapV3Snapshot.take(address, block_number, chain_id=chain_id)
+    if save and block_number <= shared_block:
+        snapshot.save(directory)
+    return snapshot
+
+
+def read_pool_state(address: str, block_number: Optional[int] = None) -> UniswapV3State:
+    return get_snapshot(address, block_number).state()
@@ -0,0 +1,92 @@
+"""Compiled binary snapshots of the YAML data files
+
+Parsing the chain data and curve.yaml with PyYAML is slow relative to everything else done at
+startup, and it is repeated by every brownie script, pytest worker and network run.
+`load_yaml` parses a YAML file once, pickles the result next to it, and serves the pickle on
+later loads for as long as the sha256 of the YAML source matches the one recorded in it.
+"""
+
+import fcntl
+import hashlib
+import os
+import pickle
+import tempfile
+from contextlib import contextmanager
+
+import yaml
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snapshot.pkl"
+
+
+def snapshot_path(path):
+    return os.path.splitext(path)[0] + SNAPSHOT_SUFFIX
+
+
+def _digest(source: bytes) -> str:
+    return hashlib.sha256(source).hexdigest()
+
+
+def _read_snapshot(path, digest):
+    try:
+        with open(snapshot_path(path), "rb") as infile:
+            snapshot = pickle.load(infile)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    # a foreign or damaged file at the snapshot path can unpickle to anything
+    if not isinstance(snapshot, dict):
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("sha256") != digest:
+        return None
+    return snapshot
+
+
+def atomic_write(path, contents: bytes):
+    """Write `contents` to `path` so that readers never observe a partially written file"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as outfile:
+            outfile.write(contents)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on `path` (through a `<path>.lock` file) for the duration of the block
+    Serialises read-modify-write cycles of data files between concurrent processes
+    """
+    with open(path + ".lock", "w") as lockfile:
+        fcntl.flock(lockfile, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+
+def compile_yaml(path, source: bytes = None):
+    """Parse the YAML file at `path` and (re)write its snapshot. Returns the parsed data"""
+    if source is None:
+        with open(path, "rb") as infile:
+            source = infile.read()
+    data = yaml.safe_load(source)
+    snapshot = {"version": SNAPSHOT_VERSION, "sha256": _digest(source), "data": data}
+    try:
+        atomic_write(snapshot_path(path), pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL))
+    except OSError:
+        # read-only checkouts still work, they just parse the YAML every time
+        pass
+    return data
+
+
+def load_yaml(path):
+    """Load a YAML file through its snapshot, rebuilding the snapshot if the YAML changed"""
+    with open(path, "rb") as infile:
+        source = infile.read()
+    snapshot = _read_snapshot(path, _digest(source))
+    if snapshot is None:
+        return compile_yaml(path, source)
+    return snapshot["data"]
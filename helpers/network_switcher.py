@@ -2,6 +2,8 @@ import logging
 
 from brownie import network
 
+from data.chain import invalidate_chain_context
+
 
 class NetworkSwitcher(object):
     def __init__(self, network_name: str, return_to_original: bool = True) -> None:
@@ -13,10 +15,12 @@ class NetworkSwitcher(object):
         if self.new_network != self.previous_network:
             logging.debug(f"Switching to {self.new_network}")
             network.disconnect()
+            invalidate_chain_context()
             network.connect(self.new_network)
 
     def __exit__(self, type, value, traceback):
         if self.return_to_original and self.new_network != self.previous_network:
             logging.debug(f"Switching back to {self.previous_network}")
             network.disconnect()
+            invalidate_chain_context()
             network.connect(self.previous_network)
@@ -42,7 +42,7 @@ def main():
     (chain, mode) = get_chain_from_network_name(network.show_active())
     if not chain:
         raise ValueError(
-            "Network not supported in config. Please review data/chains.yaml", network.show_active()
+            "Network not supported in config. Please review data/chains/", network.show_active()
         )
 
     print(
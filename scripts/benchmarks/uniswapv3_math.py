@@ -0,0 +1,134 @@
+# Compares the exact integer Uniswap V3 math in data/uniswapv3.py with the float formulas it
+# replaced, on a tick-spacing grid like the ones position planning walks, and times planning
+# PLANNED_RANGES deposits with the scalar helpers against the batch (`_many`) versions
+# Usage: brownie run benchmarks/uniswapv3_math  (or python -m scripts.benchmarks.uniswapv3_math)
+
+import math
+import random
+import time
+from statistics import median
+
+from data.uniswapv3 import (
+    MAX_TICK,
+    Q96,
+    _sqrt_ratio_at_tick,
+    get_amounts_for_liquidity,
+    get_amounts_for_liquidity_many,
+    get_liquidity_for_amounts,
+    get_liquidity_for_amounts_many,
+    get_sqrt_ratio_at_tick,
+    get_tick_at_sqrt_ratio,
+)
+
+TICK_SPACING = 60
+RANGE_WIDTH = 10 * TICK_SPACING
+# positions are planned around prices where 1e18 of either token fits in uint128 liquidity
+POSITION_TICKS = 200_000
+SAMPLES = 10_000
+PLANNED_RANGES = 10_000
+REPEATS = 20
+
+
+def float_sqrt_ratio_at_tick(tick):
+    return int(math.sqrt(1.0001**tick) * Q96)
+
+
+def float_liquidity_for_amounts(sqrt_ratio, sqrt_ratioA, sqrt_ratioB, amount0, amount1):
+    liquidity0 = amount0 * (sqrt_ratio * sqrt_ratioB / Q96) / (sqrt_ratioB - sqrt_ratio)
+    liquidity1 = amount1 * Q96 / (sqrt_ratio - sqrt_ratioA)
+    return int(min(liquidity0, liquidity1))
+
+
+def _time(fn, repeats=REPEATS):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return median(samples)
+
+
+def _per_call(elapsed, calls):
+    return f"{elapsed / calls * 1e9:.0f} ns"
+
+
+def _report(name, exact, reference, calls):
+    print(
+        f"{name}: exact {_per_call(exact, calls)}, float {_per_call(reference, calls)} per call "
+        f"({reference / exact:.2f}x)"
+    )
+
+
+def plan_ranges(current_tick):
+    """Liquidity and amounts used of a 1 ETH / 2000 USDC deposit over PLANNED_RANGES ranges"""
+    sqrt_price = get_sqrt_ratio_at_tick(current_tick) + 1
+    base = current_tick // TICK_SPACING * TICK_SPACING
+    widths = [TICK_SPACING * (1 + n % 100) for n in range(PLANNED_RANGES)]
+    lowers = [base - width * (1 + n % 3) for n, width in enumerate(widths)]
+    uppers = [base + width * (1 + n // 3 % 3) for n, width in enumerate(widths)]
+    amount0, amount1 = 10**18, 2000 * 10**6
+
+    def scalar():
+        for lower, upper in zip(lowers, uppers):
+            sqrt_ratioA, sqrt_ratioB = get_sqrt_ratio_at_tick(lower), get_sqrt_ratio_at_tick(upper)
+            liquidity = get_liquidity_for_amounts(
+                sqrt_price, sqrt_ratioA, sqrt_ratioB, amount0, amount1
+            )
+            get_amounts_for_liquidity(sqrt_price, sqrt_ratioA, sqrt_ratioB, liquidity)
+
+    def batch():
+        liquidities = get_liquidity_for_amounts_many(sqrt_price, lowers, uppers, amount0, amount1)
+        get_amounts_for_liquidity_many(sqrt_price, lowers, uppers, liquidities)
+
+    scalar_time, batch_time = _time(scalar), _time(batch)
+    print(
+        f"Planning {PLANNED_RANGES} ranges: scalar {scalar_time * 1e3:.1f} ms, "
+        f"batch {batch_time * 1e3:.1f} ms ({scalar_time / batch_time:.2f}x)"
+    )
+
+
+def main():
+    random.seed(0)
+    max_tick = MAX_TICK // TICK_SPACING * TICK_SPACING
+    ticks = [random.randrange(-max_tick, max_tick, TICK_SPACING) for _ in range(SAMPLES)]
+
+    _sqrt_ratio_at_tick.cache_clear()
+    cold = _time(lambda: [get_sqrt_ratio_at_tick(t) for t in ticks], repeats=1)
+    exact = _time(lambda: [get_sqrt_ratio_at_tick(t) for t in ticks])
+    reference = _time(lambda: [float_sqrt_ratio_at_tick(t) for t in ticks])
+    print(f"getSqrtRatioAtTick, uncached: {_per_call(cold, SAMPLES)} per call")
+    _report("getSqrtRatioAtTick", exact, reference, SAMPLES)
+
+    prices = [
+        random.randrange(get_sqrt_ratio_at_tick(t), get_sqrt_ratio_at_tick(t + 1)) for t in ticks
+    ]
+    exact = _time(lambda: [get_tick_at_sqrt_ratio(p) for p in prices])
+    print(f"getTickAtSqrtRatio: {_per_call(exact, SAMPLES)} per call")
+
+    ranges = [
+        (
+            get_sqrt_ratio_at_tick(t),
+            get_sqrt_ratio_at_tick(t - RANGE_WIDTH),
+            get_sqrt_ratio_at_tick(t + RANGE_WIDTH),
+        )
+        for t in ticks
+        if abs(t) < POSITION_TICKS
+    ]
+    exact = _time(
+        lambda: [get_liquidity_for_amounts(p, a, b, 10**18, 10**18) for p, a, b in ranges]
+    )
+    reference = _time(
+        lambda: [float_liquidity_for_amounts(p, a, b, 10**18, 10**18) for p, a, b in ranges]
+    )
+    _report("getLiquidityForAmounts", exact, reference, len(ranges))
+    exact = _time(lambda: [get_amounts_for_liquidity(p, a, b, 10**18) for p, a, b in ranges])
+    print(f"getAmountsForLiquidity: {_per_call(exact, len(ranges))} per call")
+
+    plan_ranges(random.randrange(-POSITION_TICKS, POSITION_TICKS))
+
+    drift = sum(float_sqrt_ratio_at_tick(t) != get_sqrt_ratio_at_tick(t) for t in ticks)
+    print(f"float getSqrtRatioAtTick differs from TickMath on {drift}/{SAMPLES} ticks")
+
+
+if __name__ == "__main__":
+    main()
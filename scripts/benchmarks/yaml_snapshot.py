@@ -0,0 +1,65 @@
+# Compares loading the data YAML files with PyYAML against loading their compiled snapshots
+# Usage: brownie run benchmarks/yaml_snapshot  (or python -m scripts.benchmarks.yaml_snapshot)
+
+import os
+import subprocess
+import sys
+import time
+from statistics import median
+
+import yaml
+
+from data.yaml_snapshot import compile_yaml, load_yaml, snapshot_path
+
+DATA_FILES = [
+    os.path.join("data", "chains", "index.yaml"),
+    os.path.join("data", "chains", "mainnet.yaml"),
+    os.path.join("data", "curve.yaml"),
+]
+REPEATS = 20
+
+COLD_START = {
+    "yaml": "import yaml\nfor p in {paths!r}:\n    yaml.safe_load(open(p, 'rb'))",
+    "snapshot": "from data.yaml_snapshot import load_yaml\nfor p in {paths!r}:\n    load_yaml(p)",
+    "baseline": "import yaml, pickle, hashlib",
+}
+
+
+def _time(fn, repeats=REPEATS):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return median(samples)
+
+
+def _cold_start(code, repeats=5):
+    return _time(lambda: subprocess.run([sys.executable, "-c", code], check=True), repeats)
+
+
+def main():
+    for path in DATA_FILES:
+        with open(path, "rb") as infile:
+            source = infile.read()
+        compile_yaml(path)
+        parse = _time(lambda: yaml.safe_load(source))
+        snapshot = _time(lambda: load_yaml(path))
+        print(
+            f"{path} ({len(source) / 1024:.1f} KB, snapshot "
+            f"{os.path.getsize(snapshot_path(path)) / 1024:.1f} KB): "
+            f"yaml {parse * 1e3:.2f} ms, snapshot {snapshot * 1e3:.2f} ms, "
+            f"{parse / snapshot:.1f}x faster"
+        )
+
+    timings = {
+        name: _cold_start(code.format(paths=DATA_FILES)) for name, code in COLD_START.items()
+    }
+    baseline = timings.pop("baseline")
+    print(f"Cold start (new interpreter, minus {baseline * 1e3:.0f} ms import baseline):")
+    for name, elapsed in timings.items():
+        print(f"  {name}: {(elapsed - baseline) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Maintains the per-chain shards in data/chains/ and their index
+#
+# Usage: brownie run chain_shards
+#
+# Prefix the `key=value` before calling the command e.g. `MODE=merge brownie run chain_shards`
+# - MODE=validate (default) - check the index and shards are consistent
+# - MODE=index - regenerate data/chains/index.yaml from the shards
+# - MODE=merge - write the merged view of all shards to OUTPUT (defaults to stdout)
+
+import os
+import sys
+
+import yaml
+
+from data.chain import (
+    CHAIN_DATA_DIR,
+    CHAIN_INDEX_PATH,
+    build_chain_index,
+    get_registry,
+    validate_chain_shards,
+)
+from data.yaml_snapshot import atomic_write
+
+INDEX_HEADER = """\
+# Index of the chain shards in this directory. Generated by `MODE=index brownie run chain_shards`
+# Each chain lives in its own <id>.yaml, and only the connected chain's shard is ever loaded
+# Prod: the actual blockchain. Will require private keys
+# Fork: forked version of the blockchain, for local testing
+---
+"""
+
+
+def write_index():
+    with open(CHAIN_INDEX_PATH, "r") as infile:
+        order = list(yaml.safe_load(infile) or {})
+    index = build_chain_index(CHAIN_DATA_DIR, order=order)
+    contents = INDEX_HEADER + yaml.safe_dump(index, sort_keys=False)
+    atomic_write(CHAIN_INDEX_PATH, contents.encode())
+    print(f"Wrote {CHAIN_INDEX_PATH} ({len(index)} chains)")
+
+
+def write_merged(output):
+    contents = yaml.safe_dump(get_registry().data, sort_keys=False)
+    if output:
+        atomic_write(output, contents.encode())
+        print(f"Wrote merged chain data to {output}")
+    else:
+        sys.stdout.write(contents)
+
+
+def validate():
+    errors = validate_chain_shards(CHAIN_DATA_DIR)
+    for error in errors:
+        print(error)
+    if errors:
+        raise SystemExit(1)
+    print("Chain shards are consistent")
+
+
+def main():
+    mode = os.getenv("MODE", "validate")
+    if mode == "index":
+        write_index()
+    elif mode == "merge":
+        write_merged(os.getenv("OUTPUT"))
+    elif mode == "validate":
+        validate()
+    else:
+        raise ValueError(f"Unknown MODE: {mode}")
@@ -0,0 +1,22 @@
+# Compiles the YAML data files into the binary snapshots read by data/chain.py, data/curve.py,
+# data/pool_addresses.py and data/mint_strategies.py
+# Snapshots are rebuilt on demand whenever the YAML changes, this just pays that cost up front
+
+from data.chain import CHAIN_DATA_DIR, CHAIN_INDEX_PATH, get_shard_keys, shard_path
+from data.curve import CURVE_DATA_PATH
+from data.mint_strategies import MINT_STRATEGIES_PATH
+from data.pool_addresses import POOL_ADDRESSES_PATH
+from data.yaml_snapshot import compile_yaml, snapshot_path
+
+
+def main():
+    shards = [shard_path(key) for key in get_shard_keys(CHAIN_DATA_DIR)]
+    for path in [
+        CHAIN_INDEX_PATH,
+        *shards,
+        CURVE_DATA_PATH,
+        POOL_ADDRESSES_PATH,
+        MINT_STRATEGIES_PATH,
+    ]:
+        compile_yaml(path)
+        print(f"Compiled {path} -> {snapshot_path(path)}")
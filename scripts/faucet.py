@@ -14,7 +14,7 @@ ERC20Detailed = interface.ERC20Detailed
 
 
 def get_deployer_opts(account, value, chain):
-    if chain.get("eip1559"):
+    if chain.eip1559:
         return {"from": account, "value": value, "priority_fee": "2 gwei"}
     else:
         return {"from": account, "value": value}
@@ -24,7 +24,7 @@ def get_deployer_opts(account, value, chain):
 def swap_eth_for_tokens(account, chain, eth_amount=0.5):
     print(f"Swapping tokens for account {account.address}")
 
-    tokens = chain["assets"]
+    tokens = chain.tokens
 
     WETH_ADDRESS = get_wnative_address(chain)
     UNI_ROUTER_ADDRESS = get_uni_router_address(chain)
@@ -33,16 +33,13 @@ def swap_eth_for_tokens(account, chain, eth_amount=0.5):
     weth = Contract.from_abi("Weth", WETH_ADDRESS, WETH.abi)
     opts = get_deployer_opts(account, eth_amount * 1e18, chain)
 
-    print(f"Token list: {[tok['name'] for tok in tokens]}")
+    print(f"Token list: {[tok.name for tok in tokens]}")
 
     balances = []
     for token in tokens:
-        address = token["address"]
-        if not address:
-            continue  # undefined for native asset
-        if token.get("wrapped_native"):
+        if token.wrapped_native:
             continue  # dont swap into wrapped token
-        token = Contract.from_abi("ERC20", address, ERC20Detailed.abi)
+        token = Contract.from_abi("ERC20", token.checksum_address, ERC20Detailed.abi)
         symbol = token.symbol()
         decimals = token.decimals()
         path = [weth.address, token.address]
@@ -100,10 +97,10 @@ def main():
     (chain, _) = get_chain_from_network_name(network.show_active())
     if not chain:
         raise ValueError(
-            "Network not supported in config. Please review data/chains.yaml", network.show_active()
+            "Network not supported in config. Please review data/chains/", network.show_active()
         )
 
-    print(f"Script running on '{chain['id']}' network (Chain ID: {chain['chain_id']})")
+    print(f"Script running on '{chain.id}' network (Chain ID: {chain.chain_id})")
     account = get_account()
     eth_amount = get_eth_amount()
     swap_eth_for_tokens(account, chain, eth_amount)
@@ -1,55 +1,180 @@
-import json
+# Crawls the Curve registries of the active network into data/curve.yaml
+#
+# Only pools past the pool_count reached by the previous crawl of each registry are read (see
+# data/curve_registry.yaml), and all registry reads go through Multicall3 batches. Crawls of
+# several networks can run at once (`make -j get-all-curve`): curve.yaml is read, merged and
+# replaced atomically while holding a file lock. Pools already in curve.yaml are never rewritten,
+# so hand-maintained fields such as zap_address are kept. Factory pools aren't in the registries
+# and still have to be added by hand.
+
 import os
+import time
+from decimal import Decimal
 
-from brownie import Contract, interface, network
+import yaml
+from brownie import Contract, interface, network, web3
 
 from data.chain import get_chain_from_network_name
+from data.curve import CURVE_DATA_PATH
+from data.multicall import Call, aggregate
+from data.yaml_snapshot import atomic_write, file_lock
+
+ADDRESS_PROVIDER = "0x0000000022D53366457F9d5E68Ec105046FC4383"
+CRYPTO_REGISTRY_ID = 5
+CRAWL_STATE_PATH = os.path.join("data", "curve_registry.yaml")
+CRAWL_STATE_HEADER = (
+    "# Pools crawled so far from each Curve registry, by chain id (see scripts/get_curve.py)\n"
+)
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def _addresses(values):
+    return [v.lower() for v in values if v != ZERO_ADDRESS]
+
+
+def _fee(fee: int) -> str:
+    return format(Decimal(fee) / Decimal(10**10), "f")
+
+
+def _read_yaml(path, default):
+    try:
+        with open(path, "r") as infile:
+            return yaml.safe_load(infile) or default
+    except FileNotFoundError:
+        return default
+
+
+def get_registries():
+    """(registry contract, is_crypto) for every registry deployed on the active network"""
+    provider = Contract.from_abi("Curve Provider", ADDRESS_PROVIDER, interface.CurveProvider.abi)
+    main, crypto = aggregate(
+        [Call.method(provider.get_registry), Call.method(provider.get_address, CRYPTO_REGISTRY_ID)]
+    )
+    registries = []
+    if main and main != ZERO_ADDRESS:
+        registries.append(
+            (Contract.from_abi("Curve Registry", main, interface.CurveRegistry.abi), False)
+        )
+    if crypto and crypto != ZERO_ADDRESS:
+        registry = Contract.from_abi(
+            "Curve Crypto Registry", crypto, interface.CurveCryptoRegistry.abi
+        )
+        registries.append((registry, True))
+    return registries
+
+
+def crawl_registry(registry, is_crypto, chain_id, start):
+    """Pools `start`.. of `registry`, as curve.yaml entries. Returns (pools, next start)
+
+    The next start is the pool count, or the index of the first pool that couldn't be read, so
+    that the next crawl retries it (pools already in curve.yaml are not added twice)
+    """
+    block = web3.eth.block_number
+    (pool_count,) = aggregate([Call.method(registry.pool_count)], block)
+    if pool_count is None:
+        return [], start
+    listed = aggregate(
+        [Call.method(registry.pool_list, i) for i in range(start, pool_count)], block
+    )
+    skipped = [start + n for n, address in enumerate(listed) if address is None]
+    indexes = [start + n for n, address in enumerate(listed) if address is not None]
+    addresses = [address for address in listed if address is not None]
+
+    fields = ["get_pool_name", "get_coins", "get_lp_token", "get_fees"]
+    fields += ["get_zap"] if is_crypto else ["get_underlying_coins", "is_meta"]
+    calls = []
+    for address in addresses:
+        calls += [Call.method(getattr(registry, field), address) for field in fields]
+        calls += [
+            Call.uint(address, "balances(uint256)", 0),
+            Call.uint(address, "balances(int128)", 0),
+        ]
+    results = aggregate(calls, block)
+
+    width = len(fields) + 2
+    pools = []
+    for n, (index, address) in enumerate(zip(indexes, addresses)):
+        row = dict(
+            zip(
+                fields + ["balances_uint256", "balances_int128"],
+                results[n * width : (n + 1) * width],
+            )
+        )
+        if None in (row["get_pool_name"], row["get_coins"], row["get_lp_token"]):
+            print(f"Could not read pool {address} from {registry.address}, skipping")
+            skipped.append(index)
+            continue
+        coins = _addresses(row["get_coins"])
+        underlying_coins = [] if is_crypto else _addresses(row["get_underlying_coins"])
+        is_underlying = bool(underlying_coins) and underlying_coins != coins
+        uses_int128 = row["balances_uint256"] is None and row["balances_int128"] is not None
+        zap = row.get("get_zap")
+        pools.append(
+            {
+                "balance_abi": "int128" if uses_int128 else "uint256",
+                "chain_id": int(chain_id),
+                "coins": coins,
+                "dy_abi": "uint256" if is_crypto else "int128",
+                "fee": "variable" if is_crypto else _fee(row["get_fees"][0]),
+                "is_crypto": is_crypto,
+                "is_factory": False,
+                "is_meta": bool(row.get("is_meta")),
+                "is_underlying": is_underlying,
+                "lp_token": row["get_lp_token"].lower(),
+                "name": row["get_pool_name"],
+                "pool_address": address.lower(),
+                "underlying_coins": underlying_coins if is_underlying else [],
+                "venue": "curve",
+                "zap_address": zap.lower() if zap and zap != ZERO_ADDRESS else None,
+            }
+        )
+    if skipped:
+        print(f"Pools {sorted(skipped)} of {registry.address} will be retried next crawl")
+    return pools, min(skipped, default=pool_count)
 
 
 def main():
     (chain, _) = get_chain_from_network_name(network.show_active())
     if not chain:
         raise ValueError(
-            "Network not supported in config. Please review data/chains.yaml", network.show_active()
+            "Network not supported in config. Please review data/chains/", network.show_active()
         )
+    chain_id = str(chain.chain_id)
+    if not web3.eth.get_code(ADDRESS_PROVIDER):
+        print(f"No Curve address provider on {network.show_active()}, skipping")
+        return
 
-    with open(os.path.join("data", "curve.json"), "r") as infile:
-        data = json.load(infile)
-
-    chain_id = str(chain["chain_id"])
-    data[chain_id] = []
+    start_time = time.perf_counter()
+    crawled_counts = _read_yaml(CRAWL_STATE_PATH, {}).get(int(chain_id), {})
 
-    provider = Contract.from_abi(
-        "Curve Provider", "0x0000000022D53366457F9d5E68Ec105046FC4383", interface.CurveProvider.abi
-    )
-    registry = Contract.from_abi(
-        "Curve Registry", provider.get_registry(), interface.CurveRegistry.abi
-    )
-    pool_info = Contract.from_abi(
-        "Curve Pool Info", provider.get_address(1), interface.CurvePoolInfo.abi
-    )
+    new_pools, counts = [], {}
+    for registry, is_crypto in get_registries():
+        address = registry.address.lower()
+        pools, counts[address] = crawl_registry(
+            registry, is_crypto, chain_id, crawled_counts.get(address, 0)
+        )
+        new_pools += pools
 
-    max_len = registry.pool_count()
+    with file_lock(CURVE_DATA_PATH):
+        with open(CURVE_DATA_PATH, "r") as infile:
+            source = infile.read()
+        known = {pool["pool_address"] for pool in yaml.safe_load(source) or []}
+        added = [pool for pool in new_pools if pool["pool_address"] not in known]
+        if added:
+            # appended as text so that comments in curve.yaml survive
+            source = source.rstrip("\n") + "\n" + yaml.safe_dump(added, default_flow_style=False)
+            atomic_write(CURVE_DATA_PATH, source.encode())
 
-    for i in range(max_len):
-        address = registry.pool_list(i)
+        state = _read_yaml(CRAWL_STATE_PATH, {})
+        state.setdefault(int(chain_id), {}).update(counts)
+        atomic_write(
+            CRAWL_STATE_PATH,
+            (CRAWL_STATE_HEADER + yaml.safe_dump(state, default_flow_style=False)).encode(),
+        )
 
-        pool_coins = pool_info.get_pool_coins(address).dict()
-        underlying_coins = [
-            coin.lower()
-            for coin in pool_coins["underlying_coins"]
-            if coin != "0x0000000000000000000000000000000000000000"
-        ]
-        name = registry.get_pool_name(address)
-        asset_type = registry.get_pool_asset_type(address)
-
-        object = {
-            "name": name,
-            "swap_address": address,
-            "asset_type": asset_type,
-            "coins": underlying_coins,
-        }
-        print(object)
-        data[chain_id].append(object)
-    with open(os.path.join("data", "curve.json"), "w") as outfile:
-        json.dump(data, outfile, indent=2)
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"{network.show_active()}: read {len(new_pools)} new registry pools, "
+        f"added {len(added)} to {CURVE_DATA_PATH} ({elapsed:.1f}s)"
+    )
@@ -0,0 +1,78 @@
+# Discovers the mint strategy of every token of the active network (data/chains, Curve coins and
+# underlying coins, Aave reserves and aTokens) and stores them in data/mint_strategies.yaml, which
+# `get_mint_strategy` then looks tokens up in instead of discovering them during tests.
+#
+# All balance layouts are first probed in one go (see `discover_balance_layouts`), only the tokens
+# it misses are traced one by one. Networks can be swept at once (`make -j mint-strategies`): the
+# file is read, merged and replaced atomically while holding a file lock, each run only replaces
+# the entries of its own chain. Tokens in OVERRIDES and native tokens are left out.
+#
+# Usage: brownie run mint_strategies --network mainnet-hardhat-fork
+
+import time
+
+import yaml
+from brownie import network
+
+from data.chain import get_chain_from_network_name, get_fork_block
+from data.mint_strategies import (
+    MINT_STRATEGIES_PATH,
+    MINT_STRATEGIES_VERSION,
+    merge_chain,
+    read_table,
+    sweep_tokens,
+)
+from data.test_helpers import (
+    NATIVES,
+    OVERRIDES,
+    BenefactorError,
+    discover_balance_layouts,
+    discover_mint_strategy,
+)
+from data.yaml_snapshot import atomic_write, file_lock
+
+HEADER = """\
+# Mint strategy of every known token, by chain id. Generated by `make mint-strategies`, see
+# data/mint_strategies.py
+"""
+
+
+def main():
+    (chain, _) = get_chain_from_network_name(network.show_active())
+    if not chain:
+        raise ValueError(
+            "Network not supported in config. Please review data/chains/", network.show_active()
+        )
+    chain_id = str(chain.chain_id)
+    start_time = time.perf_counter()
+
+    overrides = {token.lower() for token in OVERRIDES.get(chain_id, {})}
+    tokens = [t for t in sweep_tokens(chain_id) if t not in overrides and t not in NATIVES]
+
+    strategies = []
+    for token, layout in discover_balance_layouts(tokens).items():
+        if layout is not None:
+            strategies.append((token, "BALANCES", layout))
+            continue
+        try:
+            strategy, params = discover_mint_strategy(token, chain_id, probe=False)
+        except BenefactorError as e:
+            print(f"No mint strategy for {e}, skipping")
+            continue
+        except Exception as e:
+            print(f"Could not discover the mint strategy of {token} ({e!r}), skipping")
+            continue
+        strategies.append((token, strategy.name, params))
+
+    with file_lock(MINT_STRATEGIES_PATH):
+        table = merge_chain(
+            read_table(), chain_id, network.show_active(), get_fork_block(), strategies
+        )
+        data = {"version": MINT_STRATEGIES_VERSION, "chains": table}
+        atomic_write(MINT_STRATEGIES_PATH, (HEADER + yaml.safe_dump(data)).encode())
+
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"{network.show_active()}: stored {len(strategies)} of {len(tokens)} tokens "
+        f"in {MINT_STRATEGIES_PATH} ({elapsed:.1f}s)"
+    )
@@ -0,0 +1,28 @@
+# Precomputes data/pool_addresses.yaml: the CREATE2 addresses of the Uniswap V2 style pairs and
+# Uniswap V3 pools between the tokens of every chain in data/chains, for the venues listed in
+# data/pool_addresses.py. Rerun it after adding tokens or venues.
+#
+# Usage: brownie run pool_addresses
+
+import yaml
+
+from data.chain import get_registry
+from data.pool_addresses import POOL_ADDRESSES_PATH, build_table
+from data.yaml_snapshot import atomic_write
+
+HEADER = """\
+# CREATE2 addresses of the pairs and pools between the tokens of data/chains, by chain id and
+# venue. Generated by `brownie run pool_addresses`, see data/pool_addresses.py
+"""
+
+
+def main():
+    registry = get_registry()
+    tokens = {}
+    for entry in registry.index.values():
+        chain = registry.chain(entry["chain_id"])
+        tokens[chain.chain_id] = [token.address for token in chain.tokens]
+    table = build_table(tokens)
+    atomic_write(POOL_ADDRESSES_PATH, (HEADER + yaml.safe_dump(table)).encode())
+    count = sum(len(addresses) for venues in table.values() for addresses in venues.values())
+    print(f"Wrote {count} addresses to {POOL_ADDRESSES_PATH}")
@@ -0,0 +1,28 @@
+# Snapshots the state of every Curve pool of the active chain through Multicall3
+# The snapshot is written to data/snapshots/curve/<chain id>/<block>.pkl, see data/curve_snapshot.py
+# On a fork, the default block is the fork block: later blocks are local to the node.
+
+import os
+import time
+
+from brownie import web3
+
+from data.chain import get_chain_id, last_shared_block
+from data.curve import get_curve_pool_index
+from data.curve_snapshot import CurveSnapshot
+
+
+def main():
+    block = os.getenv("BLOCK")
+    block_number = int(block) if block else last_shared_block(web3.eth.block_number)
+    chain_id = get_chain_id()
+    pools = get_curve_pool_index().pools(chain_id)
+
+    start = time.perf_counter()
+    snapshot = CurveSnapshot.take(pools, block_number)
+    path = snapshot.save()
+    elapsed = time.perf_counter() - start
+
+    incomplete = len(snapshot.pools) - len(snapshot.engines(pools))
+    print(f"Snapshotted {len(snapshot.pools)} pools at block {snapshot.block_number} -> {path}")
+    print(f"{incomplete} pools could not be turned into quote engines ({elapsed:.1f}s)")
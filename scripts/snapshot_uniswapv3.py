@@ -0,0 +1,35 @@
+# Snapshots Uniswap V3 pools of the active chain with all their initialized ticks
+# Snapshots are written to data/snapshots/uniswapv3/<chain id>/<pool>/<block>.pkl, see
+# data/uniswapv3_ticks.py. A pool with an older snapshot is refreshed from its Mint and Burn
+# logs unless MODE=full. On a fork, the default block is the fork block: later blocks are local to
+# the node.
+#
+# Usage: POOLS=0x8ad5...,0x88e6... brownie run snapshot_uniswapv3 --network mainnet-hardhat-fork
+
+import os
+import time
+
+from brownie import web3
+
+from data.chain import last_shared_block
+from data.uniswapv3_ticks import UniswapV3Snapshot, get_snapshot
+
+
+def main():
+    pools = [pool.strip() for pool in os.getenv("POOLS", "").split(",") if pool.strip()]
+    if not pools:
+        raise ValueError("Set POOLS to a comma separated list of pool addresses")
+    block = os.getenv("BLOCK")
+    block_number = int(block) if block else last_shared_block(web3.eth.block_number)
+    full = os.getenv("MODE") == "full"
+
+    for pool in pools:
+        start = time.perf_counter()
+        if full:
+            snapshot = UniswapV3Snapshot.take(pool, block_number)
+            path = snapshot.save()
+        else:
+            snapshot = get_snapshot(pool, block_number)
+            path = snapshot.path()
+        elapsed = time.perf_counter() - start
+        print(f"{pool}: {len(snapshot.ticks)} initialized ticks -> {path} ({elapsed:.1f}s)")
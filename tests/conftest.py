@@ -2,8 +2,9 @@
 conftest for fixtures that are present during ALL tests (core + integrations)
 Most fixtures will be generated in subfolders
 """
+import os
 from pathlib import Path
-from typing import Set
+from typing import Optional, Set
 
 import pytest
 from _pytest.terminal import TerminalReporter
@@ -13,8 +14,16 @@ from brownie.project.main import get_loaded_projects
 from eth_account import Account
 from eth_account.messages import encode_structured_data
 
-from data.chain import get_chain, get_chain_name, get_network, get_wnative_address
+from data.chain import (
+    get_chain,
+    get_chain_id,
+    get_chain_name,
+    get_fork_block,
+    get_network,
+    get_wnative_address,
+)
 from data.curve import CurvePool
+from data.quarantine import BAD_POOL, BAD_TOKEN, DEFAULT_VERIFY_AGE, MODES, Quarantine
 from data.test_helpers import BenefactorError
 
 pytest_plugins = ["fixtures.accounts", "fixtures.vektor", "fixtures.chain"]
@@ -35,9 +44,9 @@ DEFAULT_UNISWAP_ROUTER_V2_ABI = interface.IUniswapV2Router02.abi
 @pytest.fixture(scope="module")
 def uni_router(request, connected_chain):
     router = request.param
-    chain_id = str(connected_chain["chain_id"])
+    chain_id = str(connected_chain.chain_id)
     abi = UNISWAP_ROUTER_V2_ABI.get(chain_id, DEFAULT_UNISWAP_ROUTER_V2_ABI)
-    yield Contract.from_abi(f"{router['venue']} router", router["address"], abi)
+    yield Contract.from_abi(f"{router.venue} router", router.checksum_address, abi)
 
 
 @pytest.fixture(scope="module")
@@ -49,14 +58,14 @@ def wnative(connected_chain):
 @pytest.fixture(scope="module")
 def token(request):
     token = request.param
-    yield Contract.from_abi(token["name"], token["address"], interface.ERC20Detailed.abi)
+    yield Contract.from_abi(token.name, token.checksum_address, interface.ERC20Detailed.abi)
 
 
 @pytest.fixture(scope="module")
 def tokens_for_alice(request, alice):
     token = request.param
-    contract = Contract.from_abi(token["name"], token["address"], interface.ERC20Detailed.abi)
-    contract.transfer(alice, 10 * (10 ** token["decimals"]), {"from": token["benefactor"]})
+    contract = Contract.from_abi(token.name, token.checksum_address, interface.ERC20Detailed.abi)
+    contract.transfer(alice, 10 * 10**token.decimals, {"from": token.benefactor})
     yield contract
 
 
@@ -67,7 +76,7 @@ def is_list_unique(_list):
     return len(set(_list)) == len(_list)
 
 
-def pytest_collection_modifyitems(items):
+def pytest_collection_modifyitems(config, items):
     for item in items.copy():
         try:
             params = item.callspec.params
@@ -88,6 +97,57 @@ def pytest_collection_modifyitems(items):
             if not is_list_unique(tokens):
                 items.remove(item)
 
+    mode = os.getenv("CURVE_QUARANTINE")
+    if mode and get_chain().id != "dev":
+        apply_quarantine(config, items, mode)
+
+
+# Curve pool quarantine, see data/quarantine.py
+
+_quarantine: Optional[Quarantine] = None
+
+
+def get_quarantine() -> Quarantine:
+    global _quarantine
+    if _quarantine is None:
+        _quarantine = Quarantine()
+    return _quarantine
+
+
+def item_pool(item) -> Optional[CurvePool]:
+    try:
+        params = item.callspec.params
+    except AttributeError:
+        return None
+    return next((value for value in params.values() if isinstance(value, CurvePool)), None)
+
+
+def apply_quarantine(config, items, mode):
+    if mode not in MODES:
+        raise pytest.UsageError(f"CURVE_QUARANTINE must be one of {', '.join(MODES)}")
+    chain_id, fork_block = get_chain_id(), get_fork_block()
+    quarantined = get_quarantine().pools(chain_id, fork_block)
+
+    def is_quarantined(item):
+        pool = item_pool(item)
+        return pool is not None and pool.pool_address in quarantined
+
+    if mode == "last":
+        items.sort(key=is_quarantined)
+        return
+
+    if mode == "skip":
+        keep = [not is_quarantined(item) for item in items]
+    else:
+        max_age = float(os.getenv("CURVE_QUARANTINE_VERIFY_AGE", DEFAULT_VERIFY_AGE))
+        due = get_quarantine().due_for_verification(chain_id, fork_block, max_age)
+        keep = [
+            item_pool(item) is not None and item_pool(item).pool_address in due for item in items
+        ]
+
+    config.hook.pytest_deselected(items=[item for item, k in zip(items, keep) if not k])
+    items[:] = [item for item, k in zip(items, keep) if k]
+
 
 def pytest_ignore_collect(path):
     project = get_loaded_projects()[0]
@@ -116,26 +176,26 @@ def pytest_generate_tests(metafunc):
 
     chain = get_chain()
 
-    if chain["id"] == "dev":
+    if chain.id == "dev":
         return
 
     if "token" in metafunc.fixturenames:
-        tokens = [asset for asset in chain["assets"] if asset.get("address")]
-        token_names = [token["name"] for token in tokens]
+        tokens = chain.tokens
+        token_names = [token.name for token in tokens]
         metafunc.parametrize("token", tokens, ids=token_names, indirect=True)
 
     if "tokens_for_alice" in metafunc.fixturenames:
-        tokens = [asset for asset in chain["assets"] if asset.get("address")]
-        token_names = [token["name"] for token in tokens]
+        tokens = chain.tokens
+        token_names = [token.name for token in tokens]
         metafunc.parametrize("tokens_for_alice", tokens, ids=token_names, indirect=True)
 
     if "uni_router" in metafunc.fixturenames:
         routers = [
             contract
-            for contract in chain["contracts"]
-            if "uniswap_router_v2_02" in contract.get("interfaces")
+            for contract in chain.contracts
+            if "uniswap_router_v2_02" in contract.interfaces
         ]
-        router_names = [router["venue"] for router in routers]
+        router_names = [router.venue for router in routers]
         metafunc.parametrize("uni_router", routers, ids=router_names, indirect=True)
 
 
@@ -196,12 +256,26 @@ def sign_eip2612_permit():
 
 bad_token_pools: Set[CurvePool] = set()
 bad_pools: Set[CurvePool] = set()
+# pools whose tests ran this session, and those with at least one failure
+ran_pools: Set[CurvePool] = set()
+failed_pools: Set[CurvePool] = set()
+
+
+def quarantine_pool(item, pool: CurvePool, failure: str):
+    get_quarantine().record(
+        get_chain_id(), get_fork_block(), pool.pool_address, failure, pool.name, item.nodeid
+    )
 
 
 @pytest.hookimpl(hookwrapper=True)
 def pytest_runtest_makereport(item, call):
     outcome = yield
     result = outcome.get_result()
+    pool = item_pool(item)
+    if pool is not None and result.when == "call":
+        ran_pools.add(pool)
+        if result.failed:
+            failed_pools.add(pool)
     if result.nodeid.split("::")[0] == "tests/integration/commands/test_swap_curve.py":
         if result.when == "call" and result.failed:
             if "pool" in item.fixturenames:
@@ -211,8 +285,10 @@ def pytest_runtest_makereport(item, call):
                     VirtualMachineError
                 ):
                     bad_pools.add(pool)
+                    quarantine_pool(item, pool, BAD_POOL)
                 if exc_info.errisinstance(BenefactorError):
                     bad_token_pools.add(pool)
+                    quarantine_pool(item, pool, BAD_TOKEN)
     if result.nodeid.split("::")[0] == "tests/network/mainnet-hardhat-fork/test_lp_curve.py":
         if result.when == "call" and result.failed:
             if "pool" in item.fixturenames:
@@ -220,6 +296,18 @@ def pytest_runtest_makereport(item, call):
                 exc_info = call.excinfo
                 if exc_info.errisinstance(VirtualMachineError):
                     bad_pools.add(pool)
+                    quarantine_pool(item, pool, BAD_POOL)
+
+
+def pytest_sessionfinish(session):
+    if os.getenv("CURVE_QUARANTINE") != "verify" or not ran_pools:
+        return
+    chain_id, fork_block = get_chain_id(), get_fork_block()
+    verified = [pool.pool_address for pool in ran_pools]
+    get_quarantine().mark_verified(chain_id, fork_block, verified)
+    get_quarantine().clear(
+        chain_id, fork_block, [pool.pool_address for pool in ran_pools - failed_pools]
+    )
 
 
 @pytest.hookimpl(hookwrapper=True)
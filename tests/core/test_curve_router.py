@@ -0,0 +1,106 @@
+import pytest
+
+from data.curve import CurvePool, CurvePoolIndex
+from data.curve_router import CurveRouter
+
+A, B, C, D, E, X, Z = "0xa", "0xb", "0xc", "0xd", "0xe", "0xx", "0xz"
+
+# pool -> rate of every swap through it, in percent
+RATES = {
+    "ab": 90,  # direct, with a large fee
+    "ac": 100,
+    "cb": 99,
+    "ad": 100,
+    "de": 100,
+    "eb": 100,
+    "axb": 50,  # A -> B, but A -> X -> B through it twice would give 4x
+    "az": 100,  # dead end
+}
+# (pool, token_in, token_out) -> rate overriding RATES
+EDGE_RATES = {("axb", A, X): 200, ("axb", X, B): 200}
+COINS = {"axb": [A, X, B]}
+
+
+def make_pool(name):
+    return CurvePool(
+        balance_abi="uint256",
+        chain_id="1",
+        coins=COINS.get(name, ["0x" + name[0], "0x" + name[1]]),
+        dy_abi="int128",
+        fee="0.04",
+        is_crypto=False,
+        is_factory=False,
+        is_meta=False,
+        is_underlying=False,
+        lp_token=f"0xlp{name}",
+        name=name,
+        pool_address=f"0xpool{name}",
+        underlying_coins=None,
+        venue="curve",
+        zap_address=None,
+    )
+
+
+@pytest.fixture
+def router():
+    return CurveRouter(1, CurvePoolIndex([make_pool(name) for name in RATES]))
+
+
+@pytest.fixture
+def quotes():
+    """Edges quoted by `quoter`, in order"""
+    return []
+
+
+@pytest.fixture
+def quoter(quotes):
+    def quote(edge, amount):
+        quotes.append(edge)
+        rate = EDGE_RATES.get((edge.pool.name, edge.token_in, edge.token_out))
+        return amount * (rate or RATES[edge.pool.name]) // 100
+
+    return quote
+
+
+def test_distances_to(router):
+    assert router.distances_to(B, 1) == {B: 0, A: 1, C: 1, E: 1, X: 1}
+    assert router.distances_to(B, 3) == {B: 0, A: 1, C: 1, E: 1, X: 1, D: 2, Z: 2}
+
+
+def test_multi_hop_route_beats_the_direct_pool(router, quoter, quotes):
+    route = router.best_route(A, B, 10**6, quoter, max_hops=2)
+    assert route.tokens == (A, C, B)
+    assert route.amounts == (10**6, 10**6, 99 * 10**4)
+    # Z can't reach B in the hops left, its pool is never quoted
+    assert all(edge.token_out != Z for edge in quotes)
+
+
+def test_max_hops(router, quoter):
+    assert router.best_route(A, B, 10**6, quoter, max_hops=3).tokens == (A, D, E, B)
+    assert router.best_route(A, B, 10**6, quoter, max_hops=1).tokens == (A, B)
+    assert router.best_route(D, B, 10**6, quoter, max_hops=1) is None
+
+
+def test_routes_never_revisit_tokens_or_reuse_pools(router, quoter):
+    routes = router.find_routes(A, B, 10**6, quoter, max_hops=3, limit=100)
+    assert routes
+    for route in routes:
+        pools = [edge.pool.pool_address for edge in route.edges]
+        assert len(set(route.tokens)) == len(route.tokens)
+        assert len(set(pools)) == len(pools)
+    assert max(route.amount_out for route in routes) == 10**6
+
+
+def test_sell_steps_chain_min_outputs(router, quoter):
+    route = router.best_route(A, B, 10**6, quoter, max_hops=3)
+    steps = route.sell_steps(quoter, 0.9)
+
+    assert [step[:3] for step in steps] == [
+        (10**6, A, D),
+        (9 * 10**5, D, E),
+        (81 * 10**4, E, B),
+    ]
+    for step, next_step in zip(steps, steps[1:]):
+        assert next_step[0] == step[3]
+    assert steps[-1][3] == 729 * 10**3
+    assert steps[0][4] == ["0xpoolad", 0, 1, 0]
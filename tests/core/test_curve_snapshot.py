@@ -0,0 +1,95 @@
+import data.curve_snapshot as curve_snapshot
+from data.curve import CurvePool
+from data.curve_snapshot import CurveSnapshot, snapshot_blocks
+from data.curve_stableswap import StableSwapPool, StableSwapState
+from data.multicall import calldata, decode_words
+
+POOL = CurvePool(
+    balance_abi="uint256",
+    chain_id="1",
+    coins=[
+        "0x00000000000000000000000000000000000000c0",
+        "0x00000000000000000000000000000000000000c1",
+    ],
+    dy_abi="int128",
+    fee="0.04",
+    is_crypto=False,
+    is_factory=False,
+    is_meta=False,
+    is_underlying=False,
+    lp_token="0x00000000000000000000000000000000000000a1",
+    name="test",
+    pool_address="0x00000000000000000000000000000000000000b0",
+    underlying_coins=None,
+    venue="curve",
+    zap_address=None,
+)
+BALANCES = [10**24, 3 * 10**24]
+STATE = StableSwapState(
+    balances=BALANCES,
+    rates=[10**18, 10**18],
+    amp=20000,
+    fee=4 * 10**6,
+    a_precision=100,
+    total_supply=4 * 10**24,
+    dy_offset=0,
+)
+DX = BALANCES[0] // curve_snapshot.PROBE_FRACTION
+TIMESTAMP = 1700000000
+
+
+def answer(signature, args):
+    """What the pool, its LP token and coins return, None for the views they don't have"""
+    return {
+        "getCurrentBlockTimestamp()": TIMESTAMP,
+        "balances(uint256)": BALANCES[args[0]] if args else None,
+        "get_virtual_price()": 10**18,
+        "A()": 200,
+        "A_precise()": 20000,
+        "fee()": 4 * 10**6,
+        "totalSupply()": 4 * 10**24,
+        "decimals()": 18,
+        "get_dy(int128,int128,uint256)": StableSwapPool(STATE).get_dy(0, 1, DX),
+    }.get(signature)
+
+
+def fake_aggregate(calls, block_number, batch_size):
+    signatures = {
+        calldata(signature)[:4]: signature
+        for signature in [
+            *curve_snapshot.POOL_VIEWS.values(),
+            *curve_snapshot.STABLESWAP_VIEWS.values(),
+            "getCurrentBlockTimestamp()",
+            "balances(uint256)",
+            "totalSupply()",
+            "decimals()",
+            "get_dy(int128,int128,uint256)",
+        ]
+    }
+    results = []
+    for call in calls:
+        args = decode_words(call.calldata[4:]) if call.calldata[4:] else []
+        results.append(answer(signatures[call.calldata[:4]], args))
+    return results
+
+
+def test_take_save_load_round_trip(monkeypatch, tmp_path):
+    monkeypatch.setattr(curve_snapshot, "aggregate", fake_aggregate)
+    snapshot = CurveSnapshot.take([POOL], block_number=100)
+    assert snapshot.value(POOL.pool_address, "balances") == BALANCES
+    assert snapshot.value(POOL.pool_address, "offpeg_fee_multiplier") is None
+
+    snapshot.save(tmp_path)
+    CurveSnapshot(1, 120, TIMESTAMP, [], {}, [], {}).save(tmp_path)
+    assert snapshot_blocks(1, tmp_path) == [100, 120]
+
+    # 120 is after the fork block
+    loaded = CurveSnapshot.load(1, directory=tmp_path, max_block=110)
+    assert vars(loaded) == vars(snapshot)
+    assert CurveSnapshot.load(1, directory=tmp_path).block_number == 120
+
+    engines = loaded.engines([POOL])
+    assert engines[POOL.pool_address].get_dy(0, 1, DX) == StableSwapPool(STATE).get_dy(0, 1, DX)
+    assert engines[POOL.pool_address].get_dy(1, 0, 10**21) == StableSwapPool(STATE).get_dy(
+        1, 0, 10**21
+    )
@@ -0,0 +1,89 @@
+import pytest
+
+import data.test_helpers as test_helpers
+from data.mint_cache import MintCache
+from data.mint_strategies import BalanceLayout
+from data.test_helpers import OVERRIDES, MintStrategy, cached, get_mint_strategy
+
+TOKEN = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return MintCache(str(tmp_path / "mint_strategies.sqlite3"))
+
+
+def test_keys_on_chain_fork_block_and_lowercase_token(cache):
+    cache.put(1, 100, TOKEN, 1, ["0xabc", 2])
+    assert cache.get("1", 100, TOKEN.lower()) == (1, ["0xabc", 2])
+    assert cache.get(1, 100, TOKEN) == (1, ["0xabc", 2])
+    assert cache.get(1, 101, TOKEN) is None
+    assert cache.get(137, 100, TOKEN) is None
+
+
+def test_first_writer_wins(tmp_path):
+    path = str(tmp_path / "mint_strategies.sqlite3")
+    first, second = MintCache(path), MintCache(path)
+    first.put(1, 100, TOKEN, 2, "0xbenefactor")
+    second.put(1, 100, TOKEN, 1, ["0xabc", 2])
+    assert first.get(1, 100, TOKEN) == second.get(1, 100, TOKEN) == (2, "0xbenefactor")
+
+
+def test_invalidate_filters(cache):
+    cache.put(1, 100, TOKEN, 1, ["0xabc", 2])
+    cache.put(1, 100, "0xdef", 1, ["0xdef", 0])
+    cache.put(1, 200, TOKEN, 1, ["0xabc", 2])
+    cache.put(137, 100, TOKEN, 1, ["0xabc", 2])
+
+    assert cache.invalidate(1, 100, TOKEN) == 1
+    assert cache.get(1, 100, TOKEN) is None
+    assert cache.get(1, 100, "0xdef") is not None
+    assert cache.invalidate(fork_block=200) == 1
+    assert cache.invalidate(chain_id=1) == 1
+    assert [entry["chain_id"] for entry in cache.entries()] == ["137"]
+    assert cache.invalidate() == 1
+    assert cache.entries() == []
+
+
+def test_cached_round_trips_balance_layouts(cache, monkeypatch):
+    monkeypatch.setattr(test_helpers, "_mint_cache", cache)
+    monkeypatch.setattr(test_helpers, "get_fork_block", lambda: 100)
+    layout = BalanceLayout(TOKEN, 51, vyper=True, bits=128, shares=True)
+    discoveries = []
+
+    def discover(token, network):
+        discoveries.append(token)
+        return {"0xbenefactor": (MintStrategy.BENEFACTOR, "0xbenefactor")}.get(
+            token, (MintStrategy.BALANCES, layout)
+        )
+
+    strategy = cached(discover)
+    assert strategy(TOKEN, "1") == (MintStrategy.BALANCES, layout)
+    assert strategy("0xbenefactor", "1") == (MintStrategy.BENEFACTOR, "0xbenefactor")
+
+    # a new worker, reading back from the database
+    other = cached(discover)
+    stored = other(TOKEN, "1")
+    assert stored == (MintStrategy.BALANCES, layout)
+    assert isinstance(stored[1], BalanceLayout)
+    assert other("0xbenefactor", "1") == (MintStrategy.BENEFACTOR, "0xbenefactor")
+    assert discoveries == [TOKEN, "0xbenefactor"]
+
+
+def test_overrides_and_table_take_precedence(cache, monkeypatch):
+    monkeypatch.setattr(test_helpers, "_mint_cache", cache)
+    monkeypatch.setattr(test_helpers, "get_fork_block", lambda: 100)
+    override = next(iter(OVERRIDES["1"]))
+    cache.put(1, 100, override, MintStrategy.BALANCES.value, [override, 0])
+    cache.put(1, 100, TOKEN, MintStrategy.BALANCES.value, [TOKEN, 0])
+    # the table was regenerated after TOKEN was stored
+    monkeypatch.setattr(
+        test_helpers,
+        "lookup_mint_strategy",
+        lambda network, fork_block, token: ("BENEFACTOR", "0xbenefactor")
+        if token == TOKEN
+        else None,
+    )
+
+    assert get_mint_strategy(override, "1") == OVERRIDES["1"][override]
+    assert get_mint_strategy(TOKEN, "1") == (MintStrategy.BENEFACTOR, "0xbenefactor")
@@ -0,0 +1,66 @@
+import pytest
+import yaml
+
+import data.mint_strategies as mint_strategies
+from data.mint_strategies import (
+    MINT_STRATEGIES_VERSION,
+    BalanceLayout,
+    from_entry,
+    lookup_mint_strategy,
+    merge_chain,
+    read_table,
+    to_entry,
+)
+
+TOKEN = "0xAE7AB96520DE3A18E5E111B5EAAB095312D7FE84"
+
+
+def test_entries_round_trip():
+    layout = BalanceLayout(TOKEN, 51, vyper=True, bits=128, shares=True)
+    assert from_entry(to_entry("BALANCES", layout)) == (
+        "BALANCES",
+        layout._replace(contract=TOKEN.lower()),
+    )
+    assert from_entry(to_entry("BALANCES", (TOKEN.lower(), 3))) == (
+        "BALANCES",
+        BalanceLayout(TOKEN.lower(), 3),
+    )
+    assert from_entry(to_entry("BENEFACTOR", "0xABC")) == ("BENEFACTOR", "0xabc")
+    assert from_entry(to_entry("NATIVE", None)) == ("NATIVE", None)
+
+
+def test_default_layout_fields_are_left_out():
+    assert to_entry("BALANCES", BalanceLayout(TOKEN, 3, bits=96)) == {
+        "strategy": "BALANCES",
+        "contract": TOKEN.lower(),
+        "slot": 3,
+        "bits": 96,
+    }
+
+
+def test_merge_chain_replaces_only_its_chain():
+    table = merge_chain({}, "1", "mainnet-hardhat-fork", 100, [(TOKEN, "BENEFACTOR", "0xabc")])
+    table = merge_chain(table, 137, "polygon-hardhat-fork", 200, [(TOKEN, "NATIVE", None)])
+    table = merge_chain(table, 1, "mainnet-hardhat-fork", 300, [(TOKEN, "BALANCES", (TOKEN, 0))])
+    assert sorted(table) == [1, 137]
+    assert table[1]["fork_block"] == 300
+    assert table[1]["tokens"] == {TOKEN.lower(): to_entry("BALANCES", (TOKEN, 0))}
+    assert table[137]["tokens"] == {TOKEN.lower(): {"strategy": "NATIVE"}}
+
+
+def test_read_table_and_lookup(tmp_path, monkeypatch):
+    layout = BalanceLayout(TOKEN.lower(), 0, shares=True)
+    table = merge_chain({}, 1, "mainnet-hardhat-fork", 100, [(TOKEN, "BALANCES", layout)])
+    path = tmp_path / "mint_strategies.yaml"
+
+    path.write_text(yaml.safe_dump({"version": MINT_STRATEGIES_VERSION, "chains": table}))
+    assert read_table(str(path)) == table
+    monkeypatch.setattr(mint_strategies, "load_table", lambda: read_table(str(path)))
+    assert lookup_mint_strategy("1", 100, TOKEN) == ("BALANCES", layout)
+    assert lookup_mint_strategy(137, 100, TOKEN) is None
+    with pytest.warns(UserWarning, match="swept at block 100"):
+        assert lookup_mint_strategy(1, 101, TOKEN) is None
+
+    path.write_text(yaml.safe_dump({"version": MINT_STRATEGIES_VERSION + 1, "chains": table}))
+    assert read_table(str(path)) == {}
+    assert read_table(str(tmp_path / "missing.yaml")) == {}
@@ -0,0 +1,64 @@
+import pytest
+
+import data.uniswapv3_ticks as uniswapv3_ticks
+from data.uniswapv3_ticks import UniswapV3Snapshot, get_snapshot, snapshot_blocks
+
+POOL = "0x8ad599c3A0ff1De082011EFDDc58f1908eb6e6D8"
+FORK_BLOCK = 100
+
+
+def make_snapshot(block_number, ticks):
+    return UniswapV3Snapshot(
+        1, POOL, block_number, "0xa", "0xb", 3000, 60, 2**96, 0, 10**18, dict(ticks)
+    )
+
+
+@pytest.fixture
+def node(monkeypatch):
+    """Pool reads and log replays of a fake fork at FORK_BLOCK, recorded in `calls`"""
+    calls = []
+
+    def take(address, block_number=None, batch_size=None, chain_id=None):
+        calls.append(("take", block_number))
+        return make_snapshot(block_number, {-60: (5, 5), 60: (5, -5)})
+
+    def refresh(self, block_number=None, batch_size=None):
+        calls.append(("refresh", self.block_number, block_number))
+        return make_snapshot(block_number, {**self.ticks, 120: (1, 1)})
+
+    monkeypatch.setattr(uniswapv3_ticks, "get_chain_id", lambda: 1)
+    monkeypatch.setattr(
+        uniswapv3_ticks, "last_shared_block", lambda block_number: min(block_number, FORK_BLOCK)
+    )
+    monkeypatch.setattr(UniswapV3Snapshot, "take", staticmethod(take))
+    monkeypatch.setattr(UniswapV3Snapshot, "refresh", refresh)
+    return calls
+
+
+def test_takes_then_reuses_stored_snapshots(node, tmp_path):
+    taken = get_snapshot(POOL, 90, tmp_path)
+    assert node == [("take", 90)]
+    assert snapshot_blocks(1, POOL, tmp_path) == [90]
+
+    stored = get_snapshot(POOL, 90, tmp_path)
+    assert vars(stored) == vars(taken)
+    assert node == [("take", 90)]
+
+    refreshed = get_snapshot(POOL, FORK_BLOCK, tmp_path)
+    assert node[-1] == ("refresh", 90, FORK_BLOCK)
+    assert refreshed.ticks[120] == (1, 1)
+    assert snapshot_blocks(1, POOL, tmp_path) == [90, FORK_BLOCK]
+
+
+def test_blocks_after_the_fork_are_neither_reused_nor_stored(node, tmp_path):
+    make_snapshot(FORK_BLOCK, {}).save(tmp_path)
+    # left by an earlier session, forked at the same block
+    make_snapshot(FORK_BLOCK + 5, {600: (1, 1)}).save(tmp_path)
+
+    snapshot = get_snapshot(POOL, FORK_BLOCK + 5, tmp_path)
+    assert node == [("refresh", FORK_BLOCK, FORK_BLOCK + 5)]
+    assert 600 not in snapshot.ticks
+
+    get_snapshot(POOL, FORK_BLOCK + 7, tmp_path)
+    assert node[-1] == ("refresh", FORK_BLOCK, FORK_BLOCK + 7)
+    assert snapshot_blocks(1, POOL, tmp_path) == [FORK_BLOCK, FORK_BLOCK + 5]
@@ -6,7 +6,7 @@ from brownie import ZERO_ADDRESS, interface
 from data.access_control import APPROVED_COMMAND
 from data.chain import get_chain_id
 from data.curve import CurvePool, get_curve_pools
-from data.test_helpers import mint_tokens_for
+from data.test_helpers import mint_many
 
 
 def pytest_generate_tests(metafunc):
@@ -60,10 +60,8 @@ def get_withdraw_params(pool: CurvePool, underlying=False):
 
 
 def test_deposit_and_withdraw(pool: CurvePool, invoker, clp_curve, alice):
-    amounts = []
-    for coin in pool.coins:
-        amount = mint_tokens_for(coin, invoker)
-        amounts.append(amount / 10)
+    minted = mint_many([(coin, invoker, 0) for coin in pool.coins])
+    amounts = [amount / 10 for amount in minted]
 
     deposit = clp_curve.deposit.encode_input(pool.coins, amounts, get_deposit_params(pool, False))
     invoker.invoke([clp_curve], [deposit], {"from": alice})
@@ -82,10 +80,8 @@ def test_deposit_and_withdraw(pool: CurvePool, invoker, clp_curve, alice):
 
 
 def test_metapool_deposit_and_withdraw(metapool: CurvePool, invoker, clp_curve, alice):
-    amounts = []
-    for coin in metapool.underlying_coins:
-        amount = mint_tokens_for(coin, invoker)
-        amounts.append(amount / 10)
+    minted = mint_many([(coin, invoker, 0) for coin in metapool.underlying_coins])
+    amounts = [amount / 10 for amount in minted]
 
     deposit = clp_curve.deposit.encode_input(
         metapool.underlying_coins, amounts, get_deposit_params(metapool, True)
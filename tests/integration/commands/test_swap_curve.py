@@ -1,5 +1,4 @@
 import atexit
-from itertools import permutations
 
 import brownie
 import pytest
@@ -8,7 +7,8 @@ from brownie.exceptions import VirtualMachineError
 
 from data.access_control import APPROVED_COMMAND
 from data.chain import get_chain_id
-from data.curve import CurvePool, get_curve_pools
+from data.curve import CurvePool, get_curve_pool_index
+from data.curve_router import CurveRouter, cached_quoter, encode_sell_steps, quote_onchain
 from data.test_helpers import mint_tokens_for
 
 
@@ -22,36 +22,23 @@ def cswap_curve(invoker, deployer, CSwapCurve):
 
 def pytest_generate_tests(metafunc):
     chain_id = get_chain_id()
-    pools = get_curve_pools(chain_id)
+    index = get_curve_pool_index()
+    pools = index.pools(chain_id)
     underlying_pools = [p for p in pools if p.is_underlying]
 
     if "coins" in metafunc.fixturenames:
+        params = [(pool, coins) for pool in pools for coins in index.coin_pairs(pool)]
         metafunc.parametrize(
             "pool, coins",
-            [
-                (curve_pool, coin)
-                for curve_pool in pools
-                for coin in list(permutations(range(len(curve_pool.coins)), 2))
-            ],
-            ids=[
-                f"{pool.name}-{coin}"
-                for pool in pools
-                for coin in list(permutations(range(len(pool.coins)), 2))
-            ],
+            params,
+            ids=[f"{pool.name}-{coins}" for pool, coins in params],
         )
     if "underlying_coins" in metafunc.fixturenames:
+        params = [(pool, coins) for pool in underlying_pools for coins in index.coin_pairs(pool)]
         metafunc.parametrize(
             "pool, underlying_coins",
-            [
-                (curve_pool, coin)
-                for curve_pool in underlying_pools
-                for coin in list(permutations(range(len(curve_pool.coins)), 2))
-            ],
-            ids=[
-                f"{pool.name}-{coin}"
-                for pool in underlying_pools
-                for coin in list(permutations(range(len(pool.coins)), 2))
-            ],
+            params,
+            ids=[f"{pool.name}-{coins}" for pool, coins in params],
         )
 
 
@@ -124,13 +111,44 @@ def test_curve_sell_underlying(underlying_coins, pool: CurvePool, alice, invoker
         assert interface.ERC20Detailed(token_out).balanceOf(invoker) > min_output
 
 
-def test_curve_buy_fail(invoker, cswap_curve, alice):
+def test_curve_route_sell(invoker, cswap_curve, alice):
     chain_id = get_chain_id()
-    curve_pools = get_curve_pools(chain_id)
-    try:
-        pool = curve_pools[0]
-    except IndexError:
+    curve_pools = get_curve_pool_index().pools(chain_id)
+    if not curve_pools:
+        pytest.skip("No curve pools to test")
+    router = CurveRouter(chain_id)
+    quoter = cached_quoter(quote_onchain)
+
+    # a coin with no pool shared with the first coin, so that its route has two hops
+    token_in = curve_pools[0].coins[0]
+    amount = mint_tokens_for(token_in, invoker)
+    distances = router.distances_to(token_in, 2)
+    routes = (
+        router.best_route(token_in, token, amount, quoter, max_hops=2)
+        for token, hops in distances.items()
+        if hops == 2
+    )
+    route = next((route for route in routes if route), None)
+    if route is None:
+        pytest.skip("No two hop Curve route to test")
+
+    steps = route.sell_steps(quoter, DEFAULT_SLIPPAGE)
+    calldata = encode_sell_steps(cswap_curve, steps)
+    invoker.invoke([cswap_curve] * len(steps), calldata, {"from": alice})
+
+    token_out = route.tokens[-1]
+    min_output = steps[-1][3]
+    if token_out == ETH_ADDRESS.lower():
+        assert invoker.balance() >= min_output
+    else:
+        assert interface.ERC20Detailed(token_out).balanceOf(invoker) >= min_output
+
+
+def test_curve_buy_fail(invoker, cswap_curve, alice):
+    curve_pools = get_curve_pool_index().pools(get_chain_id())
+    if not curve_pools:
         pytest.skip("No curve pools to test")
+    pool = curve_pools[0]
 
     amount = mint_tokens_for(pool.coins[0], invoker)
     token_in = pool.coins[0]
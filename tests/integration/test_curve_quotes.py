@@ -0,0 +1,103 @@
+from brownie import interface
+from brownie.exceptions import VirtualMachineError
+
+from data.chain import get_chain_id
+from data.curve import CurvePool, get_curve_pool_index
+from data.curve_cryptoswap import CryptoSwapPool
+from data.curve_snapshot import read_cryptoswap_state, read_stableswap_state
+from data.curve_stableswap import ETH_ADDRESS, StableSwapPool
+
+# compare offline quotes with get_dy for amounts of these sizes relative to the pool balance
+BALANCE_FRACTIONS = [10**6, 10**4, 10**2]
+# and with get_dy_underlying for these multiples of one whole underlying coin
+UNDERLYING_AMOUNTS = [1, 1_000, 100_000]
+
+
+def pytest_generate_tests(metafunc):
+    index = get_curve_pool_index()
+    crypto_pools = [p for p in index.pools(get_chain_id()) if p.is_crypto]
+    pools = [p for p in index.pools(get_chain_id()) if not p.is_crypto]
+
+    if "pool" in metafunc.fixturenames:
+        metafunc.parametrize("pool", pools, ids=[pool.name for pool in pools])
+
+    if "underlying_pool" in metafunc.fixturenames:
+        pools = [p for p in pools if p.is_underlying]
+        metafunc.parametrize("underlying_pool", pools, ids=[pool.name for pool in pools])
+
+    if "crypto_pool" in metafunc.fixturenames:
+        metafunc.parametrize("crypto_pool", crypto_pools, ids=[p.name for p in crypto_pools])
+
+
+def onchain_quotes(pool: CurvePool, i, j, amounts, underlying=False):
+    if pool.is_crypto:
+        contract = interface.CurveCryptoPool(pool.pool_address)
+    else:
+        contract = interface.CurvePool(pool.pool_address)
+    get_dy = contract.get_dy_underlying if underlying else contract.get_dy
+    quotes = []
+    for amount in amounts:
+        try:
+            quotes.append(get_dy(i, j, amount))
+        except (VirtualMachineError, ValueError):
+            quotes.append(None)
+    return quotes
+
+
+def offline_quotes(quote_many, i, j, amounts):
+    try:
+        return quote_many(i, j, amounts)
+    except (ValueError, ZeroDivisionError):
+        return [None] * len(amounts)
+
+
+def test_stableswap_get_dy(pool: CurvePool):
+    state = read_stableswap_state(pool)
+    engine = StableSwapPool(state)
+
+    compared = 0
+    for i, j in get_curve_pool_index().coin_pairs(pool):
+        amounts = [state.balances[i] // fraction for fraction in BALANCE_FRACTIONS]
+        expected = onchain_quotes(pool, i, j, amounts)
+        if None in expected:
+            # get_dy reverts for this pair, the others are still compared
+            continue
+        assert offline_quotes(engine.get_dy_many, i, j, amounts) == expected
+        compared += 1
+    assert compared, f"get_dy reverts for every pair of {pool.name}"
+
+
+def test_stableswap_get_dy_underlying(underlying_pool: CurvePool):
+    pool = underlying_pool
+    state = read_stableswap_state(pool)
+    engine = StableSwapPool(state)
+
+    compared = 0
+    for i, j in get_curve_pool_index().underlying_pairs(pool):
+        coin = pool.underlying_coins[i]
+        decimals = 18 if coin == ETH_ADDRESS else interface.ERC20Detailed(coin).decimals()
+        amounts = [amount * 10**decimals for amount in UNDERLYING_AMOUNTS]
+        expected = onchain_quotes(pool, i, j, amounts, underlying=True)
+        if None in expected:
+            # get_dy_underlying reverts for this pair, the others are still compared
+            continue
+        assert offline_quotes(engine.get_dy_underlying_many, i, j, amounts) == expected
+        compared += 1
+    assert compared, f"get_dy_underlying reverts for every pair of {pool.name}"
+
+
+def test_cryptoswap_get_dy(crypto_pool: CurvePool):
+    pool = crypto_pool
+    state = read_cryptoswap_state(pool)
+    engine = CryptoSwapPool(state)
+
+    compared = 0
+    for i, j in get_curve_pool_index().coin_pairs(pool):
+        amounts = [state.balances[i] // fraction for fraction in BALANCE_FRACTIONS]
+        expected = onchain_quotes(pool, i, j, amounts)
+        if None in expected:
+            # get_dy reverts for this pair, the others are still compared
+            continue
+        assert offline_quotes(engine.get_dy_many, i, j, amounts) == expected
+        compared += 1
+    assert compared, f"get_dy reverts for every pair of {pool.name}"
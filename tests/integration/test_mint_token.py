@@ -1,11 +1,17 @@
-import itertools
-
 import pytest
 from brownie import interface
 
 from data.chain import get_chain_id
-from data.curve import get_curve_pools
-from data.test_helpers import mint_tokens_for
+from data.curve import get_curve_pool_index
+from data.test_helpers import (
+    BENEFACTORS,
+    FUNDING_ROUNDING,
+    discover_balance_layouts,
+    fund_from_benefactors,
+    mint_many,
+    mint_tokens_for,
+    write_balances,
+)
 
 
 def test_mint(token, alice):
@@ -15,20 +21,13 @@ def test_mint(token, alice):
 
 def pytest_generate_tests(metafunc):
     chain_id = get_chain_id()
-    pools = get_curve_pools(chain_id)
+    index = get_curve_pool_index()
 
     if "coin" in metafunc.fixturenames:
-        coins = list(set(itertools.chain(*[pool.coins for pool in pools])))
-        metafunc.parametrize(
-            "coin",
-            coins,
-        )
+        metafunc.parametrize("coin", index.coins(chain_id))
 
     if "underlying_coin" in metafunc.fixturenames:
-        underlying_coins = list(
-            set(itertools.chain(*[pool.underlying_coins or [] for pool in pools]))
-        )
-        metafunc.parametrize("underlying_coin", underlying_coins)
+        metafunc.parametrize("underlying_coin", index.underlying_coins(chain_id))
 
 
 def test_mint_curve_tokens(coin, alice):
@@ -47,3 +46,37 @@ def test_mint_underlying_curve_tokens(underlying_coin, alice):
         assert interface.ERC20Detailed(underlying_coin).balanceOf(alice) / amount == pytest.approx(
             1, rel=1e-5
         )
+
+
+def test_mint_many(connected_chain, alice, bob):
+    tokens = connected_chain.tokens
+    amounts = mint_many([(token.address, user, 0) for token in tokens for user in (alice, bob)])
+    for n, token in enumerate(tokens):
+        contract = interface.ERC20Detailed(token.address)
+        assert contract.balanceOf(alice) == amounts[2 * n]
+        assert contract.balanceOf(bob) == amounts[2 * n + 1]
+
+
+def test_discover_balance_layouts(connected_chain, alice):
+    tokens = [token.address for token in connected_chain.tokens]
+    layouts = discover_balance_layouts(tokens)
+    assert any(layout is not None for layout in layouts.values())
+    mints = [(token, alice.address, 10**6, layout) for token, layout in layouts.items() if layout]
+    for (token, _, _, layout), held in zip(mints, write_balances(mints)):
+        assert interface.ERC20Detailed(token).balanceOf(alice) == held
+        assert held == 10**6 or layout.shares and held == pytest.approx(10**6, rel=1e-5)
+
+
+def test_fund_from_benefactors(alice, bob):
+    network = str(get_chain_id())
+    benefactors = sorted(BENEFACTORS.get(network, {}).items())[:8]
+    if not benefactors:
+        pytest.skip(f"No benefactors on {network}")
+    transfers = [
+        (token, b, user.address, 1000) for token, b in benefactors for user in (alice, bob)
+    ]
+    before = [interface.ERC20Detailed(token).balanceOf(user) for token, _, user, _ in transfers]
+    fund_from_benefactors(transfers, network)
+    for (token, _, user, amount), old in zip(transfers, before):
+        received = interface.ERC20Detailed(token).balanceOf(user) - old
+        assert abs(received - amount) <= FUNDING_ROUNDING
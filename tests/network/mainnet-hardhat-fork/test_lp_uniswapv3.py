@@ -3,12 +3,13 @@ import pytest
 from brownie import ZERO_ADDRESS, interface
 
 from data.access_control import APPROVED_COMMAND
-from data.test_helpers import mint_tokens_for
+from data.test_helpers import mint_many
 from data.uniswapv3 import (
     get_amounts_for_liquidity,
     get_liquidity_for_amounts,
     get_sqrt_ratio_at_tick,
 )
+from data.uniswapv3_positions import COLLECT, plan_actions, value_positions
 
 FULL_RANGE_LOWER_TICK = -887220
 FULL_RANGE_UPPER_TICK = -FULL_RANGE_LOWER_TICK
@@ -38,8 +39,7 @@ def position(invoker, clp_uniswapv3, alice, cmove, chain):
     usdc_amount = 100e6
     weth_amount = 0.05e18
 
-    mint_tokens_for(usdc, alice, usdc_amount)
-    mint_tokens_for(weth, alice, weth_amount)
+    mint_many([(usdc, alice, usdc_amount), (weth, alice, weth_amount)])
 
     usdc.approve(invoker, usdc_amount, {"from": alice})
     weth.approve(invoker, weth_amount, {"from": alice})
@@ -88,6 +88,8 @@ def position(invoker, clp_uniswapv3, alice, cmove, chain):
 
     assert "Mint" in tx.events
     assert "IncreaseLiquidity" in tx.events
+    # the exact LiquidityAmounts port matches the position manager to the unit
+    assert tx.events["IncreaseLiquidity"]["liquidity"] == expected_liquidity
     token_id = tx.events["IncreaseLiquidity"]["tokenId"]
 
     position = nftm.positions(token_id).dict()
@@ -126,8 +128,7 @@ def test_mint(nftm, receiver, cmove, chain, invoker, alice, clp_uniswapv3):
 
     usdc_amount = 100e6
     weth_amount = 0.05e18
-    mint_tokens_for(usdc, alice, usdc_amount)
-    mint_tokens_for(weth, alice, weth_amount)
+    mint_many([(usdc, alice, usdc_amount), (weth, alice, weth_amount)])
 
     usdc.approve(invoker, usdc_amount, {"from": alice})
     weth.approve(invoker, weth_amount, {"from": alice})
@@ -186,8 +187,7 @@ def test_add_liquidity(position, nftm, alice, clp_uniswapv3, cmove, chain, invok
     usdc_amount = 100e6
     weth_amount = 0.05e18
 
-    mint_tokens_for(usdc, alice, usdc_amount)
-    mint_tokens_for(weth, alice, weth_amount)
+    mint_many([(usdc, alice, usdc_amount), (weth, alice, weth_amount)])
 
     usdc.approve(invoker, usdc_amount, {"from": alice})
     weth.approve(invoker, weth_amount, {"from": alice})
@@ -278,6 +278,8 @@ def test_remove_some_liquidity(position, nftm, alice, invoker, clp_uniswapv3, ch
         initial_position["liquidity"]
         == after_position["liquidity"] + tx.events["DecreaseLiquidity"]["liquidity"]
     )
+    assert tx.events["DecreaseLiquidity"]["amount0"] == expected_usdc_received
+    assert tx.events["DecreaseLiquidity"]["amount1"] == expected_weth_received
     assert usdc.balanceOf(target_receiver) == usdc_start_balance + tx.events["Transfer"][0]["value"]
     assert weth.balanceOf(target_receiver) == weth_start_balance + tx.events["Transfer"][1]["value"]
 
@@ -386,6 +388,11 @@ def test_collect(position, alice, bob, clp_uniswapv3, invoker, chain, nftm, rece
     final_price = uniswap_pool.slot0().dict()["sqrtPriceX96"]
     assert final_price < initial_price
 
+    # the batch valuation sees the fees the trade generated, and plans to collect them
+    (value,) = value_positions([position])
+    assert value.in_range and value.fees0 > 0
+    assert [(a.action, a.position.token_id) for a in plan_actions([value])] == [(COLLECT, position)]
+
     calldata_collect = clp_uniswapv3.collectAll.encode_input(nftm, position, receiver)
 
     nftm.approve(invoker, position, {"from": alice})
@@ -406,6 +413,7 @@ def test_collect(position, alice, bob, clp_uniswapv3, invoker, chain, nftm, rece
     collect_event = tx.events["Collect"]
 
     assert collect_event["amount0"] == usdc.balanceOf(target_receiver) - starting_balance
+    assert (collect_event["amount0"], collect_event["amount1"]) == (value.fees0, value.fees1)
 
 
 def test_fail_collect_invalid_user(position, nftm, alice, bob, invoker, clp_uniswapv3, chain):
@@ -0,0 +1,48 @@
+from data.chain import get_chain
+from data.multicall import Call, aggregate, calldata
+from data.pool_addresses import build_table, candidate_pairs, candidate_pools, deployer, load_table
+
+
+def _decode_address(data: bytes) -> str:
+    return "0x" + data[12:32].hex()
+
+
+def test_pairs_match_factory():
+    chain = get_chain()
+    pairs = candidate_pairs(chain.chain_id, [token.address for token in chain.tokens])
+    calls = [
+        Call(
+            deployer(chain.chain_id, venue).factory,
+            calldata("getPair(address,address)", int(token0, 16), int(token1, 16)),
+            _decode_address,
+        )
+        for venue, token0, token1 in pairs
+    ]
+    for (key, derived), actual in zip(pairs.items(), aggregate(calls)):
+        if int(actual, 16):
+            assert derived == actual, key
+
+
+def test_pools_match_factory():
+    chain = get_chain()
+    pools = candidate_pools(chain.chain_id, [token.address for token in chain.tokens])
+    calls = [
+        Call(
+            deployer(chain.chain_id, venue).factory,
+            calldata("getPool(address,address,uint24)", int(token0, 16), int(token1, 16), fee),
+            _decode_address,
+        )
+        for venue, token0, token1, fee in pools
+    ]
+    created = 0
+    for (key, derived), actual in zip(pools.items(), aggregate(calls)):
+        if int(actual, 16):
+            assert derived == actual, key
+            created += 1
+    assert created
+
+
+def test_table_is_current():
+    chain = get_chain()
+    table = build_table({chain.chain_id: [token.address for token in chain.tokens]})
+    assert load_table().get(chain.chain_id) == table[chain.chain_id]
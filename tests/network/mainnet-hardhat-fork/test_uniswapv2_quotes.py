@@ -0,0 +1,45 @@
+import pytest
+from brownie import interface
+
+from data.chain import get_registry
+from data.uniswapv2 import UniswapV2Snapshot
+
+TOKENS = {token.symbol: token.address for token in get_registry().chain(1).tokens}
+USDC, WETH, DAI = TOKENS["USDC"], TOKENS["WETH"], TOKENS["DAI"]
+
+PATHS = [[WETH, USDC], [USDC, WETH], [DAI, WETH, USDC]]
+AMOUNTS = {USDC: [10**6, 10**10], WETH: [10**15, 10**19], DAI: [10**18, 10**22]}
+
+ROUTERS = get_registry().contracts_with_interface(1, "uniswap_router_v2_02")
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    yield UniswapV2Snapshot.take()
+
+
+@pytest.mark.parametrize("router", ROUTERS, ids=[router.venue for router in ROUTERS])
+def test_amounts_out(snapshot, router):
+    venue = snapshot.venue(router.venue)
+    uni_router = interface.IUniswapV2Router02(router.checksum_address)
+    for path in PATHS:
+        for amount in AMOUNTS[path[0]]:
+            assert venue.get_amounts_out(amount, path) == uni_router.getAmountsOut(amount, path)
+
+
+@pytest.mark.parametrize("router", ROUTERS, ids=[router.venue for router in ROUTERS])
+def test_amounts_in(snapshot, router):
+    venue = snapshot.venue(router.venue)
+    uni_router = interface.IUniswapV2Router02(router.checksum_address)
+    for path in PATHS:
+        for amount in AMOUNTS[path[-1]]:
+            assert venue.get_amounts_in(amount, path) == uni_router.getAmountsIn(amount, path)
+
+
+@pytest.mark.parametrize("router", ROUTERS, ids=[router.venue for router in ROUTERS])
+def test_best_sell(snapshot, router):
+    uni_router = interface.IUniswapV2Router02(router.checksum_address)
+    route = snapshot.best_sell(WETH, USDC, 10**18)
+    (_, direct) = uni_router.getAmountsOut(10**18, [WETH, USDC])
+    assert route.amount_out >= direct
+    assert route.path[0] == WETH and route.path[-1] == USDC
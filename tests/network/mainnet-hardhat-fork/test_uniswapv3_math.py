@@ -0,0 +1,24 @@
+import pytest
+from brownie import interface
+
+from data.uniswapv3 import get_sqrt_ratio_at_tick, get_tick_at_sqrt_ratio
+
+POOLS = {
+    "WETH-USDC 0.3%": "0x8ad599c3A0ff1De082011EFDDc58f1908eb6e6D8",
+    "USDC-WETH 0.05%": "0x88e6A0c2dDD26FEEb64F039a2c41296FcB3f5640",
+    "WBTC-WETH 0.3%": "0xCBCdF9626bC03E24f779434178A73a0B4bad62eD",
+    "DAI-USDC 0.01%": "0x5777d92f208679DB4b9778590Fa3CAB3aC9e2168",
+}
+
+
+@pytest.mark.parametrize("pool", POOLS.values(), ids=POOLS.keys())
+def test_tick_at_sqrt_ratio_matches_slot0(pool):
+    slot0 = interface.UniswapV3Pool(pool).slot0().dict()
+    tick = get_tick_at_sqrt_ratio(slot0["sqrtPriceX96"])
+
+    assert get_sqrt_ratio_at_tick(tick) <= slot0["sqrtPriceX96"] < get_sqrt_ratio_at_tick(tick + 1)
+    if slot0["sqrtPriceX96"] == get_sqrt_ratio_at_tick(tick):
+        # a zeroForOne swap ending exactly on an initialized tick leaves the pool at tick - 1
+        assert slot0["tick"] in (tick, tick - 1)
+    else:
+        assert tick == slot0["tick"]
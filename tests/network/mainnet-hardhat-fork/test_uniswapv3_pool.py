@@ -0,0 +1,89 @@
+import pytest
+from brownie import interface, web3
+
+from data.test_helpers import mint_tokens_for
+from data.uniswapv3_ticks import UniswapV3Snapshot
+
+QUOTER = "0xb27308f9F90D607463bb33eA1BeBb41C27CE5AB6"
+NFTM = "0xc36442b4a4522e871399cd717abdd847ab11fe88"
+# WETH-USDC 0.3%
+POOL = "0x8ad599c3A0ff1De082011EFDDc58f1908eb6e6D8"
+USDC = "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"
+WETH = "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2"
+
+AMOUNTS = {USDC: [10**6, 10**10, 10**13], WETH: [10**15, 10**18, 10**22]}
+
+
+@pytest.fixture(scope="module")
+def quoter():
+    # a web3 contract: brownie would trace the Quoter's intentional reverts
+    yield web3.eth.contract(address=QUOTER, abi=interface.Quoter.abi).functions
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    yield UniswapV3Snapshot.take(POOL)
+
+
+@pytest.mark.parametrize("token_in", [USDC, WETH], ids=["USDC", "WETH"])
+def test_quote_exact_input(snapshot, quoter, token_in):
+    engine = snapshot.engine()
+    zero_for_one = engine.zero_for_one(token_in)
+    token_out = WETH if token_in == USDC else USDC
+
+    for amount in AMOUNTS[token_in]:
+        expected = quoter.quoteExactInputSingle(
+            web3.toChecksumAddress(token_in), web3.toChecksumAddress(token_out), 3000, amount, 0
+        ).call()
+        assert engine.quote_exact_input(zero_for_one, amount) == expected
+
+
+@pytest.mark.parametrize("token_out", [USDC, WETH], ids=["USDC", "WETH"])
+def test_quote_exact_output(snapshot, quoter, token_out):
+    engine = snapshot.engine()
+    token_in = WETH if token_out == USDC else USDC
+    zero_for_one = engine.zero_for_one(token_in)
+
+    for amount in AMOUNTS[token_out][:2]:
+        expected = quoter.quoteExactOutputSingle(
+            web3.toChecksumAddress(token_in), web3.toChecksumAddress(token_out), 3000, amount, 0
+        ).call()
+        assert engine.quote_exact_output(zero_for_one, amount) == expected
+
+
+def test_refresh_replays_mint(snapshot, alice, chain):
+    nftm = interface.NonfungiblePositionManager(NFTM)
+    usdc = interface.ERC20Detailed(USDC)
+    weth = interface.ERC20Detailed(WETH)
+    mint_tokens_for(usdc, alice, 10**10)
+    mint_tokens_for(weth, alice, 10**19)
+    usdc.approve(nftm, 10**10, {"from": alice})
+    weth.approve(nftm, 10**19, {"from": alice})
+
+    # a range around the price bound by ticks that are likely uninitialized
+    spacing = snapshot.tick_spacing
+    tick_lower = (snapshot.tick // spacing - 7) * spacing
+    tick_upper = (snapshot.tick // spacing + 11) * spacing
+    nftm.mint(
+        (
+            usdc,
+            weth,
+            3000,
+            tick_lower,
+            tick_upper,
+            10**10,
+            10**19,
+            0,
+            0,
+            alice,
+            chain.time() + 100,
+        ),
+        {"from": alice},
+    )
+
+    refreshed = snapshot.refresh()
+    taken = UniswapV3Snapshot.take(POOL, refreshed.block_number)
+
+    assert refreshed.ticks == taken.ticks
+    assert refreshed.liquidity == taken.liquidity
+    assert refreshed.ticks != snapshot.ticks